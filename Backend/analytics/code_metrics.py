@@ -0,0 +1,211 @@
+import ast
+import io
+import os
+import tokenize
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from Backend.config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_ARGUMENTS = 5
+MAX_COMPLEXITY = 10
+MAX_FUNCTION_STATEMENTS = 50
+MAX_NESTING = 4
+MAX_LINE_LENGTH = 100
+
+# Smell -> pylint message type it stands in for, so the metrics have the same shape as analytics.lint_pool's
+SMELL_TYPES = {
+    'syntax_error': 'error',
+    'bare_except': 'warning',
+    'broad_except': 'warning',
+    'mutable_default_argument': 'warning',
+    'global_statement': 'warning',
+    'star_import': 'warning',
+    'eval_used': 'warning',
+    'too_many_arguments': 'refactor',
+    'too_complex': 'refactor',
+    'too_many_statements': 'refactor',
+    'too_deeply_nested': 'refactor',
+    'missing_docstring': 'convention',
+    'line_too_long': 'convention',
+}
+
+BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler)
+BLOCKS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try) + \
+    ((ast.Match,) if hasattr(ast, 'Match') else ())
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+SCOPES = FUNCTIONS + (ast.ClassDef,)
+
+
+def _complexity(node):
+    """
+    McCabe complexity of a function or top-level block: 1 + its decision points
+
+    Decision points are counted as the mccabe checker behind pylint counts them (if/elif, loops,
+    except handlers; not boolean operators or comprehensions), so the average matches the one
+    the pylint path reports. Nested functions and classes are rated on their own.
+    """
+    complexity = 1 if isinstance(node, FUNCTIONS) else 1 + isinstance(node, BRANCHES)
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, SCOPES):
+            continue
+        if isinstance(child, BRANCHES) or (hasattr(ast, 'match_case') and isinstance(child, ast.match_case)):
+            complexity += 1
+        stack.extend(ast.iter_child_nodes(child))
+    return complexity
+
+
+class _Visitor(ast.NodeVisitor):
+    def __init__(self):
+        self.smells = dict.fromkeys(SMELL_TYPES, 0)
+        self.function_complexity = []
+        self.statements = 0
+        self.depth = 0
+        self.max_nesting = 0
+
+    def generic_visit(self, node):
+        if isinstance(node, ast.stmt):
+            self.statements += 1
+        nested = isinstance(node, BLOCKS)
+        if nested:
+            self.depth += 1
+            self.max_nesting = max(self.max_nesting, self.depth)
+            if self.depth == MAX_NESTING + 1:
+                self.smells['too_deeply_nested'] += 1
+        super().generic_visit(node)
+        if nested:
+            self.depth -= 1
+
+    def _scope(self, node):
+        if not node.name.startswith('_') and ast.get_docstring(node) is None:
+            self.smells['missing_docstring'] += 1
+        # Nesting is measured within each function or class
+        depth, self.depth = self.depth, 0
+        self.generic_visit(node)
+        self.depth = depth
+
+    def visit_FunctionDef(self, node):
+        complexity = _complexity(node)
+        self.function_complexity.append(complexity)
+        self.smells['too_complex'] += complexity > MAX_COMPLEXITY
+        arguments = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        if arguments and arguments[0].arg in ('self', 'cls'):
+            arguments = arguments[1:]
+        self.smells['too_many_arguments'] += len(arguments) > MAX_ARGUMENTS
+        self.smells['mutable_default_argument'] += sum(
+            isinstance(default, (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp))
+            for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None])
+        statements = self.statements
+        self._scope(node)
+        self.smells['too_many_statements'] += self.statements - statements > MAX_FUNCTION_STATEMENTS
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self._scope(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.type is None:
+            self.smells['bare_except'] += 1
+        elif isinstance(node.type, ast.Name) and node.type.id in ('Exception', 'BaseException'):
+            self.smells['broad_except'] += 1
+        self.generic_visit(node)
+
+    def visit_Global(self, node):
+        self.smells['global_statement'] += 1
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        self.smells['star_import'] += any(alias.name == '*' for alias in node.names)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id in ('eval', 'exec'):
+            self.smells['eval_used'] += 1
+        self.generic_visit(node)
+
+
+def _line_counts(source):
+    """(code lines, comment lines) from the token stream; blank lines count as neither"""
+    code, comments = set(), set()
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.COMMENT:
+                comments.add(token.start[0])
+            elif token.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+                                    tokenize.ENDMARKER):
+                code.update(range(token.start[0], token.end[0] + 1))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    return len(code), len(comments - code)
+
+
+def extract_metrics(source):
+    """
+    Code metrics of one Python source from its AST and token stream, without running pylint
+
+    The result has the keys of analytics.lint_pool's pylint metrics. Message counts come from
+    the smells in SMELL_TYPES and score follows pylint's default evaluation. The raw measures
+    are included as well: lines, code and comment lines, per-function complexity, maximum
+    nesting depth and the count of each smell.
+    """
+    visitor = _Visitor()
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        tree = None
+        visitor.smells['syntax_error'] = 1
+    if tree is not None:
+        if ast.get_docstring(tree) is None and tree.body:
+            visitor.smells['missing_docstring'] += 1
+        visitor.visit(tree)
+        # Like mccabe, module-level if/for/while/try blocks are rated as well
+        visitor.function_complexity.extend(_complexity(node) for node in tree.body
+                                           if isinstance(node, BRANCHES + (ast.Try,)))
+    lines = source.splitlines()
+    visitor.smells['line_too_long'] = sum(len(line) > MAX_LINE_LENGTH for line in lines)
+    code_lines, comment_lines = _line_counts(source)
+
+    counts = {'fatal': 0, 'error': 0, 'warning': 0, 'refactor': 0, 'convention': 0, 'info': 0}
+    for smell, count in visitor.smells.items():
+        counts[SMELL_TYPES[smell]] += count
+    if tree is None or not visitor.statements:
+        score = 0.0 if tree is None else 10.0
+    else:
+        penalty = 5 * counts['error'] + counts['warning'] + counts['refactor'] + counts['convention']
+        score = max(0.0, 10.0 - penalty / visitor.statements * 10)
+    complexity = visitor.function_complexity
+    return {
+        'statements': visitor.statements,
+        'message_counts': counts,
+        'complexity': sum(complexity) / len(complexity) if complexity else 0.0,
+        'functions': len(complexity),
+        'score': score,
+        'lines': len(lines),
+        'code_lines': code_lines,
+        'comment_lines': comment_lines,
+        'function_complexity': complexity,
+        'max_complexity': max(complexity, default=0),
+        'max_nesting': visitor.max_nesting,
+        'smells': visitor.smells,
+    }
+
+
+def extract_metrics_many(sources, n_workers=None, chunksize=64):
+    """
+    extract_metrics over many sources, in order, split across a process pool
+
+    Extraction is pure Python and CPU bound, so files are sent in chunks of `chunksize` to one
+    process per core. Small batches stay in the calling process.
+    """
+    sources = list(sources)
+    n_workers = n_workers or config.CODE_METRICS_WORKERS or os.cpu_count() or 1
+    if n_workers == 1 or len(sources) <= 2 * chunksize:
+        return [extract_metrics(source) for source in sources]
+    # Spawned like analytics.lint_pool's workers, as the caller may already run threads
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(extract_metrics, sources, chunksize=chunksize))
@@ -1,6 +1,8 @@
-import subprocess
-import json
+import pandas as pd
 from data.data_fetcher import DataFetcher
+from analytics.lint_pool import LinterPool
+from analytics.code_metrics import extract_metrics_many
+from Backend.config import config
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
@@ -9,32 +11,48 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+FEATURES = ['lines_of_code', 'error_count', 'complexity']
+
+
+def quality_features(metrics):
+    """Model features from the metrics of analytics.lint_pool or analytics.code_metrics"""
+    counts = metrics['message_counts']
+    return {
+        'lines_of_code': metrics['statements'],
+        'error_count': counts['error'] + counts['warning'] + counts['convention'],
+        'complexity': metrics['complexity']
+    }
+
+
 class CodeQualityPredictor:
-    def __init__(self):
+    def __init__(self, linter_pool=None, metrics_backend=None):
         self.data_fetcher = DataFetcher()
         self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+        # 'pylint' or 'ast'; a model has to be trained and used with the same backend
+        self.metrics_backend = metrics_backend or config.CODE_METRICS_BACKEND
+        if self.metrics_backend not in ('pylint', 'ast'):
+            raise ValueError(f"Unknown code metrics backend: {self.metrics_backend}")
+        # Workers are started on the first lint and kept for the predictor's lifetime
+        self.linter_pool = linter_pool or LinterPool()
 
     def get_code_metrics(self, file_content):
-        # Use pylint to get code metrics
-        result = subprocess.run(['pylint', '--output-format=json', '-'], input=file_content, 
-                                text=True, capture_output=True)
-        return json.loads(result.stdout)
+        return self.lint_files([file_content])[0]
+
+    def lint_files(self, contents):
+        """Metrics of many files at once, computed across a process pool; None for files that failed"""
+        if self.metrics_backend == 'ast':
+            return extract_metrics_many(contents)
+        return [None if 'error' in metrics else metrics for metrics in self.linter_pool.lint(contents)]
 
     def prepare_data(self):
         files = self.data_fetcher.fetch_repository_files()
+        files = files[files['filename'].str.endswith('.py') & files['content'].notna()]
         X, y = [], []
-        for file in files:
-            if file['name'].endswith('.py'):
-                content = self.data_fetcher.fetch_file_content(file['path'])
-                metrics = self.get_code_metrics(content)
-                if metrics:
-                    X.append({
-                        'lines_of_code': metrics[0]['message-count'],
-                        'error_count': sum(1 for m in metrics if m['type'] in ('error', 'warning', 'convention')),
-                        'complexity': metrics[0].get('complexity', {}).get('average', 0)
-                    })
-                    y.append(10 - metrics[0]['score'])  # Convert pylint score to a "needs improvement" score
-        return X, y
+        for metrics in self.lint_files(files['content']):
+            if metrics:
+                X.append(quality_features(metrics))
+                y.append(10 - metrics['score'])  # Convert pylint score to a "needs improvement" score
+        return pd.DataFrame(X, columns=FEATURES), y
 
     def train_model(self):
         X, y = self.prepare_data()
@@ -55,13 +73,8 @@ class CodeQualityPredictor:
         metrics = self.get_code_metrics(file_content)
         if not metrics:
             return None
-        
-        X = [{
-            'lines_of_code': metrics[0]['message-count'],
-            'error_count': sum(1 for m in metrics if m['type'] in ('error', 'warning', 'convention')),
-            'complexity': metrics[0].get('complexity', {}).get('average', 0)
-        }]
-        
+
+        X = pd.DataFrame([quality_features(metrics)], columns=FEATURES)
         quality_score = self.model.predict(X)[0]
         return 10 - quality_score  # Convert back to a 0-10 scale where 10 is best
 
@@ -70,13 +83,13 @@ class CodeQualityPredictor:
         
         # Predict quality for a sample of files
         sample_files = self.data_fetcher.fetch_repository_files(limit=10)
+        sample_files = sample_files[sample_files['filename'].str.endswith('.py') & sample_files['content'].notna()]
+        linted = [(path, metrics) for path, metrics in zip(sample_files['path'], self.lint_files(sample_files['content']))
+                  if metrics]
         quality_predictions = {}
-        for file in sample_files:
-            if file['name'].endswith('.py'):
-                content = self.data_fetcher.fetch_file_content(file['path'])
-                quality = self.predict_quality(content)
-                if quality is not None:
-                    quality_predictions[file['path']] = quality
+        if linted:
+            X = pd.DataFrame([quality_features(metrics) for _, metrics in linted], columns=FEATURES)
+            quality_predictions = {path: 10 - score for (path, _), score in zip(linted, self.model.predict(X))}
         
         logger.info(f"Predicted quality for {len(quality_predictions)} files")
         return quality_predictions
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from analytics.graph_algorithms import eigenvector_centrality, louvain, modularity, top_k_central
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _username(value):
+    # GitLab API payloads hold users as {'username': ...}; database rows hold the name itself
+    return value.get('username') if isinstance(value, dict) else value
+
+
+def _pairs(df, source, target, users=False):
+    """Non-null (source, target) rows of df, with list-valued target cells expanded to one row per item"""
+    if df.empty:
+        return pd.Series([], dtype=object), pd.Series([], dtype=object)
+    pairs = df[[source, target]].explode(target).dropna()
+    if users:
+        return pairs[source].map(_username), pairs[target].map(_username)
+    return pairs[source], pairs[target]
+
+
+class CollaborationGraph:
+    """
+    Developer collaboration as sparse matrices
+
+    Developer and file names are factorized into integer ids once and every relation is a SciPy
+    CSR matrix:
+
+    - authorship: developers x files, the number of commits in which a developer changed a file
+    - reviews: developers x developers, the number of merge requests an author had reviewed by a reviewer
+
+    The developer-developer graph is projected with sparse products, so building it costs a few
+    vectorized passes over the data instead of one Python call per edge. A NetworkX view is only
+    built on request.
+    """
+
+    def __init__(self, developers, files, authorship, reviews, adjacency=None):
+        self.developers = developers
+        self.files = files
+        self.authorship = authorship
+        self.reviews = reviews
+        self._adjacency = adjacency
+
+    @classmethod
+    def from_activity(cls, commits, merge_requests):
+        """
+        :param commits: Rows with 'author_name' and 'changed_files' (a list of paths)
+        :param merge_requests: Rows with 'author' and 'reviewers' (a list); users are names or {'username': ...}
+        """
+        commits, merge_requests = pd.DataFrame(commits), pd.DataFrame(merge_requests)
+        commit_authors, changed_files = _pairs(commits, 'author_name', 'changed_files')
+        mr_authors, reviewers = _pairs(merge_requests, 'author', 'reviewers', users=True)
+        keep = (mr_authors != reviewers).to_numpy()
+        mr_authors, reviewers = mr_authors[keep], reviewers[keep]
+
+        # One id space for everyone who authored or reviewed, a separate one for files
+        developer_ids, developers = pd.factorize(pd.concat([commit_authors, mr_authors, reviewers], ignore_index=True))
+        file_ids, files = pd.factorize(changed_files)
+        n_commits, n_reviews = len(commit_authors), len(mr_authors)
+        authors_of_files = developer_ids[:n_commits]
+        authors_of_reviews = developer_ids[n_commits:n_commits + n_reviews]
+        reviewer_ids = developer_ids[n_commits + n_reviews:]
+
+        n_developers = len(developers)
+        authorship = sparse.csr_matrix((np.ones(n_commits, dtype=np.float32), (authors_of_files, file_ids)),
+                                       shape=(n_developers, len(files)))
+        reviews = sparse.csr_matrix((np.ones(n_reviews, dtype=np.float32), (authors_of_reviews, reviewer_ids)),
+                                    shape=(n_developers, n_developers))
+        return cls(np.asarray(developers, dtype=object), np.asarray(files, dtype=object), authorship, reviews)
+
+    @property
+    def adjacency(self):
+        """
+        Symmetric weighted developer-developer adjacency (CSR, no self-loops)
+
+        The weight between two developers is the number of files both have changed plus the number
+        of reviews between them in either direction.
+        """
+        if self._adjacency is None:
+            touched = self.authorship.astype(bool).astype(np.float32)
+            adjacency = (touched @ touched.T + self.reviews + self.reviews.T).tocsr()
+            adjacency.setdiag(0)
+            adjacency.eliminate_zeros()
+            self._adjacency = adjacency
+        return self._adjacency
+
+    def eigenvector_centrality(self, start=None, tol=1e-6):
+        """Weighted eigenvector centrality of every developer (unit norm, as networkx's); see graph_algorithms"""
+        return eigenvector_centrality(self.adjacency, start=start, tol=tol)
+
+    def key_developers(self, k=10, start=None, tol=1e-6):
+        """
+        Approximate top-k developers by eigenvector centrality
+
+        :return: (names of the top k developers, centrality vector to warm-start the next query)
+        """
+        top, centrality = top_k_central(self.adjacency, k, start=start, tol=tol)
+        return self.developers[top].tolist(), centrality
+
+    def communities(self, resolution=1.0, initial=None):
+        """Louvain community label of every developer, computed on the CSR adjacency"""
+        return louvain(self.adjacency, resolution=resolution, initial=initial)
+
+    def modularity(self, labels, resolution=1.0):
+        return modularity(self.adjacency, labels, resolution)
+
+    def to_networkx(self):
+        import networkx as nx
+
+        upper = sparse.triu(self.adjacency, k=1).tocoo()
+        graph = nx.Graph()
+        graph.add_nodes_from(self.developers)
+        graph.add_weighted_edges_from(zip(self.developers[upper.row], self.developers[upper.col], upper.data.tolist()))
+        return graph
+
+
+def _ids(index, names, values):
+    """Integer ids of values, assigning the next free id to names not seen before"""
+    codes, uniques = pd.factorize(values)
+    ids = np.empty(len(uniques), dtype=np.int64)
+    for i, name in enumerate(uniques):
+        ids[i] = index.setdefault(name, len(index))
+        if ids[i] == len(names):
+            names.append(name)
+    return ids[codes]
+
+
+def _resize(matrix, shape):
+    matrix = matrix.tocsr()
+    matrix.resize(shape)
+    return matrix
+
+
+class IncrementalCollaborationGraph:
+    """
+    The developer-developer graph of CollaborationGraph, kept up to date one batch of events at a time
+
+    Applying a batch only touches what it adds: a developer changing a file for the first time is
+    linked to the developers who changed it before, and a review links its author and reviewer.
+    Without decay the adjacency equals CollaborationGraph.from_activity over all events applied so
+    far. With `half_life_days`, every link weight halves after that many days, so the graph
+    follows who works together now; the record of who changed which file does not decay, so
+    a shared file links two developers once, when it first becomes shared.
+
+    Decay is applied lazily through a global scale factor, and links whose weight falls below
+    `min_weight` are dropped when the scale is folded back into the weights.
+    """
+
+    def __init__(self, half_life_days=None, min_weight=1e-3):
+        self.half_life_days = half_life_days
+        self.min_weight = min_weight
+        self._developer_index, self._developers = {}, []
+        self._file_index, self._files = {}, []
+        self._touched = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._weights = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self._scale = 1.0
+        self.updated_at = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._graph = None
+
+    def __len__(self):
+        return len(self._developers)
+
+    def _decay_to(self, now):
+        if self.updated_at is not None and self.half_life_days and now > self.updated_at:
+            self._scale *= 0.5 ** ((now - self.updated_at) / (self.half_life_days * 86400))
+            if self._scale < 1e-3:
+                weights = self._weights * self._scale
+                weights.data[weights.data < self.min_weight] = 0
+                weights.eliminate_zeros()
+                self._weights, self._scale = weights.tocsr(), 1.0
+        self.updated_at = now if self.updated_at is None else max(self.updated_at, now)
+
+    def apply_events(self, events, now=None):
+        """
+        Apply a batch of {'type': ..., 'data': {...}} events as produced by GitLabEventProducer
+
+        'commit' events need 'author_name' and 'changed_files' and 'merge_request' events need
+        'author' and 'reviewers'; other events are ignored. Decay is measured in wall-clock time
+        unless `now` (seconds since the epoch) is given.
+        """
+        commits = [event['data'] for event in events if event.get('type') == 'commit'
+                   and 'author_name' in event.get('data', {}) and 'changed_files' in event['data']]
+        merge_requests = [event['data'] for event in events if event.get('type') == 'merge_request'
+                          and 'author' in event.get('data', {}) and 'reviewers' in event['data']]
+        self.apply(pd.DataFrame(commits), pd.DataFrame(merge_requests), now)
+
+    def apply(self, commits, merge_requests, now=None):
+        """Apply commit and merge request rows in the format of CollaborationGraph.from_activity"""
+        commit_authors, changed_files = _pairs(commits, 'author_name', 'changed_files')
+        mr_authors, reviewers = _pairs(merge_requests, 'author', 'reviewers', users=True)
+        keep = (mr_authors != reviewers).to_numpy()
+        mr_authors, reviewers = mr_authors[keep], reviewers[keep]
+
+        with self._lock:
+            self._decay_to(time.time() if now is None else now)
+            authors = _ids(self._developer_index, self._developers, commit_authors)
+            files = _ids(self._file_index, self._files, changed_files)
+            review_authors = _ids(self._developer_index, self._developers, mr_authors)
+            review_targets = _ids(self._developer_index, self._developers, reviewers)
+            n_developers, n_files = len(self._developers), len(self._files)
+            touched = _resize(self._touched, (n_developers, n_files))
+            weights = _resize(self._weights, (n_developers, n_developers))
+
+            # (developer, file) pairs changed for the first time link to everyone who changed the file before
+            batch = sparse.csr_matrix((np.ones(len(authors), dtype=np.float32), (authors, files)),
+                                      shape=(n_developers, n_files))
+            batch.data[:] = 1
+            new = (batch - batch.multiply(touched)).tocsr()
+            new.eliminate_zeros()
+            shared = (new @ touched.T).tocsr()
+            delta = shared + shared.T + new @ new.T
+            reviews = sparse.csr_matrix((np.ones(len(review_authors)), (review_authors, review_targets)),
+                                        shape=(n_developers, n_developers))
+            delta = (delta + reviews + reviews.T).tocsr()
+            delta.setdiag(0)
+            delta.eliminate_zeros()
+
+            # Weights are stored divided by the decay scale, so older links shrink without being touched
+            self._weights = (weights + delta / self._scale).tocsr()
+            self._touched = (touched + new).tocsr()
+            self.version += 1
+            self._graph = None
+
+    def graph(self):
+        """A CollaborationGraph of the current, decayed state for centrality, NetworkX and community queries"""
+        with self._lock:
+            if self._graph is None:
+                self._graph = CollaborationGraph(np.array(self._developers, dtype=object),
+                                                 np.array(self._files, dtype=object),
+                                                 self._touched, None,
+                                                 adjacency=(self._weights * self._scale).tocsr())
+            return self._graph
+
+    def save(self, path):
+        """Write a snapshot atomically so a crash mid-save never leaves a truncated file"""
+        with self._lock:
+            weights = (self._weights * self._scale).tocsr()
+            touched = self._touched.tocsr()
+            # Names go through JSON so they round-trip as strings
+            header = json.dumps({'developers': self._developers, 'files': self._files, 'updated_at': self.updated_at,
+                                 'half_life_days': self.half_life_days, 'min_weight': self.min_weight})
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, header=np.array(header),
+                         weights_data=weights.data, weights_indices=weights.indices, weights_indptr=weights.indptr,
+                         touched_data=touched.data, touched_indices=touched.indices, touched_indptr=touched.indptr)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            header = json.loads(str(data['header']))
+            n_developers, n_files = len(header['developers']), len(header['files'])
+            weights = sparse.csr_matrix((data['weights_data'], data['weights_indices'], data['weights_indptr']),
+                                        shape=(n_developers, n_developers))
+            touched = sparse.csr_matrix((data['touched_data'], data['touched_indices'], data['touched_indptr']),
+                                        shape=(n_developers, n_files))
+        graph = cls(header['half_life_days'], header['min_weight'])
+        graph._developers, graph._files = header['developers'], header['files']
+        graph._developer_index = {name: i for i, name in enumerate(graph._developers)}
+        graph._file_index = {name: i for i, name in enumerate(graph._files)}
+        graph._weights, graph._touched = weights, touched
+        graph.updated_at = header['updated_at']
+        return graph
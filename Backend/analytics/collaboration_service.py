@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+import numpy as np
+from Backend.config import config
+from analytics.collaboration_graph import IncrementalCollaborationGraph
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CollaborationGraphService:
+    """
+    Long-lived developer collaboration graph fed by the GitLab event stream
+
+    The graph is restored from its last snapshot (or built once from a full database pull when
+    there is none) and then follows commit and merge request events from Kafka. A snapshot is
+    written every `snapshot_every` seconds and Kafka offsets are committed right after it, so a
+    restart resumes exactly where the snapshot left off. Community and centrality queries are
+    answered from the current state without rebuilding anything.
+    """
+
+    def __init__(self, snapshot_path=None, half_life_days=None, snapshot_every=None, group_id='collaboration_graph'):
+        self.snapshot_path = snapshot_path or config.COLLABORATION_SNAPSHOT_PATH
+        self.half_life_days = half_life_days if half_life_days is not None else config.COLLABORATION_HALF_LIFE_DAYS
+        self.snapshot_every = snapshot_every or config.COLLABORATION_SNAPSHOT_SECONDS
+        self.group_id = group_id
+        self.graph = None
+        self.consumer = None
+        self._thread = None
+        self._partition = None
+        self._partition_version = None
+        # Previous query results used to warm-start the next ones
+        self._labels = None
+        self._centrality = None
+        self._query_lock = threading.Lock()
+
+    def restore(self):
+        if os.path.exists(self.snapshot_path):
+            self.graph = IncrementalCollaborationGraph.load(self.snapshot_path)
+            logger.info(f"Restored collaboration graph of {len(self.graph)} developers from {self.snapshot_path}")
+        else:
+            from data.data_fetcher import DataFetcher
+
+            # Built aside so that queries never see a half-built graph
+            graph = IncrementalCollaborationGraph(half_life_days=self.half_life_days)
+            data_fetcher = DataFetcher()
+            graph.apply(data_fetcher.fetch_commits(), data_fetcher.fetch_merge_requests())
+            self.graph = graph
+            logger.info(f"Built collaboration graph of {len(self.graph)} developers from the database")
+        return self.graph
+
+    def run(self, batch_size=500):
+        """Consume events until the consumer is closed; blocks the calling thread"""
+        from data.kafka_consumer import GitLabEventConsumer
+
+        if self.graph is None:
+            self.restore()
+        self.consumer = GitLabEventConsumer(self.group_id, enable_auto_commit=False)
+        last_snapshot = time.monotonic()
+        try:
+            for events in self.consumer.stream_events(batch_size=batch_size):
+                self.graph.apply_events(events)
+                if time.monotonic() - last_snapshot >= self.snapshot_every:
+                    self.snapshot()
+                    last_snapshot = time.monotonic()
+        finally:
+            self.snapshot()
+            self.consumer.close()
+
+    def start(self, batch_size=500):
+        self._thread = threading.Thread(target=self.run, kwargs={'batch_size': batch_size}, daemon=True,
+                                        name='collaboration-graph')
+        self._thread.start()
+        return self
+
+    def snapshot(self):
+        self.graph.save(self.snapshot_path)
+        if self.consumer is not None:
+            # Offsets are only committed once the events before them are in a snapshot
+            self.consumer.commit()
+        logger.info(f"Saved collaboration graph of {len(self.graph)} developers to {self.snapshot_path}")
+
+    def key_developers(self, n=10):
+        """Approximate top-n developers, power iteration warm-started from the previous query's centrality"""
+        with self._query_lock:
+            graph = self.graph.graph()
+            key_developers, self._centrality = graph.key_developers(n, start=self._centrality)
+            return key_developers
+
+    def communities(self):
+        """Louvain partition of the current graph, warm-started from the previous query's partition"""
+        with self._query_lock:
+            if self._partition_version != self.graph.version:
+                graph = self.graph.graph()
+                # Developer ids only grow, so new developers are appended and start in communities of their own
+                initial = np.arange(len(graph.developers))
+                if self._labels is not None:
+                    initial[:len(self._labels)] = self._labels
+                    initial[len(self._labels):] += self._labels.max() + 1
+                self._labels = graph.communities(initial=initial)
+                self._partition = dict(zip(graph.developers.tolist(), self._labels.tolist()))
+                self._partition_version = self.graph.version
+            return self._partition
+
+    def analyze(self):
+        # Same result shape as DeveloperCollaborationAnalyzer.run_analysis
+        return {
+            "communities": len(set(self.communities().values())),
+            "key_developers": self.key_developers()
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    CollaborationGraphService().run()
@@ -0,0 +1,232 @@
+import numpy as np
+from scipy import sparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _symmetric_csr(adjacency):
+    return sparse.csr_matrix(adjacency, dtype=np.float64)
+
+
+def _start_vector(n, start):
+    if start is None:
+        return np.ones(n)
+    start = np.abs(np.asarray(start, dtype=np.float64))
+    if len(start) < n:
+        # Nodes added since the previous run start at the average score
+        start = np.concatenate([start, np.full(n - len(start), start.mean() if len(start) else 1.0)])
+    return start[:n] if start.any() else np.ones(n)
+
+
+def eigenvector_centrality(adjacency, start=None, tol=1e-6, max_iter=1000):
+    """
+    Weighted eigenvector centrality by sparse power iteration
+
+    Iterates x <- (A + I) x like networkx.eigenvector_centrality, which converges on bipartite
+    components too, and stops with the same criterion: sum(|x - x_previous|) < n * tol.
+
+    :param start: Centrality from a previous run; nodes appended since then may be missing from the end.
+                  After a small change to the graph this converges in a few iterations.
+    :return: Unit-norm centrality vector
+    """
+    A = _symmetric_csr(adjacency)
+    n = A.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    x = _start_vector(n, start)
+    x /= np.linalg.norm(x)
+    for _ in range(max_iter):
+        x_next = A @ x + x
+        x_next /= np.linalg.norm(x_next)
+        if np.abs(x_next - x).sum() < n * tol:
+            return x_next
+        x = x_next
+    logger.warning(f"Eigenvector centrality did not converge to tol={tol} in {max_iter} iterations")
+    return x
+
+
+def top_k_central(adjacency, k=10, start=None, tol=1e-6, max_iter=1000, stable_iterations=3):
+    """
+    Approximate top-k nodes by eigenvector centrality
+
+    Power iteration stops once the set of the k highest-scoring nodes has not changed for
+    `stable_iterations` iterations and the last iteration moved every score by less than the gap
+    between the k-th and the next node (or once the full tolerance is met). This usually takes far
+    fewer iterations than converging every score; the order within the top k is approximate.
+
+    :return: (indices of the top k nodes by decreasing score, current centrality vector)
+    """
+    A = _symmetric_csr(adjacency)
+    n = A.shape[0]
+    k = min(k, n)
+    if k == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(n)
+    x = _start_vector(n, start)
+    x /= np.linalg.norm(x)
+    previous, unchanged = None, 0
+    for _ in range(max_iter):
+        x_next = A @ x + x
+        x_next /= np.linalg.norm(x_next)
+        change = np.abs(x_next - x)
+        x = x_next
+        if change.sum() < n * tol:
+            break
+        order = np.argpartition(-x, k)[:k + 1] if k < n else np.arange(n)
+        order = order[np.argsort(-x[order])]
+        top = np.sort(order[:k])
+        unchanged = unchanged + 1 if previous is not None and np.array_equal(top, previous) else 0
+        previous = top
+        # The set only counts as settled once scores move by less than the gap that separates it
+        # from the next node
+        gap = x[order[k - 1]] - x[order[k]] if k < n else np.inf
+        if unchanged >= stable_iterations and change.max() < gap:
+            break
+    top = np.argpartition(-x, k - 1)[:k]
+    return top[np.argsort(-x[top], kind='stable')], x
+
+
+def modularity(adjacency, labels, resolution=1.0):
+    A = _symmetric_csr(adjacency)
+    two_m = A.sum()
+    if two_m == 0:
+        return 0.0
+    labels = np.unique(labels, return_inverse=True)[1]
+    membership = sparse.csr_matrix((np.ones(len(labels)), (np.arange(len(labels)), labels)))
+    internal = (membership.T @ A @ membership).diagonal()
+    totals = np.bincount(labels, weights=np.asarray(A.sum(axis=1)).ravel())
+    return float(internal.sum() / two_m - resolution * np.sum((totals / two_m) ** 2))
+
+
+def _level_modularity(A, rows, communities, degree, two_m, resolution):
+    """Modularity of a partition of one level's graph; rows is the row index of every stored entry of A"""
+    internal = A.data[communities[rows] == communities[A.indices]].sum()
+    totals = np.bincount(communities, weights=degree)
+    return internal / two_m - resolution * np.sum((totals / two_m) ** 2)
+
+
+def _single_moves(off_diagonal, communities, nodes, degree, two_m, resolution, tol):
+    """Classic Louvain moves, one node at a time, each against the current partition; modularity never drops"""
+    totals = np.bincount(communities, weights=degree, minlength=len(communities))
+    for i in nodes:
+        neighbours = off_diagonal.indices[off_diagonal.indptr[i]:off_diagonal.indptr[i + 1]]
+        if len(neighbours) == 0:
+            continue
+        own = communities[i]
+        totals[own] -= degree[i]
+        linked, inverse = np.unique(communities[neighbours], return_inverse=True)
+        links = np.bincount(inverse, weights=off_diagonal.data[off_diagonal.indptr[i]:off_diagonal.indptr[i + 1]])
+        gain = links - resolution * degree[i] * totals[linked] / two_m
+        at_own = np.flatnonzero(linked == own)
+        stay = gain[at_own[0]] if len(at_own) else -resolution * degree[i] * totals[own] / two_m
+        best = np.argmax(gain)
+        if gain[best] > stay + tol:
+            communities[i] = linked[best]
+        totals[communities[i]] += degree[i]
+    return communities
+
+
+def _local_moves(A, communities, two_m, resolution, rng, max_sweeps, move_fraction, tol):
+    """
+    Move nodes to the neighbouring community with the largest modularity gain, many nodes at a time
+
+    Gains are computed for the partition before the sweep, so moving many nodes at once can lower
+    modularity when neighbours move together (mostly on graphs with weak community structure).
+    A batch is only kept if modularity does not drop; otherwise its nodes are moved one at a time
+    instead, and later batches are made smaller.
+    """
+    n = A.shape[0]
+    degree = np.asarray(A.sum(axis=1)).ravel()
+    all_rows = np.repeat(np.arange(n), np.diff(A.indptr))
+    off_diagonal = A.copy()
+    off_diagonal.setdiag(0)
+    off_diagonal.eliminate_zeros()
+    nnz_rows = np.repeat(np.arange(n), np.diff(off_diagonal.indptr))
+    quality = _level_modularity(A, all_rows, communities, degree, two_m, resolution)
+
+    for _ in range(max_sweeps):
+        totals = np.bincount(communities, weights=degree, minlength=communities.max() + 1)
+        # links[i, c]: total weight between node i and community c
+        links = sparse.csr_matrix((off_diagonal.data, (nnz_rows, communities[off_diagonal.indices])),
+                                  shape=(n, len(totals)))
+        links.sum_duplicates()
+        rows = np.repeat(np.arange(n), np.diff(links.indptr))
+        cols = links.indices
+        gain = links.data - resolution * degree[rows] * totals[cols] / two_m
+        # In its own community a node does not count its own degree
+        own = cols == communities[rows]
+        gain[own] += resolution * degree[rows[own]] ** 2 / two_m
+        stay = -resolution * degree * (totals[communities] - degree) / two_m
+        stay[rows[own]] = gain[own]
+
+        has_links = np.diff(links.indptr) > 0
+        starts = links.indptr[:-1][has_links]
+        best_gain = np.full(n, -np.inf)
+        best_gain[has_links] = np.maximum.reduceat(gain, starts)
+        # First column reaching the row maximum
+        hits = np.flatnonzero(gain == best_gain[rows])
+        hit_rows, first = np.unique(rows[hits], return_index=True)
+        best_community = communities.copy()
+        best_community[hit_rows] = cols[hits[first]]
+
+        candidates = np.flatnonzero((best_gain > stay + tol) & (best_community != communities))
+        if len(candidates) == 0:
+            break
+        # Moving every candidate at once can make neighbours swap back and forth, so only a random
+        # share of them moves per sweep
+        moving = candidates[rng.random(len(candidates)) < move_fraction]
+        if len(moving) <= 1:
+            moving = candidates[np.argmax(best_gain[candidates] - stay[candidates])][None]
+        previous = communities[moving]
+        communities[moving] = best_community[moving]
+        moved_quality = _level_modularity(A, all_rows, communities, degree, two_m, resolution)
+        if moved_quality < quality:
+            communities[moving] = previous
+            order = moving[np.argsort(stay[moving] - best_gain[moving], kind='stable')]
+            communities = _single_moves(off_diagonal, communities, order, degree, two_m, resolution, tol)
+            moved_quality = _level_modularity(A, all_rows, communities, degree, two_m, resolution)
+            move_fraction /= 2
+        if moved_quality <= quality + tol:
+            break
+        quality = moved_quality
+    return communities
+
+
+def louvain(adjacency, resolution=1.0, initial=None, seed=0, max_levels=20, max_sweeps=100,
+            move_fraction=0.5, tol=1e-12):
+    """
+    Louvain community detection on a symmetric CSR adjacency
+
+    Each level runs vectorized local moves over all nodes at once (see _local_moves) and then
+    aggregates communities into nodes with a sparse product P.T @ A @ P. Levels repeat until no
+    communities merge. The partition with the highest modularity seen on any level is returned.
+
+    :param initial: Community label per node to start from, e.g. the previous run's partition with
+                    new nodes in communities of their own
+    :return: Community label per node, numbered from 0
+    """
+    A = _symmetric_csr(adjacency)
+    n = A.shape[0]
+    two_m = A.sum()
+    if n == 0 or two_m == 0:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n)
+    communities = np.arange(n) if initial is None else np.unique(initial, return_inverse=True)[1]
+    graph = A
+    best_labels, best_quality = communities.copy(), modularity(A, communities, resolution)
+    for _ in range(max_levels):
+        communities = _local_moves(graph, communities, two_m, resolution, rng, max_sweeps, move_fraction, tol)
+        communities = np.unique(communities, return_inverse=True)[1]
+        labels = communities[labels]
+        quality = modularity(A, labels, resolution)
+        if quality > best_quality:
+            best_labels, best_quality = labels, quality
+        n_communities = communities.max() + 1
+        if n_communities == graph.shape[0]:
+            break
+        membership = sparse.csr_matrix((np.ones(len(communities)), (np.arange(len(communities)), communities)),
+                                       shape=(len(communities), n_communities))
+        graph = (membership.T @ graph @ membership).tocsr()
+        communities = np.arange(n_communities)
+    return np.unique(best_labels, return_inverse=True)[1]
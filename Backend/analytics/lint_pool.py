@@ -0,0 +1,282 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import multiprocessing
+from multiprocessing.connection import wait
+from Backend.config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lint_results (
+    content_hash TEXT NOT NULL,
+    linter TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    PRIMARY KEY (content_hash, linter)
+);
+"""
+
+MCCABE_RATING = re.compile(r"McCabe rating is (\d+)")
+COMPLEXITY_MESSAGE = 'R1260'
+SYNTAX_ERROR_MESSAGE = 'E0001'
+
+
+def content_hash(source):
+    return hashlib.sha256(source.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+
+def _create_linter():
+    from pylint.lint import PyLinter
+    from pylint.reporters import CollectingReporter
+
+    linter = PyLinter(reporter=CollectingReporter())
+    linter.load_default_plugins()
+    linter.load_plugin_modules(['pylint.extensions.mccabe'])
+    linter.load_plugin_configuration()
+    # With a threshold of 0 every function reports its McCabe rating, which gives the complexity average
+    linter.set_option('max-complexity', 0)
+    return linter
+
+
+def _lint(linter, source, directory, name):
+    """Lint one source with an already loaded linter; returns its metrics"""
+    import astroid
+
+    path = os.path.join(directory, f"{name}.py")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    linter.reporter.messages = []
+    try:
+        linter.check([path])
+    finally:
+        os.remove(path)
+        # Each file is linted under a fresh module name; drop it so astroid's cache does not grow
+        astroid.MANAGER.astroid_cache.pop(name, None)
+
+    stats = linter.stats
+    ratings = [int(match.group(1)) for message in linter.reporter.messages
+               if message.msg_id == COMPLEXITY_MESSAGE and (match := MCCABE_RATING.search(message.msg))]
+    refactor = stats.refactor - len(ratings)
+    # A file pylint cannot parse has no statements but is broken, so it scores 0 as in
+    # analytics.code_metrics, not 10 like an empty file
+    unparsable = stats.fatal or any(message.msg_id == SYNTAX_ERROR_MESSAGE for message in linter.reporter.messages)
+    # pylint's default evaluation, without the messages that only carry the McCabe ratings
+    if unparsable or not stats.statement:
+        score = 0.0 if unparsable else 10.0
+    else:
+        score = max(0.0, 10.0 - (5 * stats.error + stats.warning + refactor + stats.convention) / stats.statement * 10)
+    return {
+        'statements': stats.statement,
+        'message_counts': {'fatal': stats.fatal, 'error': stats.error, 'warning': stats.warning,
+                           'refactor': refactor, 'convention': stats.convention, 'info': stats.info},
+        'complexity': sum(ratings) / len(ratings) if ratings else 0.0,
+        'functions': len(ratings),
+        'score': score,
+    }
+
+
+def _worker(connection):
+    """Worker loop: keeps pylint and astroid loaded and lints one (task_id, source) at a time"""
+    linter = _create_linter()
+    with tempfile.TemporaryDirectory(prefix='lint_worker_') as directory:
+        while True:
+            try:
+                task = connection.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            task_id, source = task
+            try:
+                result = _lint(linter, source, directory, f"lint_{os.getpid()}_{task_id}")
+            except Exception as e:
+                result = {'error': f"{type(e).__name__}: {e}"}
+            connection.send((task_id, result))
+
+
+def linter_version():
+    import pylint
+
+    return f"pylint-{pylint.__version__}-mccabe"
+
+
+class LintResultCache:
+    """Lint metrics by content hash and linter version, in SQLite so every run and worker can share it"""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def load(self, hashes, linter):
+        found = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = self._connection.execute(
+                f"SELECT content_hash, metrics FROM lint_results WHERE linter = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                [linter] + chunk)
+            found.update((content_hash, json.loads(metrics)) for content_hash, metrics in rows)
+        return found
+
+    def store(self, results, linter):
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO lint_results (content_hash, linter, metrics) VALUES (?, ?, ?)",
+                [(content_hash, linter, json.dumps(metrics)) for content_hash, metrics in results.items()])
+
+    def close(self):
+        self._connection.close()
+
+
+class _Worker:
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.task = None
+        self.deadline = None
+        self.files = 0
+
+    def send(self, task_id, source, timeout):
+        self.task = task_id
+        self.deadline = time.monotonic() + timeout
+        self.files += 1
+        self.connection.send((task_id, source))
+
+    def stop(self, kill=False):
+        try:
+            if kill:
+                self.process.kill()
+            else:
+                self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class LinterPool:
+    """
+    Long-lived pylint worker processes
+
+    Each worker imports pylint and astroid once and then lints file after file in-process, instead
+    of starting a pylint subprocess per file. Files are handed to whichever worker is free. A file
+    still running after `timeout` seconds has its worker killed and replaced and gets an
+    {'error': 'timeout'} result, so one pathological file cannot stall the run. Workers are also
+    replaced after `max_files_per_worker` files to bound memory held by astroid.
+
+    With `cache_path`, metrics are cached by content hash and pylint version, so unchanged files
+    are never linted twice.
+    """
+
+    def __init__(self, n_workers=None, timeout=None, cache_path=None, max_files_per_worker=500):
+        self.n_workers = n_workers or config.LINT_WORKERS or os.cpu_count() or 1
+        self.timeout = timeout or config.LINT_TIMEOUT_SECONDS
+        self.cache_path = cache_path if cache_path is not None else config.LINT_CACHE_PATH
+        self.max_files_per_worker = max_files_per_worker
+        # Forking a process that already runs gRPC or Kafka threads is unsafe; workers start clean
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def _start_workers(self):
+        while len(self._workers) < self.n_workers:
+            self._workers.append(_Worker(self._context))
+
+    def _replace(self, worker, kill=False):
+        worker.stop(kill=kill)
+        self._workers[self._workers.index(worker)] = _Worker(self._context)
+
+    def lint(self, sources):
+        """
+        Lint every source
+
+        :param sources: Python source strings
+        :return: One metrics dict per source, in order (see _lint); failed or timed-out files get {'error': ...}
+        """
+        sources = list(sources)
+        hashes = [content_hash(source) for source in sources]
+        linter = linter_version()
+        cache = LintResultCache(self.cache_path) if self.cache_path else None
+        try:
+            results = cache.load(set(hashes), linter) if cache else {}
+            # Identical files are linted once
+            pending = [(h, source) for h, source in dict(zip(hashes, sources)).items() if h not in results]
+            logger.info(f"Linting {len(pending)} of {len(sources)} files ({len(sources) - len(pending)} cached or duplicate)")
+            linted = self._run(pending)
+            if cache:
+                cache.store({h: metrics for h, metrics in linted.items() if 'error' not in metrics}, linter)
+            results.update(linted)
+        finally:
+            if cache:
+                cache.close()
+        return [results[h] for h in hashes]
+
+    def _run(self, tasks):
+        results = {}
+        if not tasks:
+            return results
+        self._start_workers()
+        queue = list(reversed(tasks))
+        keys = {}
+        next_id = 0
+        while queue or any(worker.task is not None for worker in self._workers):
+            for worker in self._workers:
+                if worker.task is None and queue:
+                    key, source = queue.pop()
+                    keys[next_id] = key
+                    try:
+                        worker.send(next_id, source, self.timeout)
+                    except OSError:
+                        # The worker died while idle; the file goes back to the queue for its replacement
+                        queue.append((key, source))
+                        worker.task = None
+                        self._replace(worker, kill=True)
+                    next_id += 1
+
+            busy = [worker for worker in self._workers if worker.task is not None]
+            if not busy:
+                continue
+            timeout = max(0.0, min(worker.deadline for worker in busy) - time.monotonic())
+            ready = wait([worker.connection for worker in busy], timeout=timeout)
+            for worker in busy:
+                if worker.connection in ready:
+                    try:
+                        task_id, metrics = worker.connection.recv()
+                    except (EOFError, OSError):
+                        # The worker died (e.g. out of memory) while linting this file; depending on
+                        # timing that shows up as end of file or as a reset connection
+                        results[keys[worker.task]] = {'error': 'worker exited'}
+                        worker.task = None
+                        self._replace(worker, kill=True)
+                        continue
+                    results[keys[task_id]] = metrics
+                    worker.task = None
+                    if worker.files >= self.max_files_per_worker:
+                        self._replace(worker)
+                elif time.monotonic() >= worker.deadline:
+                    logger.warning(f"Linting timed out after {self.timeout} s; restarting the worker")
+                    results[keys[worker.task]] = {'error': 'timeout'}
+                    worker.task = None
+                    self._replace(worker, kill=True)
+        return results
@@ -5,24 +5,43 @@ import analytics_service_pb2_grpc
 from network_analysis import DeveloperCollaborationAnalyzer
 from sentiment_analysis import TeamMoraleAnalyzer
 from code_quality_prediction import CodeQualityPredictor
+from collaboration_service import CollaborationGraphService
+from Backend.config import config
 
 class AnalyticsServicer(analytics_service_pb2_grpc.AnalyticsServiceServicer):
     def __init__(self):
         self.collaboration_analyzer = DeveloperCollaborationAnalyzer()
         self.morale_analyzer = TeamMoraleAnalyzer()
         self.quality_predictor = CodeQualityPredictor()
+        # With the streaming graph, collaboration queries are answered from live state instead of a full rebuild
+        self.collaboration_service = CollaborationGraphService().start() if config.COLLABORATION_SERVICE_ENABLED else None
+        # New commits and comments are scored off the request path; AnalyzeTeamMorale only reads the aggregates
+        if config.MORALE_UPDATE_SECONDS:
+            self.morale_analyzer.start_updates()
 
     def AnalyzeCollaboration(self, request, context):
-        results = self.collaboration_analyzer.run_analysis()
+        if self.collaboration_service is not None and self.collaboration_service.graph is not None:
+            results = self.collaboration_service.analyze()
+        else:
+            results = self.collaboration_analyzer.run_analysis()
         return analytics_service_pb2.CollaborationResponse(
             communities=results['communities'],
             key_developers=results['key_developers']
         )
 
     def AnalyzeTeamMorale(self, request, context):
-        results = self.morale_analyzer.run_analysis()
+        results = self.morale_analyzer.summary()
+        try:
+            trend = self.morale_analyzer.sentiment_trend(
+                request.dimension or 'all', request.key or '*', request.granularity or 'week',
+                request.start or None, request.end or None, request.window or 1)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
         return analytics_service_pb2.TeamMoraleResponse(
-            average_sentiment=results['average_sentiment']
+            average_sentiment=results['average_sentiment'],
+            commit_sentiment=results['commit_sentiment'],
+            issue_comment_sentiment=results['issue_comment_sentiment'],
+            trend=[analytics_service_pb2.SentimentBucket(**bucket) for bucket in trend.to_dict('records')]
         )
 
     def PredictCodeQuality(self, request, context):
@@ -0,0 +1,242 @@
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from Backend.config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sentiment_aggregates (
+    source TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    sentiment_sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key, granularity, bucket, source)
+);
+CREATE TABLE IF NOT EXISTS sentiment_watermarks (
+    source TEXT PRIMARY KEY,
+    last_timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sentiment_applied (
+    source TEXT NOT NULL,
+    id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (source, id)
+);
+"""
+
+GRANULARITIES = ('day', 'week')
+ALL = '*'
+# Fixed width, so timestamps stored as text compare in time order
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def bucket_start(timestamps, granularity):
+    """Start date (YYYY-MM-DD, UTC) of the day or ISO week (Monday) of every timestamp"""
+    timestamps = pd.to_datetime(pd.Series(timestamps), utc=True).dt.tz_localize(None).dt.floor('D')
+    if granularity == 'week':
+        timestamps = timestamps - pd.to_timedelta(timestamps.dt.dayofweek, unit='D')
+    elif granularity != 'day':
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return timestamps.dt.strftime('%Y-%m-%d')
+
+
+class MoraleAggregateStore:
+    """
+    Running sentiment sums and counts per source, dimension, key and time bucket
+
+    Each scored commit or comment adds its sentiment to one row per dimension ('all', 'author',
+    'project', 'team') and granularity ('day', 'week'), so averages and rolling trends are read
+    from a handful of rows instead of rescoring history.
+
+    Timestamps (authored dates, comment dates) are not in ingestion order: a commit can be pushed
+    long after it was authored. So every source ('commit', 'issue_comment') keeps a watermark, the
+    latest timestamp applied, and the ids applied within `late_arrival_days` of it. Updates re-read
+    from resume_from(), the watermark minus that window, and rows whose id was already applied are
+    skipped, so late rows are counted once and nothing is counted twice. Rows older than the window
+    when they first arrive are skipped with a warning.
+    """
+
+    def __init__(self, db_path=None, teams=None, late_arrival_days=None):
+        self.db_path = db_path or config.MORALE_AGGREGATES_PATH
+        self.late_arrival = pd.Timedelta(days=late_arrival_days if late_arrival_days is not None
+                                         else config.MORALE_LATE_ARRIVAL_DAYS)
+        if teams is None and config.MORALE_TEAMS_PATH and os.path.exists(config.MORALE_TEAMS_PATH):
+            with open(config.MORALE_TEAMS_PATH) as f:
+                teams = json.load(f)
+        # author name -> team name
+        self.teams = teams or {}
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread and process, as in utils.model_versioning
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def watermark(self, source):
+        """Latest timestamp applied, as an ISO string, or None"""
+        row = self._connect().execute(
+            "SELECT last_timestamp FROM sentiment_watermarks WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def resume_from(self, source):
+        """Timestamp to re-read a source from: the watermark minus the late-arrival window (None: from the start)"""
+        last_timestamp = self.watermark(source)
+        if last_timestamp is None:
+            return None
+        return (pd.Timestamp(last_timestamp) - self.late_arrival).to_pydatetime()
+
+    def _applied_ids(self, source, ids):
+        connection = self._connect()
+        applied = set()
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            applied.update(row[0] for row in connection.execute(
+                f"SELECT id FROM sentiment_applied WHERE source = ? AND id IN ({','.join('?' * len(chunk))})",
+                [source] + chunk))
+        return applied
+
+    def _keys(self, rows):
+        """Key of every row for each dimension the rows can be grouped by"""
+        keys = {'all': pd.Series(ALL, index=rows.index)}
+        if 'author_name' in rows:
+            keys['author'] = rows['author_name']
+        if 'project_id' in rows:
+            keys['project'] = rows['project_id']
+        if 'team' in rows:
+            keys['team'] = rows['team']
+        elif self.teams and 'author_name' in rows:
+            keys['team'] = rows['author_name'].map(self.teams)
+        return keys
+
+    def _pending_updates(self, source, rows):
+        """Rows not yet applied, the aggregate upserts they make and the new watermark row"""
+        rows = rows.drop_duplicates('id')
+        last_timestamp = self.watermark(source)
+        if last_timestamp is not None:
+            too_late = rows['timestamp'] < pd.Timestamp(last_timestamp) - self.late_arrival
+            if too_late.any():
+                logger.warning(f"Skipping {int(too_late.sum())} {source} rows more than {self.late_arrival} "
+                               f"before the watermark; if new, they arrived too late to be counted")
+                rows = rows[~too_late]
+            rows = rows[~rows['id'].isin(self._applied_ids(source, rows['id']))]
+        if rows.empty:
+            return rows, [], None
+
+        new_last = rows['timestamp'].max()
+        if last_timestamp is not None:
+            new_last = max(new_last, pd.Timestamp(last_timestamp))
+
+        scored = rows.dropna(subset=['sentiment'])
+        updates = []
+        for granularity in GRANULARITIES:
+            buckets = bucket_start(scored['timestamp'], granularity).to_numpy()
+            for dimension, keys in self._keys(scored).items():
+                grouped = pd.DataFrame({'key': keys.to_numpy(), 'bucket': buckets,
+                                        'sentiment': scored['sentiment'].to_numpy(dtype=np.float64)})
+                grouped = grouped.dropna(subset=['key']).groupby(['key', 'bucket'])['sentiment'].agg(['sum', 'count'])
+                updates.extend((source, dimension, str(key), granularity, bucket, float(total), int(count))
+                               for (key, bucket), total, count in zip(grouped.index, grouped['sum'], grouped['count']))
+        return rows, updates, (source, new_last.isoformat())
+
+    def add(self, source, rows):
+        """
+        Fold scored rows into the aggregates
+
+        :param rows: DataFrame with 'id', 'timestamp' and 'sentiment', and optionally 'author_name',
+                     'project_id' and 'team'; in any order
+        :return: Number of rows applied
+        """
+        rows = rows.dropna(subset=['timestamp']).copy()
+        if rows.empty:
+            return 0
+        rows['timestamp'] = pd.to_datetime(rows['timestamp'], utc=True)
+        rows['id'] = rows['id'].astype(str)
+        connection = self._connect()
+        # The watermark is read, the rows filtered and the sums written under one write lock, so
+        # concurrent calls with overlapping rows never apply the same row twice
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows, updates, watermark = self._pending_updates(source, rows)
+            if updates or watermark:
+                connection.executemany(
+                    """INSERT INTO sentiment_aggregates (source, dimension, key, granularity, bucket, sentiment_sum, count)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (dimension, key, granularity, bucket, source) DO UPDATE SET
+                           sentiment_sum = sentiment_sum + excluded.sentiment_sum, count = count + excluded.count""",
+                    updates)
+                # The watermark and the applied ids move in the same transaction as the sums they cover
+                connection.execute(
+                    "INSERT OR REPLACE INTO sentiment_watermarks (source, last_timestamp) VALUES (?, ?)",
+                    watermark)
+                connection.executemany(
+                    "INSERT INTO sentiment_applied (source, id, timestamp) VALUES (?, ?, ?)",
+                    zip([source] * len(rows), rows['id'], rows['timestamp'].dt.strftime(TIMESTAMP_FORMAT)))
+                # Ids older than the window can no longer come back
+                cutoff = pd.Timestamp(watermark[1]) - self.late_arrival
+                connection.execute("DELETE FROM sentiment_applied WHERE source = ? AND timestamp < ?",
+                                   (source, cutoff.strftime(TIMESTAMP_FORMAT)))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def trend(self, dimension='all', key=ALL, granularity='week', start=None, end=None, window=1, source=None):
+        """
+        Mean sentiment per bucket, plus its rolling mean over the last `window` buckets
+
+        Reads one row per bucket (per source), so the cost depends on the number of buckets, not on
+        the number of scored texts. The rolling mean weighs every text equally: it is the sum over
+        the window divided by the count over the window.
+
+        :param start: First bucket to include (YYYY-MM-DD), inclusive
+        :param end: Last bucket to include (YYYY-MM-DD), inclusive
+        :param source: 'commit' or 'issue_comment'; both when None
+        :return: DataFrame with columns bucket, count, mean, rolling_mean
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        query = """SELECT bucket, SUM(sentiment_sum), SUM(count) FROM sentiment_aggregates
+                   WHERE dimension = ? AND key = ? AND granularity = ?"""
+        params = [dimension, str(key), granularity]
+        if start is not None:
+            query += " AND bucket >= ?"
+            params.append(str(start))
+        if end is not None:
+            query += " AND bucket <= ?"
+            params.append(str(end))
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        query += " GROUP BY bucket ORDER BY bucket"
+        rows = pd.DataFrame(self._connect().execute(query, params).fetchall(), columns=['bucket', 'sum', 'count'])
+        rows['mean'] = rows['sum'] / rows['count']
+        rolling = rows[['sum', 'count']].rolling(max(1, window), min_periods=1).sum()
+        rows['rolling_mean'] = rolling['sum'] / rolling['count']
+        return rows[['bucket', 'count', 'mean', 'rolling_mean']]
+
+    def average(self, dimension='all', key=ALL, source=None):
+        """Mean sentiment of everything applied so far; NaN when nothing has been applied"""
+        query = """SELECT SUM(sentiment_sum), SUM(count) FROM sentiment_aggregates
+                   WHERE dimension = ? AND key = ? AND granularity = 'week'"""
+        params = [dimension, str(key)]
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        total, count = self._connect().execute(query, params).fetchone()
+        return total / count if count else float('nan')
@@ -1,62 +1,65 @@
-import networkx as nx
-import community
-import matplotlib.pyplot as plt
 from data.data_fetcher import DataFetcher
+from analytics.collaboration_graph import CollaborationGraph
+from analytics.rendering import get_renderer, output_path, render_network
+from Backend.config import config
 from utils.preprocessing import preprocess_text
 import logging
 
 logger = logging.getLogger(__name__)
 
 class DeveloperCollaborationAnalyzer:
-    def __init__(self):
+    def __init__(self, renderer=None):
         self.data_fetcher = DataFetcher()
-        self.G = nx.Graph()
+        self.renderer = renderer
+        self.graph = None
+        self._G = None
+
+    @property
+    def G(self):
+        # The NetworkX view of the developer graph is only built for the analyses that need it
+        if self._G is None:
+            self._G = self.graph.to_networkx()
+        return self._G
 
     def build_collaboration_network(self):
         # Fetch data from GitLab
         commits = self.data_fetcher.fetch_commits()
         merge_requests = self.data_fetcher.fetch_merge_requests()
 
-        # Build network from commits
-        for commit in commits:
-            author = commit['author_name']
-            for file in commit['changed_files']:
-                self.G.add_edge(author, file)
-
-        # Build network from merge requests
-        for mr in merge_requests:
-            author = mr['author']['username']
-            reviewers = [r['username'] for r in mr['reviewers']]
-            for reviewer in reviewers:
-                self.G.add_edge(author, reviewer)
+        # Developers are linked by the files they both changed and by the reviews between them
+        self.graph = CollaborationGraph.from_activity(commits, merge_requests)
+        self._G = None
 
-        logger.info(f"Built collaboration network with {self.G.number_of_nodes()} nodes and {self.G.number_of_edges()} edges")
+        logger.info(f"Built collaboration network with {len(self.graph.developers)} developers, "
+                    f"{len(self.graph.files)} files and {self.graph.adjacency.nnz // 2} developer pairs")
 
     def analyze_communities(self):
-        partition = community.best_partition(self.G)
-        modularity = community.modularity(partition, self.G)
+        labels = self.graph.communities()
+        modularity = self.graph.modularity(labels)
+        partition = dict(zip(self.graph.developers.tolist(), labels.tolist()))
         logger.info(f"Detected {len(set(partition.values()))} communities with modularity {modularity}")
         return partition
 
     def identify_key_developers(self):
-        centrality = nx.eigenvector_centrality(self.G)
-        key_developers = sorted(centrality, key=centrality.get, reverse=True)[:10]
+        key_developers, _ = self.graph.key_developers(10)
         logger.info(f"Top 10 key developers: {key_developers}")
         return key_developers
 
     def visualize_network(self, partition):
-        pos = nx.spring_layout(self.G)
-        plt.figure(figsize=(12, 8))
-        nx.draw(self.G, pos, node_color=list(partition.values()), with_labels=True)
-        plt.title("Developer Collaboration Network")
-        plt.savefig("developer_collaboration_network.png")
-        logger.info("Network visualization saved as developer_collaboration_network.png")
-
-    def run_analysis(self):
+        """Queue a rendering of the network in the background; returns a Future of the image path"""
+        renderer = self.renderer or get_renderer()
+        labels = [partition[developer] for developer in self.graph.developers]
+        return renderer.submit(output_path("developer_collaboration_network.png"), render_network,
+                               self.graph.adjacency, self.graph.developers, labels,
+                               max_nodes=config.RENDERING_MAX_NODES, layout_path=config.RENDERING_LAYOUT_PATH)
+
+    def run_analysis(self, render=None):
         self.build_collaboration_network()
         partition = self.analyze_communities()
         key_developers = self.identify_key_developers()
-        self.visualize_network(partition)
+        # The image is drawn after the results are returned
+        if config.RENDERING_ENABLED if render is None else render:
+            self.visualize_network(partition)
         return {
             "communities": len(set(partition.values())),
             "key_developers": key_developers
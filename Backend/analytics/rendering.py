@@ -0,0 +1,252 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from matplotlib import cbook
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from Backend.config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+
+class BackgroundRenderer:
+    """
+    Renders charts on a single background thread so that analyses return without waiting for images
+
+    Figures are drawn with matplotlib's object API on the Agg canvas, which needs no display and
+    does not touch pyplot's global state. When a chart is queued again before the previous request
+    for the same output file has started, only the newest one is drawn.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='renderer')
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def submit(self, path, render, *args, **kwargs):
+        """Queue render(*args, path=path, **kwargs); returns a Future"""
+        token = object()
+        with self._lock:
+            self._latest[path] = token
+
+        def job():
+            with self._lock:
+                if self._latest.get(path) is not token:
+                    logger.debug(f"Skipping superseded rendering of {path}")
+                    return None
+            try:
+                render(*args, path=path, **kwargs)
+                logger.info(f"Rendered {path}")
+                return path
+            except Exception:
+                logger.exception(f"Rendering {path} failed")
+                return None
+            finally:
+                with self._lock:
+                    if self._latest.get(path) is token:
+                        del self._latest[path]
+
+        return self._executor.submit(job)
+
+    def wait(self):
+        """Block until every job queued so far has finished"""
+        self._executor.submit(lambda: None).result()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Process-wide BackgroundRenderer, created on first use"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = BackgroundRenderer()
+        return _renderer
+
+
+def output_path(filename):
+    os.makedirs(config.RENDERING_OUTPUT_DIR, exist_ok=True)
+    return os.path.join(config.RENDERING_OUTPUT_DIR, filename)
+
+
+def sample_nodes(adjacency, max_nodes):
+    """Indices of the max_nodes nodes with the largest weighted degree, in their original order"""
+    n = adjacency.shape[0]
+    if n <= max_nodes:
+        return np.arange(n)
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    return np.sort(np.argpartition(-degree, max_nodes - 1)[:max_nodes])
+
+
+def load_layout(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_layout(path, positions):
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(positions, f)
+    os.replace(tmp_path, path)
+
+
+def coarsened_layout(adjacency, labels, names=None, previous=None, seed=0):
+    """
+    Community-coarsened layout: spring layout of the community graph, members packed around their community
+
+    Only the community graph (one node per community, edge weights summed between communities)
+    goes through the force-directed layout, so the cost depends on the number of communities
+    instead of the number of developers. Members are placed on a sunflower spiral in a disk whose
+    area follows the community size, the best-connected members in the middle.
+
+    :param previous: {name: [x, y]} from an earlier run; communities start from their members'
+                     previous positions, so the picture stays stable from one run to the next
+    :return: (n, 2) array of positions
+    """
+    import networkx as nx
+
+    adjacency = sparse.csr_matrix(adjacency)
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros((0, 2))
+    communities = np.unique(labels, return_inverse=True)[1]
+    n_communities = communities.max() + 1
+    membership = sparse.csr_matrix((np.ones(n), (np.arange(n), communities)), shape=(n, n_communities))
+    community_graph = (membership.T @ adjacency @ membership).tocsr()
+    community_graph.setdiag(0)
+    community_graph.eliminate_zeros()
+    sizes = np.bincount(communities, minlength=n_communities)
+
+    initial = None
+    if previous and names is not None:
+        known = np.array([name in previous for name in names])
+        if known.any():
+            coordinates = np.array([previous[name] for name in np.asarray(names)[known]], dtype=np.float64)
+            counts = np.bincount(communities[known], minlength=n_communities)
+            sums = np.stack([np.bincount(communities[known], weights=coordinates[:, axis], minlength=n_communities)
+                             for axis in range(2)], axis=1)
+            rng = np.random.default_rng(seed)
+            centers = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None],
+                               rng.uniform(-1, 1, (n_communities, 2)))
+            initial = {c: centers[c] for c in range(n_communities)}
+
+    if n_communities == 1:
+        centers = np.zeros((1, 2))
+    else:
+        graph = nx.from_scipy_sparse_array(community_graph)
+        # Starting from the previous layout, a few iterations absorb the changes
+        layout = nx.spring_layout(graph, pos=initial, iterations=50 if initial is None else 15, seed=seed)
+        centers = np.array([layout[c] for c in range(n_communities)])
+
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    order = np.lexsort((-degree, communities))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - np.repeat(starts, sizes)
+    radius = 0.5 * np.sqrt(sizes / n)
+    r = radius[communities] * np.sqrt((rank + 0.5) / sizes[communities])
+    theta = rank * GOLDEN_ANGLE
+    return centers[communities] + np.stack([r * np.cos(theta), r * np.sin(theta)], axis=1)
+
+
+def render_network(adjacency, developers, labels, path, max_nodes=None, layout_path=None, max_edges=20000,
+                   label_limit=100):
+    """
+    Draw the developer network to an image file
+
+    Graphs larger than max_nodes are down-sampled to their best-connected developers and only the
+    max_edges heaviest edges are drawn. Positions are kept in layout_path and reused by the next
+    rendering.
+    """
+    max_nodes = max_nodes or config.RENDERING_MAX_NODES
+    adjacency = sparse.csr_matrix(adjacency)
+    developers = np.asarray(developers, dtype=object)
+    labels = np.asarray(labels)
+    keep = sample_nodes(adjacency, max_nodes)
+    sub = adjacency[keep][:, keep].tocsr()
+    names = developers[keep]
+
+    previous = load_layout(layout_path)
+    positions = coarsened_layout(sub, labels[keep], names=names, previous=previous)
+    previous.update({str(name): position for name, position in zip(names, positions.tolist())})
+    save_layout(layout_path, previous)
+
+    edges = sparse.triu(sub, k=1).tocoo()
+    if edges.nnz > max_edges:
+        heaviest = np.argpartition(-edges.data, max_edges - 1)[:max_edges]
+        edges = sparse.coo_matrix((edges.data[heaviest], (edges.row[heaviest], edges.col[heaviest])), shape=edges.shape)
+
+    figure = Figure(figsize=(12, 8))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    ax.add_collection(LineCollection(np.stack([positions[edges.row], positions[edges.col]], axis=1),
+                                     colors='grey', linewidths=0.5, alpha=0.2, zorder=1))
+    node_size = 300 if len(keep) <= label_limit else max(2, 3000 / np.sqrt(len(keep)))
+    ax.scatter(positions[:, 0], positions[:, 1], c=np.unique(labels[keep], return_inverse=True)[1] % 20,
+               cmap='tab20', vmin=0, vmax=19, s=node_size, zorder=2)
+    if len(keep) <= label_limit:
+        for name, (x, y) in zip(names, positions):
+            ax.annotate(str(name), (x, y), ha='center', va='center', fontsize=8, zorder=3)
+    title = "Developer Collaboration Network"
+    if len(keep) < len(developers):
+        title += f" ({len(keep)} best-connected of {len(developers)} developers)"
+    ax.set_title(title)
+    ax.set_axis_off()
+    ax.autoscale_view()
+    figure.savefig(path)
+
+
+def render_sentiment(df, path):
+    """Box plot of sentiment by type; the box statistics are computed once per type, not drawn from every point"""
+    groups = [(name, group['sentiment'].dropna().to_numpy()) for name, group in df.groupby('type', sort=False)]
+    groups = [(name, values) for name, values in groups if len(values)]
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    if groups:
+        stats = [dict(cbook.boxplot_stats(values)[0], label=name) for name, values in groups]
+        ax.bxp(stats, showfliers=False)
+    ax.set_xlabel('type')
+    ax.set_ylabel('sentiment')
+    ax.set_title("Sentiment Distribution by Type")
+    figure.savefig(path)
+
+
+def render_sentiment_trend(trends, path):
+    """Line chart of mean sentiment per bucket, one line per source, with the rolling mean dashed"""
+    figure = Figure(figsize=(12, 6))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    for source, trend in trends.items():
+        if trend.empty:
+            continue
+        buckets = pd.to_datetime(trend['bucket'])
+        line, = ax.plot(buckets, trend['mean'], alpha=0.4, label=source)
+        ax.plot(buckets, trend['rolling_mean'], color=line.get_color(), linestyle='--', label=f"{source} (rolling)")
+    ax.axhline(0, color='grey', linewidth=0.5)
+    ax.set_ylabel('sentiment')
+    ax.set_title("Sentiment Trend by Type")
+    if ax.lines[1:]:
+        ax.legend()
+    figure.autofmt_xdate()
+    figure.savefig(path)
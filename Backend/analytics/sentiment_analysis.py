@@ -1,54 +1,107 @@
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from data.data_fetcher import DataFetcher
-from utils.preprocessing import preprocess_text
+from analytics.sentiment_engine import BatchSentimentScorer
+from analytics.morale_store import MoraleAggregateStore
+from analytics.rendering import get_renderer, output_path, render_sentiment, render_sentiment_trend
+from Backend.config import config
+import time
+import threading
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import logging
 
 logger = logging.getLogger(__name__)
 
 class TeamMoraleAnalyzer:
-    def __init__(self):
+    def __init__(self, renderer=None, scorer=None, store=None):
         self.data_fetcher = DataFetcher()
         self.analyzer = SentimentIntensityAnalyzer()
+        self.scorer = scorer or BatchSentimentScorer()
+        self.store = store or MoraleAggregateStore()
+        self.renderer = renderer
 
     def analyze_sentiment(self, text):
         return self.analyzer.polarity_scores(text)['compound']
 
     def analyze_commit_messages(self):
-        commits = self.data_fetcher.fetch_commits()
-        sentiments = [self.analyze_sentiment(preprocess_text(commit['message'])) for commit in commits]
-        return pd.DataFrame({'sentiment': sentiments, 'type': 'commit'})
+        # Rows are streamed from the database and scored in batches across the worker pool
+        ids, sentiments = self.scorer.score_frames(
+            self.data_fetcher.stream_commit_messages(config.SENTIMENT_FETCH_CHUNK_SIZE), 'id', 'message')
+        return pd.DataFrame({'id': ids, 'sentiment': sentiments, 'type': 'commit'})
 
     def analyze_issue_comments(self):
-        issues = self.data_fetcher.fetch_issues()
-        sentiments = []
-        for issue in issues:
-            for comment in issue['comments']:
-                sentiment = self.analyze_sentiment(preprocess_text(comment['body']))
-                sentiments.append(sentiment)
-        return pd.DataFrame({'sentiment': sentiments, 'type': 'issue_comment'})
+        ids, sentiments = self.scorer.score_frames(
+            self.data_fetcher.stream_issue_comments(config.SENTIMENT_FETCH_CHUNK_SIZE), 'id', 'body')
+        return pd.DataFrame({'id': ids, 'sentiment': sentiments, 'type': 'issue_comment'})
 
     def visualize_sentiment(self, df):
-        plt.figure(figsize=(10, 6))
-        sns.boxplot(x='type', y='sentiment', data=df)
-        plt.title("Sentiment Distribution by Type")
-        plt.savefig("sentiment_distribution.png")
-        logger.info("Sentiment visualization saved as sentiment_distribution.png")
-
-    def run_analysis(self):
-        commit_sentiments = self.analyze_commit_messages()
-        issue_sentiments = self.analyze_issue_comments()
-        all_sentiments = pd.concat([commit_sentiments, issue_sentiments])
-        
-        self.visualize_sentiment(all_sentiments)
-        
-        average_sentiment = all_sentiments['sentiment'].mean()
-        logger.info(f"Average team sentiment: {average_sentiment}")
-        
+        """Queue a rendering of the sentiment distribution in the background; returns a Future of the image path"""
+        renderer = self.renderer or get_renderer()
+        return renderer.submit(output_path("sentiment_distribution.png"), render_sentiment, df)
+
+    def update_aggregates(self):
+        """Score only the commits and comments added since the last update and fold them into the store"""
+        sources = (('commit', self.data_fetcher.stream_commit_messages, 'message', 'authored_date'),
+                   ('issue_comment', self.data_fetcher.stream_issue_comments, 'body', 'created_at'))
+        applied = {}
+        for source, stream, text_column, time_column in sources:
+            since = self.store.resume_from(source)
+            applied[source] = 0
+            for frame in stream(config.SENTIMENT_FETCH_CHUNK_SIZE, since=since):
+                frame = frame.rename(columns={time_column: 'timestamp'})
+                frame['sentiment'] = self.scorer.score(frame[text_column])
+                applied[source] += self.store.add(source, frame)
+        logger.info(f"Applied new sentiment rows: {applied}")
+        return applied
+
+    def sentiment_trend(self, dimension='all', key='*', granularity='week', start=None, end=None, window=1,
+                        source=None):
+        """Rolling sentiment trend from the aggregates; see MoraleAggregateStore.trend"""
+        return self.store.trend(dimension, key, granularity, start, end, window, source)
+
+    def visualize_trend(self, granularity='week', window=4):
+        """Queue a rendering of the weekly sentiment trend by type; returns a Future of the image path"""
+        renderer = self.renderer or get_renderer()
+        trends = {source: self.store.trend(granularity=granularity, window=window, source=source)
+                  for source in ('commit', 'issue_comment')}
+        return renderer.submit(output_path("sentiment_trend.png"), render_sentiment_trend, trends)
+
+    def summary(self):
+        """Average sentiment overall and per type, read from the aggregates without scoring anything"""
         return {
-            "average_sentiment": average_sentiment,
-            "commit_sentiment": commit_sentiments['sentiment'].mean(),
-            "issue_comment_sentiment": issue_sentiments['sentiment'].mean()
+            "average_sentiment": self.store.average(),
+            "commit_sentiment": self.store.average(source='commit'),
+            "issue_comment_sentiment": self.store.average(source='issue_comment')
         }
+
+    def run_analysis(self, render=None):
+        # Only new commits and comments are scored; the averages come from the running sums
+        self.update_aggregates()
+        results = self.summary()
+        logger.info(f"Average team sentiment: {results['average_sentiment']}")
+
+        if config.RENDERING_ENABLED if render is None else render:
+            self.visualize_trend()
+
+        return results
+
+    def run_updates(self, every=None):
+        """Fold new commits and comments into the aggregates every `every` seconds; blocks the calling thread"""
+        every = every or config.MORALE_UPDATE_SECONDS
+        while True:
+            try:
+                self.run_analysis()
+            except Exception:
+                logger.exception("Updating the sentiment aggregates failed")
+            time.sleep(every)
+
+    def start_updates(self, every=None):
+        """Run run_updates on a daemon thread, so queries only ever read the aggregates"""
+        thread = threading.Thread(target=self.run_updates, kwargs={'every': every}, daemon=True,
+                                  name='morale-updates')
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    TeamMoraleAnalyzer().run_updates()
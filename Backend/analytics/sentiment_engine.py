@@ -0,0 +1,112 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from utils.preprocessing import preprocess_text
+from Backend.config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One VADER analyzer per process; loading its lexicon is the expensive part
+_analyzer = None
+
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def score_texts(texts, preprocess=True):
+    """VADER compound score of every text as float32; NaN for missing texts"""
+    analyzer = _get_analyzer()
+    scores = np.full(len(texts), np.nan, dtype=np.float32)
+    for i, text in enumerate(texts):
+        if isinstance(text, str):
+            scores[i] = analyzer.polarity_scores(preprocess_text(text) if preprocess else text)['compound']
+    return scores
+
+
+class BatchSentimentScorer:
+    """
+    Scores many texts at once: each distinct text once, spread over a pool of worker processes
+
+    Texts are deduplicated before scoring (bot messages, "LGTM" and merge commit messages repeat a
+    lot), the distinct texts are cut into chunks of `chunk_size` and the chunks are scored in
+    `n_workers` processes that each keep a VADER analyzer loaded. Small batches are scored in the
+    calling process, where a round trip to the pool would cost more than the scoring.
+
+    The pool is started on first use and reused until close().
+    """
+
+    def __init__(self, n_workers=None, chunk_size=None, preprocess=True):
+        self.n_workers = n_workers or config.SENTIMENT_WORKERS or os.cpu_count() or 1
+        self.chunk_size = chunk_size or config.SENTIMENT_CHUNK_SIZE
+        self.preprocess = preprocess
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # Spawned, not forked: the gRPC server and Kafka consumers already run threads in this process
+            self._pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_get_analyzer,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _submit(self, texts):
+        """Start scoring texts; returns a function that waits for the float32 scores aligned with texts"""
+        codes, uniques = pd.factorize(pd.Series(texts, dtype=object))
+        uniques = uniques.to_numpy(dtype=object)
+        if self.n_workers == 1 or len(uniques) <= self.chunk_size:
+            unique_scores = score_texts(uniques, self.preprocess)
+            return lambda: self._align(codes, unique_scores)
+
+        chunks = [uniques[start:start + self.chunk_size] for start in range(0, len(uniques), self.chunk_size)]
+        futures = [self.pool.submit(score_texts, chunk, self.preprocess) for chunk in chunks]
+        return lambda: self._align(codes, np.concatenate([future.result() for future in futures]))
+
+    @staticmethod
+    def _align(codes, unique_scores):
+        # Missing texts have code -1; the extra NaN at the end maps them to NaN
+        return np.append(unique_scores, np.float32(np.nan))[codes]
+
+    def score(self, texts):
+        """float32 compound score per text, in input order"""
+        return self._submit(list(texts))()
+
+    def score_frames(self, frames, id_column, text_column):
+        """
+        Score a stream of DataFrames, e.g. the chunks of a chunked database read
+
+        The next frame is fetched while the workers score the previous one, so fetching and
+        scoring overlap.
+
+        :return: (ids, float32 scores aligned with ids)
+        """
+        ids, scores, pending = [], [], None
+        for frame in frames:
+            waiting = self._submit(frame[text_column].tolist())
+            ids.append(frame[id_column].to_numpy())
+            if pending is not None:
+                scores.append(pending())
+            pending = waiting
+        if pending is not None:
+            scores.append(pending())
+        if not ids:
+            return np.zeros(0), np.zeros(0, dtype=np.float32)
+        return np.concatenate(ids), np.concatenate(scores)
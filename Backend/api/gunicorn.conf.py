@@ -0,0 +1,24 @@
+# Usage: gunicorn -c api/gunicorn.conf.py api.predictions:app
+# (api.main:app is the GraphQL gateway; api.predictions:app is the API that loads the models)
+import gc
+# Imported under another name: gunicorn reads every module-level name here as a setting, and
+# `config` is one of them
+from Backend.config import config as settings
+
+bind = f"{settings.API_HOST}:{settings.API_PORT}"
+workers = settings.API_WORKERS
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Import api.predictions once in the master before forking
+preload_app = settings.API_PRELOAD_MODELS
+
+
+def when_ready(server):
+    if preload_app:
+        # Warm the models in the master so every worker starts ready and shares them
+        from api.predictions import warmup_predictors
+        warmup_predictors()
+        # Move everything allocated while preloading into the permanent generation so the
+        # workers' garbage collector never writes to (and un-shares) those pages
+        gc.freeze()
+        server.log.info(f"Froze {gc.get_freeze_count()} preloaded objects before forking workers")
@@ -1,126 +1,85 @@
+# Every service in this module has its own app: predictions_app (the model-serving API, kept in
+# api/predictions.py so it can be imported, preloaded and profiled on its own), lstm_app,
+# analytics_app and gateway_app (GraphQL). `app`, the Dockerfile's entry point, is the gateway.
+# Run one of them with: python -m api.main [predictions|lstm|analytics|gateway]
+from api.predictions import app as predictions_app, setup_logging
 
-from pydantic import BaseModel
-import pandas as pd
-from models.issue_predictor import IssuePredictor
-from models.mr_time_estimator import MRTimeEstimator
-from models.commit_impact_predictor import CommitImpactPredictor
-from Backend.config import MODEL_SAVE_PATH
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi_jwt_auth import AuthJWT
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
-import redis.asyncio as redis
-import os
-from utils.logging_config import setup_logging
 
-app = FastAPI()
 
 
-# Load models
-issue_predictor = IssuePredictor()
-issue_predictor.load(MODEL_SAVE_PATH)
+import asyncio
+import os
+import threading
+import logging
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from Backend.config import config
 
-mr_time_estimator = MRTimeEstimator()
-mr_time_estimator.load(MODEL_SAVE_PATH)
+logger = logging.getLogger(__name__)
 
-commit_impact_predictor = CommitImpactPredictor()
-commit_impact_predictor.load(MODEL_SAVE_PATH)
+lstm_app = FastAPI()
 
-class IssueInput(BaseModel):
-    title: str
-    description: str
-    created_at: str
-    commit_count: int
-    mr_count: int
+# The model (the TFLite export if there is one, otherwise the Keras model) and pandas are loaded
+# by a background warmup task so the server binds immediately; /ready reports when it can serve
+model = None
+model_ready = threading.Event()
+# The optional global model serves every project from one network
+global_model = None
+global_model_ready = threading.Event()
 
-class MRInput(BaseModel):
-    title: str
-    description: str
-    created_at: str
-    commit_count: int
-    related_issue_count: int
 
-class CommitInput(BaseModel):
-    message: str
-    authored_date: str
-    committed_date: str
-    related_mr_count: int
-    related_issue_count: int
-
-
-# Setup Redis for rate limiting
-@app.on_event("startup")
-async def startup():
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-    r = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(r)
-
-# JWT Auth configuration
-class Settings(BaseModel):
-    authjwt_secret_key: str = os.getenv("JWT_SECRET_KEY")
-
-@AuthJWT.load_config
-def get_config():
-    return Settings()
-
-# Add login endpoint
-@app.post("/login")
-def login(username: str, password: str, Authorize: AuthJWT = Depends()):
-    if username == "admin" and password == "password":  # Replace with actual auth logic
-        access_token = Authorize.create_access_token(subject=username)
-        return {"access_token": access_token}
-    raise HTTPException(status_code=401, detail="Invalid username or password")
-
-@app.post("/predict_issue_state")
-@limiter.limit("10/minute")
-async def predict_issue_state(issue: IssueInput, Authorize: AuthJWT = Depends()):
-    Authorize.jwt_required()
+def warmup_lstm():
+    global model
     try:
-        df = pd.DataFrame([issue.dict()])
-        prediction = issue_predictor.predict(df)
-        return {"predicted_state": prediction[0]}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        from ml_models.lstm_tflite import TFLITE_FILENAME, TFLiteLSTMPredictor
 
-@app.post("/estimate_mr_time")
-async def estimate_mr_time(mr: MRInput):
-    try:
-        df = pd.DataFrame([mr.dict()])
-        prediction = mr_time_estimator.predict(df)
-        return {"estimated_time_to_merge": prediction[0]}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        if os.path.exists(os.path.join(config.MODEL_SAVE_PATH, TFLITE_FILENAME)):
+            # The TFLite export serves without importing TensorFlow or Keras
+            lstm_model = TFLiteLSTMPredictor.load(config.MODEL_SAVE_PATH, config.LOOKBACK)
+        else:
+            from ml_models.lstm_model import GitLabInsightLSTMAdvanced
 
-@app.post("/predict_commit_impact")
-async def predict_commit_impact(commit: CommitInput):
-    try:
-        df = pd.DataFrame([commit.dict()])
-        prediction = commit_impact_predictor.predict(df)
-        return {"predicted_impact_score": prediction[0]}
+            lstm_model = GitLabInsightLSTMAdvanced(lookback=config.LOOKBACK)
+            lstm_model.load_model(config.MODEL_SAVE_PATH)
+        lstm_model.warmup()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-if __name__ == "__main__":
-    setup_logging()
+        logger.error(f"LSTM model warmup failed: {str(e)}")
+        return
+    model = lstm_model
+    model_ready.set()
+    logger.info("LSTM model warmup complete")
 
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
 
+def warmup_global_lstm():
+    global global_model
+    if not os.path.exists(os.path.join(config.LSTM_GLOBAL_MODEL_PATH, 'global_lstm_model.h5')):
+        return
+    try:
+        from ml_models.lstm_global import GitLabInsightGlobalLSTM
 
+        lstm_model = GitLabInsightGlobalLSTM()
+        lstm_model.load_model(config.LSTM_GLOBAL_MODEL_PATH)
+        lstm_model.warmup()
+    except Exception as e:
+        logger.error(f"Global LSTM model warmup failed: {str(e)}")
+        return
+    global_model = lstm_model
+    global_model_ready.set()
+    logger.info("Global LSTM model warmup complete")
 
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import pandas as pd
-from ml_models.lstm_model import GitLabInsightLSTMAdvanced
-from Backend.config import config
-from utils.data_validator import validate_data
+@lstm_app.on_event("startup")
+async def start_warmup():
+    loop = asyncio.get_event_loop()
+    loop.run_in_executor(None, warmup_lstm)
+    loop.run_in_executor(None, warmup_global_lstm)
 
-app = FastAPI()
-
-model = GitLabInsightLSTMAdvanced(lookback=config.LOOKBACK)
-model.load_model(config.MODEL_SAVE_PATH)
+@lstm_app.get("/ready")
+async def ready():
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still warming up")
+    return {"ready": True}
 
 class PredictionInput(BaseModel):
     data: list
@@ -129,13 +88,18 @@ class PredictionOutput(BaseModel):
     prediction: float
     is_anomaly: bool
 
-@app.post("/predict", response_model=PredictionOutput)
+@lstm_app.post("/predict", response_model=PredictionOutput)
 async def predict(input: PredictionInput):
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still warming up")
+    import pandas as pd
+    from utils.data_validator import validate_data
+
     try:
         df = pd.DataFrame(input.data)
         validate_data(df)
         
-        X = model.preprocess_data(df)
+        X = model.prepare_window(df)
         prediction = model.predict(X)
         is_anomaly = model.detect_anomalies(np.array([prediction]))[0]
         
@@ -143,22 +107,38 @@ async def predict(input: PredictionInput):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
+class ProjectPrediction(BaseModel):
+    project_id: str
+    prediction: float
 
+@lstm_app.post("/predict/projects", response_model=list[ProjectPrediction])
+async def predict_projects(input: PredictionInput):
+    # Rows of many projects (project_id, date, target) are predicted in one batched model call
+    if not global_model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Global model is not loaded")
+    import pandas as pd
+    from utils.data_validator import validate_data
+
+    try:
+        df = pd.DataFrame(input.data)
+        validate_data(df[['date', 'target']])
+        predictions = global_model.predict_batch(df)
+        return [ProjectPrediction(project_id=str(project_id), prediction=value)
+                for project_id, value in predictions.items()]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 from fastapi import FastAPI, BackgroundTasks
 from advanced_analytics import run_advanced_analytics
 
-app = FastAPI()
+analytics_app = FastAPI()
 
-@app.post("/run-advanced-analytics")
+@analytics_app.post("/run-advanced-analytics")
 async def trigger_advanced_analytics(background_tasks: BackgroundTasks):
     background_tasks.add_task(run_advanced_analytics)
     return {"message": "Advanced analytics job started"}
 
-@app.get("/advanced-analytics-results")
+@analytics_app.get("/advanced-analytics-results")
 async def get_advanced_analytics_results():
     # Implement a method to retrieve the latest results from a database or file
     pass
@@ -175,7 +155,7 @@ import data_service_pb2
 import model_service_pb2
 import analytics_service_pb2
 
-app = FastAPI()
+gateway_app = FastAPI()
 
 # Set up gRPC clients
 data_channel = grpc.insecure_channel('data_service:50051')
@@ -216,9 +196,19 @@ class CollaborationAnalysis:
     communities: int
     key_developers: list[str]
 
+@strawberry.type
+class SentimentBucket:
+    bucket: str
+    count: int
+    mean: float
+    rolling_mean: float
+
 @strawberry.type
 class TeamMoraleAnalysis:
     average_sentiment: float
+    commit_sentiment: float
+    issue_comment_sentiment: float
+    trend: list[SentimentBucket]
 
 @strawberry.type
 class CodeQualityPrediction:
@@ -250,9 +240,17 @@ class Query:
         )
 
     @strawberry.field
-    def analyze_team_morale(self) -> TeamMoraleAnalysis:
-        response = analytics_client.AnalyzeTeamMorale(analytics_service_pb2.TeamMoraleRequest())
-        return TeamMoraleAnalysis(average_sentiment=response.average_sentiment)
+    def analyze_team_morale(self, dimension: str = 'all', key: str = '*', granularity: str = 'week',
+                            start: str = '', end: str = '', window: int = 1) -> TeamMoraleAnalysis:
+        response = analytics_client.AnalyzeTeamMorale(analytics_service_pb2.TeamMoraleRequest(
+            dimension=dimension, key=key, granularity=granularity, start=start, end=end, window=window))
+        return TeamMoraleAnalysis(
+            average_sentiment=response.average_sentiment,
+            commit_sentiment=response.commit_sentiment,
+            issue_comment_sentiment=response.issue_comment_sentiment,
+            trend=[SentimentBucket(bucket=b.bucket, count=b.count, mean=b.mean, rolling_mean=b.rolling_mean)
+                   for b in response.trend]
+        )
 
 @strawberry.type
 class Mutation:
@@ -279,10 +277,23 @@ class Mutation:
 schema = strawberry.Schema(query=Query, mutation=Mutation)
 graphql_app = GraphQLRouter(schema)
 
-app.include_router(graphql_app, prefix="/graphql")
+gateway_app.include_router(graphql_app, prefix="/graphql")
+
+app = gateway_app
+
+SERVICES = {
+    'predictions': predictions_app,
+    'lstm': lstm_app,
+    'analytics': analytics_app,
+    'gateway': gateway_app,
+}
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
 
-    
+    service = sys.argv[1] if len(sys.argv) > 1 else 'predictions'
+    if service not in SERVICES:
+        sys.exit(f"Unknown service {service!r}; expected one of {', '.join(SERVICES)}")
+    setup_logging()
+    uvicorn.run(SERVICES[service], host=config.API_HOST, port=config.API_PORT)
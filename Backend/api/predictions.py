@@ -0,0 +1,228 @@
+import asyncio
+import threading
+from typing import List, Optional
+from pydantic import BaseModel
+from Backend.config import config
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi_jwt_auth import AuthJWT
+from fastapi_limiter import FastAPILimiter
+from fastapi_limiter.depends import RateLimiter
+import redis.asyncio as redis
+import os
+from utils.logging_config import setup_logging
+from utils.model_versioning import get_model_registry
+from models.model_pool import VersionNotServed
+import logging
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI()
+
+
+# Models are loaded by warmup_predictors(), not at import time, so the server binds immediately and
+# pandas, scikit-learn and LightGBM are imported off the startup path
+model_pools = {}
+models_ready = threading.Event()
+predictors_warmup_lock = threading.Lock()
+
+
+def warmup_predictors():
+    # Idempotent: under gunicorn with preloading this already ran in the master before fork
+    with predictors_warmup_lock:
+        if models_ready.is_set():
+            return
+        from models.issue_predictor import IssuePredictor
+        from models.mr_time_estimator import MRTimeEstimator
+        from models.commit_impact_predictor import CommitImpactPredictor
+        from models.model_pool import ModelPool
+
+        for model_cls in (IssuePredictor, MRTimeEstimator, CommitImpactPredictor):
+            pool = ModelPool(model_cls, config.MODEL_SAVE_PATH)
+            pool.set_primary().warmup()
+            pool.preload()
+            model_pools[pool.name] = pool
+        models_ready.set()
+        logger.info("Model warmup complete")
+
+
+def get_pool(model_name):
+    if not models_ready.is_set():
+        raise HTTPException(status_code=503, detail="Models are still warming up")
+    if model_name not in model_pools:
+        raise HTTPException(status_code=404, detail=f"Unknown model {model_name}")
+    return model_pools[model_name]
+
+
+def to_frame(rows):
+    import pandas as pd
+    return pd.DataFrame([row.dict() for row in rows])
+
+
+def hot_swap(model_name, version):
+    # Runs on the registry watcher thread: the new version is loaded into the pool before it
+    # is selected, so requests keep using the previous one until the replacement is ready
+    pool = model_pools[model_name]
+    model = pool.set_shadow(version) if config.MODEL_POOL_SHADOW_NEW_VERSIONS else pool.set_primary(version)
+    model.warmup()
+
+class IssueInput(BaseModel):
+    title: str
+    description: str
+    created_at: str
+    commit_count: int
+    mr_count: int
+
+class MRInput(BaseModel):
+    title: str
+    description: str
+    created_at: str
+    commit_count: int
+    related_issue_count: int
+
+class CommitInput(BaseModel):
+    message: str
+    authored_date: str
+    committed_date: str
+    related_mr_count: int
+    related_issue_count: int
+
+
+# Setup Redis for rate limiting
+@app.on_event("startup")
+async def startup():
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+    r = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+    await FastAPILimiter.init(r)
+
+def warmup_worker():
+    try:
+        warmup_predictors()
+    except Exception as e:
+        logger.error(f"Model warmup failed: {str(e)}")
+        return
+    # Watch the registry from each worker (threads started in a preloading master do not survive fork)
+    for pool in model_pools.values():
+        get_model_registry().subscribe(pool.name, hot_swap, current_version=pool.primary_version)
+
+@app.on_event("startup")
+async def start_warmup():
+    asyncio.get_event_loop().run_in_executor(None, warmup_worker)
+
+@app.get("/ready")
+async def ready():
+    if not models_ready.is_set():
+        raise HTTPException(status_code=503, detail="Models are still warming up")
+    return {"ready": True, "model_versions": {name: pool.primary_version for name, pool in model_pools.items()}}
+
+# JWT Auth configuration
+class Settings(BaseModel):
+    authjwt_secret_key: str = os.getenv("JWT_SECRET_KEY")
+
+@AuthJWT.load_config
+def get_config():
+    return Settings()
+
+# Add login endpoint
+@app.post("/login")
+def login(username: str, password: str, Authorize: AuthJWT = Depends()):
+    if username == "admin" and password == "password":  # Replace with actual auth logic
+        access_token = Authorize.create_access_token(subject=username)
+        return {"access_token": access_token}
+    raise HTTPException(status_code=401, detail="Invalid username or password")
+
+# fastapi-limiter rate limits through a dependency (the Redis backend is set up in startup())
+@app.post("/predict_issue_state", dependencies=[Depends(RateLimiter(times=10, minutes=1))])
+async def predict_issue_state(issue: IssueInput, version: Optional[int] = None, shadow_version: Optional[int] = None,
+                              Authorize: AuthJWT = Depends()):
+    Authorize.jwt_required()
+    pool = get_pool('issue_predictor')
+    try:
+        prediction, model_version = pool.predict(to_frame([issue]), version, shadow_version)
+        return {"predicted_state": prediction[0], "model_version": model_version}
+    except VersionNotServed as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/estimate_mr_time")
+async def estimate_mr_time(mr: MRInput, version: Optional[int] = None, shadow_version: Optional[int] = None):
+    pool = get_pool('mr_time_estimator')
+    try:
+        prediction, model_version = pool.predict(to_frame([mr]), version, shadow_version)
+        return {"estimated_time_to_merge": prediction[0], "model_version": model_version}
+    except VersionNotServed as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict_commit_impact")
+async def predict_commit_impact(commit: CommitInput, version: Optional[int] = None, shadow_version: Optional[int] = None):
+    pool = get_pool('commit_impact_predictor')
+    try:
+        prediction, model_version = pool.predict(to_frame([commit]), version, shadow_version)
+        return {"predicted_impact_score": prediction[0], "model_version": model_version}
+    except VersionNotServed as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# The explain endpoints are plain functions so FastAPI runs the CPU-bound SHAP computation in its
+# thread pool instead of on the event loop
+def explain_rows(predictor, rows, fast, approximate):
+    shap_values = predictor.explain(to_frame(rows), fast=fast, approximate=approximate)
+    return {"model_version": predictor.version, "shap_values": shap_values.tolist()}
+
+@app.post("/explain_issue_state")
+def explain_issue_state(issues: List[IssueInput], fast: bool = False, approximate: bool = False,
+                        version: Optional[int] = None):
+    pool = get_pool('issue_predictor')
+    try:
+        return explain_rows(pool.resident(version), issues, fast, approximate)
+    except VersionNotServed as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/explain_mr_time")
+def explain_mr_time(mrs: List[MRInput], fast: bool = False, approximate: bool = False,
+                    version: Optional[int] = None):
+    pool = get_pool('mr_time_estimator')
+    try:
+        return explain_rows(pool.resident(version), mrs, fast, approximate)
+    except VersionNotServed as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/explain_commit_impact")
+def explain_commit_impact(commits: List[CommitInput], fast: bool = False, approximate: bool = False,
+                          version: Optional[int] = None):
+    pool = get_pool('commit_impact_predictor')
+    try:
+        return explain_rows(pool.resident(version), commits, fast, approximate)
+    except VersionNotServed as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/model_pool/stats")
+async def model_pool_stats():
+    return {name: pool.stats_summary() for name, pool in model_pools.items()}
+
+@app.post("/model_pool/{model_name}/shadow")
+async def set_shadow_version(model_name: str, version: Optional[int] = None):
+    pool = get_pool(model_name)
+    try:
+        pool.set_shadow(version)
+        return pool.stats_summary()
+    except VersionNotServed as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+if __name__ == "__main__":
+    setup_logging()
+
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,50 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from benchmark_lint import python_files
+
+
+def run_benchmark(root, n_files=100, copies=20):
+    from analytics.code_metrics import extract_metrics, extract_metrics_many
+    from analytics.lint_pool import LinterPool
+
+    sources = python_files(root, n_files)
+    print(f"{len(sources)} files, {sum(len(source.splitlines()) for source in sources)} lines")
+
+    with tempfile.TemporaryDirectory() as directory:
+        with LinterPool(n_workers=1, cache_path=os.path.join(directory, 'lint.db')) as pool:
+            start = time.perf_counter()
+            pylint_metrics = pool.lint(sources)
+            pylint_seconds = time.perf_counter() - start
+    print(f"{'pylint (linter pool, 1 worker)':<32} {pylint_seconds:>8.2f} s")
+
+    start = time.perf_counter()
+    ast_metrics = [extract_metrics(source) for source in sources]
+    ast_seconds = time.perf_counter() - start
+    print(f"{'ast extractor, in-process':<32} {ast_seconds:>8.2f} s  ({pylint_seconds / ast_seconds:.0f}x)")
+
+    many = sources * copies
+    start = time.perf_counter()
+    extract_metrics_many(many)
+    seconds = time.perf_counter() - start
+    print(f"{f'ast extractor, pool ({len(many)} files)':<32} {seconds:>8.2f} s  ({len(many) / seconds:,.0f} files/s)")
+
+    # How closely the features the model uses follow pylint's
+    ok = [i for i, metrics in enumerate(pylint_metrics) if 'error' not in metrics]
+    for name, value in (('statements', lambda m: m['statements']),
+                        ('complexity', lambda m: m['complexity']),
+                        ('error_count', lambda m: sum(m['message_counts'][t] for t in ('error', 'warning', 'convention'))),
+                        ('score', lambda m: m['score'])):
+        pylint_values = np.array([value(pylint_metrics[i]) for i in ok], dtype=float)
+        ast_values = np.array([value(ast_metrics[i]) for i in ok], dtype=float)
+        print(f"  {name:<12} correlation with pylint {np.corrcoef(pylint_values, ast_values)[0, 1]:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AST metrics extractor vs pylint")
+    parser.add_argument('root', nargs='?', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--files', type=int, default=100)
+    args = parser.parse_args()
+    run_benchmark(args.root, args.files)
@@ -0,0 +1,115 @@
+import argparse
+import time
+import numpy as np
+from scipy import sparse
+
+
+def planted_partition_graph(n_nodes, n_edges, n_communities, p_inside=0.8, seed=42):
+    """Symmetric weighted CSR graph whose edges mostly fall inside randomly assigned communities"""
+    rng = np.random.default_rng(seed)
+    community = rng.integers(0, n_communities, n_nodes)
+    order = np.argsort(community, kind='stable')
+    starts = np.searchsorted(community[order], np.arange(n_communities))
+    sizes = np.bincount(community, minlength=n_communities)
+
+    sources = rng.integers(0, n_nodes, n_edges)
+    same = order[starts[community[sources]] + (rng.random(n_edges) * sizes[community[sources]]).astype(np.int64)]
+    targets = np.where(rng.random(n_edges) < p_inside, same, rng.integers(0, n_nodes, n_edges))
+    keep = sources != targets
+    upper = sparse.csr_matrix((np.ones(keep.sum()), (sources[keep], targets[keep])), shape=(n_nodes, n_nodes))
+    return (upper + upper.T).tocsr(), community
+
+
+def random_graph(n_nodes, p, seed=0):
+    """Symmetric weighted CSR graph with independent random edges, i.e. no community structure to find"""
+    rng = np.random.default_rng(seed)
+    upper = sparse.triu(sparse.random(n_nodes, n_nodes, density=p, random_state=seed,
+                                      data_rvs=lambda size: rng.integers(1, 10, size)), k=1)
+    return (upper + upper.T).tocsr()
+
+
+def weak_structure_benchmark(n_nodes=50, densities=(0.1, 0.3, 0.6), n_graphs=20):
+    """Louvain on small random graphs, where batched moves are most likely to lower modularity"""
+    from analytics.graph_algorithms import louvain, modularity
+
+    try:
+        import networkx as nx
+        import community
+    except ImportError:
+        community = None
+    for p in densities:
+        ours, reference = [], []
+        for seed in range(n_graphs):
+            adjacency = random_graph(n_nodes, p, seed)
+            ours.append(modularity(adjacency, louvain(adjacency)))
+            if community is not None:
+                graph = nx.from_scipy_sparse_array(adjacency)
+                reference.append(community.modularity(community.best_partition(graph, random_state=0), graph))
+        line = f"{f'random {n_nodes} nodes, p={p}':<28} modularity mean {np.mean(ours):.4f}, min {np.min(ours):.4f}"
+        if reference:
+            line += f"  (python-louvain mean {np.mean(reference):.4f}, min {np.min(reference):.4f})"
+        print(line)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(n_nodes=200000, n_edges=1050000, n_communities=2000, k=10, compare_networkx=False):
+    from analytics.graph_algorithms import eigenvector_centrality, louvain, modularity, top_k_central
+
+    adjacency, planted = planted_partition_graph(n_nodes, n_edges, n_communities)
+    print(f"graph: {n_nodes} nodes, {adjacency.nnz // 2} edges, {n_communities} planted communities "
+          f"(planted modularity {modularity(adjacency, planted):.4f})")
+
+    labels, seconds = timed(louvain, adjacency)
+    print(f"{'sparse louvain':<28} {seconds:>8.2f} s  modularity {modularity(adjacency, labels):.4f}, "
+          f"{labels.max() + 1} communities")
+
+    exact, seconds = timed(eigenvector_centrality, adjacency, tol=1e-10)
+    print(f"{'centrality (tol 1e-10)':<28} {seconds:>8.2f} s")
+    centrality, seconds = timed(eigenvector_centrality, adjacency)
+    print(f"{'centrality cold':<28} {seconds:>8.2f} s  max |error| {np.abs(centrality - exact).max():.1e}")
+
+    # A day of activity: 1% more edges, then both queries warm-started from the previous results
+    grown, _ = planted_partition_graph(n_nodes, n_edges // 100, n_communities, seed=7)
+    grown = (adjacency + grown).tocsr()
+    _, seconds = timed(eigenvector_centrality, grown)
+    print(f"{'centrality after +1%, cold':<28} {seconds:>8.2f} s")
+    _, seconds = timed(eigenvector_centrality, grown, start=centrality)
+    print(f"{'centrality after +1%, warm':<28} {seconds:>8.2f} s")
+    _, seconds = timed(louvain, grown)
+    print(f"{'louvain after +1%, cold':<28} {seconds:>8.2f} s")
+    warm_labels, seconds = timed(louvain, grown, initial=labels)
+    print(f"{'louvain after +1%, warm':<28} {seconds:>8.2f} s  modularity {modularity(grown, warm_labels):.4f}")
+
+    true_top = set(np.argsort(-exact)[:k])
+    (top, _), seconds = timed(top_k_central, adjacency, k)
+    print(f"{f'approximate top-{k}':<28} {seconds:>8.2f} s  recall {len(true_top & set(top)) / k:.0%}")
+
+    if compare_networkx:
+        import networkx as nx
+        import community
+
+        graph = nx.from_scipy_sparse_array(adjacency)
+        partition, seconds = timed(community.best_partition, graph, random_state=0)
+        print(f"{'python-louvain':<28} {seconds:>8.2f} s  modularity {community.modularity(partition, graph):.4f}")
+        try:
+            _, seconds = timed(nx.eigenvector_centrality, graph, weight='weight')
+            print(f"{'nx.eigenvector_centrality':<28} {seconds:>8.2f} s")
+        except nx.PowerIterationFailedConvergence as e:
+            print(f"{'nx.eigenvector_centrality':<28} failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Community detection and centrality on a synthetic collaboration graph")
+    parser.add_argument('--nodes', type=int, default=200000)
+    parser.add_argument('--edges', type=int, default=1050000)
+    parser.add_argument('--communities', type=int, default=2000)
+    parser.add_argument('--compare-networkx', action='store_true',
+                        help="Also run python-louvain and nx.eigenvector_centrality (slow)")
+    args = parser.parse_args()
+    run_benchmark(args.nodes, args.edges, args.communities, compare_networkx=args.compare_networkx)
+    weak_structure_benchmark()
@@ -0,0 +1,81 @@
+import time
+import numpy as np
+from lightgbm import LGBMClassifier
+from sklearn.metrics import roc_auc_score
+from models.ensemble_model import GitLabInsightEnsemble
+from models.issue_predictor import IssuePredictor
+from benchmark_explain import make_issues, make_preprocessor
+
+
+def make_labelled_issues(n_rows, seed=42):
+    """Synthetic issues whose state depends on their activity, so the models have something to learn"""
+    df = make_issues(n_rows, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    score = 0.6 * df['commit_count'] + 1.2 * df['mr_count'] - df['time_to_update'] / 30 + rng.normal(0, 1.5, n_rows)
+    df['state'] = (score > np.median(score)).astype(int)
+    return df
+
+
+def single_row_latency_ms(predict_proba, rows, repeats=200):
+    """Median time to score one raw row, preprocessing included, as the API does"""
+    timings = []
+    for i in range(min(repeats, len(rows))):
+        row = rows.iloc[i:i + 1]
+        start = time.perf_counter()
+        predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def run_benchmark(n_rows=3000):
+    df = make_labelled_issues(n_rows)
+
+    # The ensemble sees the structured columns; the free text is IssuePredictor's
+    ensemble = GitLabInsightEnsemble()
+    X_train, X_test, y_train, y_test = ensemble.preprocess_data(
+        df.drop(columns=['title', 'description']).rename(columns={'state': 'target'}))
+    ensemble.build_ensemble()
+    start = time.perf_counter()
+    ensemble.ensemble_model.fit(X_train, y_train)
+    print(f"Ensemble fit: {time.perf_counter() - start:.1f}s")
+
+    teacher_test = ensemble.ensemble_model.predict_proba(X_test)[:, 1]
+    in_sample = ensemble.ensemble_model.predict_proba(X_train)[:, 1]
+    start = time.perf_counter()
+    student, report = ensemble.distill(X_train, y_train)
+    print(f"Distillation with out-of-fold soft labels: {time.perf_counter() - start:.1f}s")
+    # The same student trained on in-sample probabilities, for comparison
+    in_sample_student = type(student)(ensemble.preprocessor).fit_soft_labels(X_train, in_sample)
+    student_test = student.model.predict(X_test)
+    in_sample_test = in_sample_student.model.predict(X_test)
+    print(f"  mean in-sample teacher confidence |p - 0.5|: {np.mean(np.abs(in_sample - 0.5)):.3f}, "
+          f"held out: {np.mean(np.abs(teacher_test - 0.5)):.3f}")
+    for label, predictions in (('out-of-fold', student_test), ('in-sample', in_sample_test)):
+        print(f"  student ({label} labels): ROC AUC {roc_auc_score(y_test, predictions):.4f}, "
+              f"mean |student - teacher| {np.mean(np.abs(predictions - teacher_test)):.4f}, "
+              f"agreement {np.mean((predictions > 0.5) == (teacher_test > 0.5)):.3f}")
+    print(f"  teacher ROC AUC {roc_auc_score(y_test, teacher_test):.4f}")
+
+    # An IssuePredictor on the same issues, fitted with mid-range values of its search space
+    issue_predictor = IssuePredictor()
+    issue_predictor.preprocessor = make_preprocessor()
+    issue_train = df.iloc[:int(0.8 * n_rows)]
+    features = issue_predictor.preprocessor.fit_transform(issue_train.drop(columns=['state']))
+    issue_predictor.model = LGBMClassifier(n_estimators=500, max_depth=7, num_leaves=60, learning_rate=0.05,
+                                           random_state=42, verbose=-1).fit(features, issue_train['state'])
+
+    raw = ensemble.X_test
+    issue_rows = df.loc[raw.index].drop(columns=['state'])
+    latencies = {
+        'ensemble': single_row_latency_ms(
+            lambda row: ensemble.predict_proba(ensemble.preprocessor.transform(row)), raw),
+        'student': single_row_latency_ms(student.predict_proba, raw),
+        'IssuePredictor': single_row_latency_ms(
+            lambda row: issue_predictor.model.predict_proba(issue_predictor.preprocessor.transform(row)), issue_rows),
+    }
+    for name, latency in latencies.items():
+        print(f"  single-row latency, {name}: {latency:.2f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark()
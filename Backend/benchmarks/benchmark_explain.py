@@ -0,0 +1,83 @@
+import time
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from models.issue_predictor import IssuePredictor
+
+
+def make_issues(n_rows, seed=42, vocabulary=3000):
+    rng = np.random.default_rng(seed)
+    # A vocabulary large enough that the TF-IDF features are sparse, as they are on real issues
+    words = np.array([f"word{i}" for i in range(vocabulary)])
+    return pd.DataFrame({
+        'title': [' '.join(rng.choice(words, 4)) for _ in range(n_rows)],
+        'description': [' '.join(rng.choice(words, 20)) for _ in range(n_rows)],
+        'title_length': rng.integers(5, 80, n_rows),
+        'description_length': rng.integers(0, 2000, n_rows),
+        'time_to_update': rng.exponential(48, n_rows),
+        'commit_count': rng.poisson(3, n_rows),
+        'mr_count': rng.poisson(1, n_rows),
+        'day_of_week': rng.integers(0, 7, n_rows).astype(str),
+        'month': rng.integers(1, 13, n_rows).astype(str),
+        'is_weekend': rng.integers(0, 2, n_rows).astype(str),
+        'state': rng.integers(0, 2, n_rows),
+    })
+
+
+def make_preprocessor():
+    """IssuePredictor's features, with each text column handed to TfidfVectorizer as 1-D as it expects"""
+    numeric = Pipeline([('imputer', SimpleImputer(strategy='median')), ('scaler', StandardScaler())])
+    categorical = Pipeline([('imputer', SimpleImputer(strategy='constant', fill_value='missing')),
+                            ('onehot', OneHotEncoder(handle_unknown='ignore'))])
+    return ColumnTransformer([
+        ('num', numeric, ['title_length', 'description_length', 'time_to_update', 'commit_count', 'mr_count']),
+        ('cat', categorical, ['day_of_week', 'month', 'is_weekend']),
+        ('text_title', TfidfVectorizer(max_features=1000, stop_words='english'), 'title'),
+        ('text_desc', TfidfVectorizer(max_features=1000, stop_words='english'), 'description'),
+    ])
+
+
+def run_benchmark(n_train=20000, n_explain=1000, n_classes=(2, 3)):
+    for classes in n_classes:
+        df = make_issues(n_train)
+        df['state'] = np.random.default_rng(0).integers(0, classes, n_train)
+        predictor = IssuePredictor()
+        predictor.preprocessor = make_preprocessor()
+        X = predictor.preprocessor.fit_transform(df.drop(columns=['state']))
+        predictor.model = LGBMClassifier(n_estimators=300, num_leaves=63, random_state=42, verbose=-1).fit(X, df['state'])
+        predictor.version = 1
+
+        rows = make_issues(n_explain, seed=7).drop(columns=['state'])
+        print(f"{classes} classes, {X.shape[1]} features")
+
+        start = time.perf_counter()
+        predictor.get_explainer()
+        print(f"  Explainer construction: {time.perf_counter() - start:.3f}s (paid once per model version)")
+
+        start = time.perf_counter()
+        predictor.get_leaf_contributions()
+        print(f"  Saabas leaf table: {time.perf_counter() - start:.3f}s (paid once per model version)")
+
+        results = {}
+        for label, options in (('TreeExplainer', {}), ('pred_contrib', {'fast': True}),
+                               ('Saabas', {'approximate': True})):
+            start = time.perf_counter()
+            results[label] = predictor.explain(rows, **options)
+            print(f"  {label}: {n_explain} rows in {time.perf_counter() - start:.3f}s, shape {results[label].shape}")
+        exact, approximate = results['TreeExplainer'], results['Saabas']
+        print(f"  max |pred_contrib - TreeExplainer|: {np.abs(results['pred_contrib'] - exact).max():.1e}")
+        # Both add up to the raw prediction minus a baseline, and the baselines differ slightly: LightGBM's
+        # root values are weighted by hessian, SHAP's expected value by row count
+        print(f"  max |sum Saabas - sum TreeExplainer| per row: {np.abs(approximate.sum(-1) - exact.sum(-1)).max():.1e}")
+        top_agreement = np.mean(np.abs(approximate).argmax(-1) == np.abs(exact).argmax(-1))
+        correlation = np.corrcoef(approximate.ravel(), exact.ravel())[0, 1]
+        print(f"  Saabas vs TreeExplainer: top feature agrees on {top_agreement:.1%} of rows, correlation {correlation:.3f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
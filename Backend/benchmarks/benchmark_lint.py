@@ -0,0 +1,56 @@
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def python_files(root, limit):
+    paths = sorted(glob.glob(os.path.join(root, '**', '*.py'), recursive=True))[:limit]
+    return [open(path, encoding='utf-8').read() for path in paths]
+
+
+def lint_with_subprocesses(sources):
+    """The previous path: one pylint process per file"""
+    for source in sources:
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+            f.write(source)
+        try:
+            subprocess.run([sys.executable, '-m', 'pylint', '--output-format=json', f.name], capture_output=True, text=True)
+        finally:
+            os.remove(f.name)
+
+
+def run_benchmark(root, n_files=100, n_workers=None):
+    from analytics.lint_pool import LinterPool
+
+    sources = python_files(root, n_files)
+    print(f"{len(sources)} files, {sum(len(source.splitlines()) for source in sources)} lines")
+
+    start = time.perf_counter()
+    lint_with_subprocesses(sources)
+    subprocess_seconds = time.perf_counter() - start
+    print(f"{'pylint subprocess per file':<28} {subprocess_seconds:>8.2f} s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        with LinterPool(n_workers=n_workers, cache_path=os.path.join(directory, 'lint.db')) as pool:
+            start = time.perf_counter()
+            results = pool.lint(sources)
+            seconds = time.perf_counter() - start
+            failed = sum('error' in metrics for metrics in results)
+            print(f"{f'linter pool, {pool.n_workers} workers':<28} {seconds:>8.2f} s  "
+                  f"({subprocess_seconds / seconds:.1f}x, {failed} failed)")
+            start = time.perf_counter()
+            pool.lint(sources)
+            print(f"{'linter pool, cached':<28} {time.perf_counter() - start:>8.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pylint per-file subprocesses vs the persistent linter pool")
+    parser.add_argument('root', nargs='?', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+    run_benchmark(args.root, args.files, args.workers)
@@ -0,0 +1,103 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Each runtime is loaded in a fresh interpreter so its resident memory is measured in isolation
+MEMORY_PROBE = """
+import sys
+import numpy as np
+kind, path, lookback = sys.argv[1], sys.argv[2], int(sys.argv[3])
+window = np.zeros((1, lookback, 5), dtype=np.float32)
+if kind == 'keras':
+    from tensorflow.keras.models import load_model
+    model = load_model(path, compile=False)
+    model(window, training=False)
+else:
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    interpreter = Interpreter(model_path=path)
+    interpreter.allocate_tensors()
+    interpreter.set_tensor(interpreter.get_input_details()[0]['index'], window)
+    interpreter.invoke()
+# VmHWM rather than ru_maxrss, which Linux carries over from the (large) benchmark process across exec
+with open('/proc/self/status') as f:
+    print(next(line.split()[1] for line in f if line.startswith('VmHWM:')))
+"""
+
+
+def peak_rss_mb(kind, path, lookback, python=None):
+    """Peak RSS of loading and running the model once; `python` runs the probe in another environment"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([python or sys.executable, '-c', MEMORY_PROBE, kind, path, str(lookback)], cwd=backend_dir,
+                            capture_output=True, text=True, env=dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3'))
+    if result.returncode != 0:
+        return float('nan')
+    return int(result.stdout.split()[-1]) / 1024
+
+
+def median_latency_ms(fn, windows, repeats):
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(windows[i % len(windows)][None])
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+
+def run_benchmark(model_path=None, lookback=60, n_windows=200, repeats=500, tolerance=1e-3, runtime_python=None):
+    from tensorflow.keras.models import load_model
+    from models.lstm_model import GitLabInsightLSTMAdvanced
+    from models.lstm_tflite import QUANTIZATIONS, export_tflite, max_abs_difference, _interpreter_class
+
+    workdir = tempfile.mkdtemp()
+    if model_path:
+        model = load_model(os.path.join(model_path, 'lstm_model.h5'), compile=False)
+    else:
+        # An untrained model has the production architecture, which is what latency and size depend on
+        model = GitLabInsightLSTMAdvanced(lookback=lookback).create_model()
+    keras_path = os.path.join(workdir, 'lstm_model.h5')
+    model.save(keras_path)
+
+    windows = np.random.default_rng(42).random((n_windows, lookback, 5), dtype=np.float32)
+    predict_latency = median_latency_ms(lambda x: model.predict(x, verbose=0), windows, min(repeats, 50))
+
+    print(f"{'runtime':<16} {'size (KB)':>10} {'latency (ms)':>13} {'peak RSS (MB)':>14} {'max |diff|':>11}")
+    print(f"{'keras predict':<16} {os.path.getsize(keras_path) / 1024:>10.0f} {predict_latency:>13.3f} "
+          f"{peak_rss_mb('keras', keras_path, lookback):>14.0f} {'-':>11}")
+
+    for quantization in QUANTIZATIONS:
+        path = os.path.join(workdir, f"lstm_model_{quantization or 'float32'}.tflite")
+        size = export_tflite(model, path, lookback, quantization=quantization)
+        difference = max_abs_difference(model, path, windows)
+
+        interpreter = _interpreter_class()(model_path=path)
+        interpreter.allocate_tensors()
+        input_index = interpreter.get_input_details()[0]['index']
+
+        def invoke(x):
+            interpreter.set_tensor(input_index, x)
+            interpreter.invoke()
+
+        latency = median_latency_ms(invoke, windows, repeats)
+        flag = '' if quantization or difference <= tolerance else '  <- exceeds tolerance'
+        print(f"{'tflite ' + (quantization or 'float32'):<16} {size / 1024:>10.0f} {latency:>13.3f} "
+              f"{peak_rss_mb('tflite', path, lookback, runtime_python):>14.0f} {difference:>11.2e}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Keras LSTM with its TFLite exports")
+    parser.add_argument('--model-path', help="Directory holding lstm_model.h5 (default: untrained model)")
+    parser.add_argument('--tolerance', type=float, default=1e-3,
+                        help="Max allowed |Keras - TFLite float32| in scaled units")
+    parser.add_argument('--runtime-python',
+                        help="Python of an environment with tflite-runtime, as in the serving image, to measure "
+                             "the TFLite memory with (default: this one, which may fall back to TensorFlow)")
+    args = parser.parse_args()
+    run_benchmark(args.model_path, tolerance=args.tolerance, runtime_python=args.runtime_python)
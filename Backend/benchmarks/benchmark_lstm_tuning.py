@@ -0,0 +1,113 @@
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+
+# The search that tune_lstm replaced: RandomizedSearchCV(n_iter=10, cv=3) over KerasRegressor
+BASELINE_SPACE = {
+    'lstm_units': [30, 50, 70, 100],
+    'dropout_rate': [0.1, 0.2, 0.3],
+    'batch_size': [16, 32, 64],
+    'epochs': [50, 100, 150],
+}
+
+
+def make_series(n_days=600, seed=42):
+    """Synthetic daily counts: trend, weekly season and noise"""
+    rng = np.random.default_rng(seed)
+    days = np.arange(n_days)
+    target = 20 + 0.02 * days + 5 * np.sin(2 * np.pi * days / 7) + rng.normal(0, 1.5, n_days)
+    return pd.DataFrame({'date': pd.date_range('2022-01-01', periods=n_days, freq='D'), 'target': target})
+
+
+def baseline_search(lstm_model, X_train, y_train, n_iter=10, cv=3, epochs_scale=1.0, seed=42):
+    """
+    The old search, rebuilt without KerasRegressor (gone from Keras 3)
+
+    Same sampler, same folds (KFold without shuffling, RandomizedSearchCV's default for a
+    regressor) and every config trained for its full epoch count.
+    """
+    from sklearn.model_selection import KFold, ParameterSampler
+
+    results = []
+    for params in ParameterSampler(BASELINE_SPACE, n_iter=n_iter, random_state=seed):
+        epochs = max(1, int(params['epochs'] * epochs_scale))
+        losses = []
+        for fit_idx, val_idx in KFold(n_splits=cv).split(X_train):
+            model = lstm_model.create_model(lstm_units=params['lstm_units'], dropout_rate=params['dropout_rate'])
+            model.fit(X_train[fit_idx], y_train[fit_idx], epochs=epochs, batch_size=params['batch_size'], verbose=0)
+            losses.append(model.evaluate(X_train[val_idx], y_train[val_idx], verbose=0))
+        results.append((float(np.mean(losses)), dict(params, epochs=epochs)))
+    return min(results, key=lambda result: result[0])[1]
+
+
+def test_rmse(lstm_model, params, X_train, X_test, y_train, y_test, early_stopping):
+    """RMSE in original units of a model refit on all training windows with the chosen params"""
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    model = lstm_model.create_model(lstm_units=params['lstm_units'], dropout_rate=params['dropout_rate'])
+    if early_stopping:
+        # What train_and_evaluate does with the tuned params
+        model.fit(X_train, y_train, epochs=params['epochs'], batch_size=params['batch_size'], validation_split=0.1,
+                  callbacks=[EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)], verbose=0)
+    else:
+        model.fit(X_train, y_train, epochs=params['epochs'], batch_size=params['batch_size'], verbose=0)
+    scaled_rmse = np.sqrt(np.mean((model.predict(X_test, verbose=0)[:, 0] - y_test) ** 2))
+    return float(scaled_rmse * lstm_model.scaler.data_range_[0])
+
+
+def run_benchmark(n_trials=12, max_epochs=150, lookback=14, n_jobs=(1,), pruners=('median',), time_budget=1800,
+                  baseline=True, epochs_scale=1.0):
+    """
+    Wall time and test RMSE of the LSTM search against the randomized search it replaced
+
+    Each search picks parameters on the training windows; the chosen parameters are then refit on
+    all of them and scored on the held-out test windows.
+    """
+    from models.lstm_model import GitLabInsightLSTMAdvanced, build_lstm
+    from models.lstm_tuning import tune_lstm
+
+    lstm_model = GitLabInsightLSTMAdvanced(lookback=lookback)
+    X_train, X_test, y_train, y_test = lstm_model.preprocess_data(make_series())
+    X_train, X_test = np.ascontiguousarray(X_train), np.ascontiguousarray(X_test)
+    rows = []
+    if baseline:
+        start = time.perf_counter()
+        params = baseline_search(lstm_model, X_train, y_train, epochs_scale=epochs_scale)
+        seconds = time.perf_counter() - start
+        rows.append(('randomized search (old)', seconds, params,
+                     test_rmse(lstm_model, params, X_train, X_test, y_train, y_test, early_stopping=False)))
+    for pruner in pruners:
+        for jobs in n_jobs:
+            start = time.perf_counter()
+            params = tune_lstm(build_lstm, lstm_model.scaled_series, np.arange(lstm_model.train_size), lookback,
+                               n_trials=n_trials, time_budget=time_budget, max_epochs=max_epochs, n_jobs=jobs,
+                               intra_op_threads=1 if jobs > 1 else None, pruner=pruner,
+                               build_kwargs={'lookback': lookback, 'n_features': lstm_model.scaled_series.shape[1]})
+            seconds = time.perf_counter() - start
+            rows.append((f'tune_lstm {pruner}, n_jobs={jobs}', seconds, params,
+                         test_rmse(lstm_model, params, X_train, X_test, y_train, y_test, early_stopping=True)))
+
+    for name, seconds, params, rmse in rows:
+        print(f"{name:<40} {seconds:8.1f} s  test RMSE {rmse:.3f}  {params}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the LSTM hyperparameter search with the randomized search "
+                                                 "it replaced on a synthetic series")
+    parser.add_argument('--trials', type=int, default=12)
+    parser.add_argument('--epochs', type=int, default=150, help="max_epochs of tune_lstm")
+    parser.add_argument('--jobs', type=int, nargs='*', default=[1])
+    parser.add_argument('--pruners', nargs='*', default=['median', 'successive_halving', 'hyperband'])
+    parser.add_argument('--no-baseline', action='store_true')
+    parser.add_argument('--epochs-scale', type=float, default=1.0,
+                        help="Scale the baseline's 50/100/150 epochs down for a quicker run")
+    args = parser.parse_args()
+    # tune_lstm logs how many trials completed and how many were pruned
+    logging.basicConfig(level=logging.INFO)
+    optuna_logging = logging.getLogger('optuna')
+    optuna_logging.setLevel(logging.WARNING)
+    run_benchmark(args.trials, args.epochs, n_jobs=args.jobs, pruners=args.pruners, baseline=not args.no_baseline,
+                  epochs_scale=args.epochs_scale)
@@ -0,0 +1,49 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+
+def make_comments(n_rows, duplicate_share=0.3, seed=42):
+    """Synthetic issue comments; duplicate_share of them repeat a small set of stock replies"""
+    rng = np.random.default_rng(seed)
+    words = np.array(['great', 'work', 'this', 'breaks', 'the', 'build', 'thanks', 'bug', 'please', 'fix',
+                      'terrible', 'slow', 'love', 'it', 'not', 'sure', 'why', 'failing', 'good', 'catch'])
+    stock = np.array(['LGTM', 'Thanks!', 'Merged.', 'Please rebase', '+1', 'Closing as duplicate'])
+    texts = [' '.join(rng.choice(words, rng.integers(5, 30))) for _ in range(n_rows)]
+    repeat = rng.random(n_rows) < duplicate_share
+    texts = np.where(repeat, rng.choice(stock, n_rows), np.array(texts, dtype=object))
+    return pd.DataFrame({'id': np.arange(n_rows), 'body': texts})
+
+
+def run_benchmark(n_rows=200000, chunk_rows=50000, workers=None):
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    from utils.preprocessing import preprocess_text
+    from analytics.sentiment_engine import BatchSentimentScorer
+
+    comments = make_comments(n_rows)
+    baseline_rows = min(n_rows, 20000)
+    analyzer = SentimentIntensityAnalyzer()
+    start = time.perf_counter()
+    baseline = [analyzer.polarity_scores(preprocess_text(text))['compound'] for text in comments['body'][:baseline_rows]]
+    baseline_rate = baseline_rows / (time.perf_counter() - start)
+    print(f"{'one text at a time':<24} {baseline_rate:>10,.0f} texts/s")
+
+    for n_workers in workers or sorted({1, 2, 4, os.cpu_count() or 1}):
+        frames = (comments[start:start + chunk_rows] for start in range(0, n_rows, chunk_rows))
+        with BatchSentimentScorer(n_workers=n_workers) as scorer:
+            start = time.perf_counter()
+            ids, scores = scorer.score_frames(frames, 'id', 'body')
+            seconds = time.perf_counter() - start
+        assert np.allclose(scores[:baseline_rows], baseline, atol=1e-4)
+        print(f"{f'batch, {n_workers} workers':<24} {n_rows / seconds:>10,.0f} texts/s  "
+              f"({n_rows / seconds / baseline_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of batch sentiment scoring on synthetic comments")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='*')
+    args = parser.parse_args()
+    run_benchmark(args.rows, workers=args.workers)
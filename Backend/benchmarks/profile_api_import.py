@@ -0,0 +1,41 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+def profile_import(module, top):
+    """
+    Import a module in a fresh interpreter with -X importtime and summarise where the time goes
+
+    Run it on this commit and on its parent to compare API cold-start import cost before and
+    after the lazy-loading changes.
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=backend_dir, capture_output=True, text=True)
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # Lines look like "import time: <self us> | <cumulative us> | <indent><module>"
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else f"import {module} failed")
+    # Nested imports are indented, and their time is already counted in their parent's cumulative time
+    total_us = sum(cumulative for cumulative, _, name in timings if not name.startswith(' '))
+    print(f"Total import time for {module}: {total_us / 1e6:.2f}s across {len(timings)} modules")
+    print(f"{'cumulative (ms)':>16} {'self (ms)':>10}  module")
+    for cumulative_us, self_us, name in sorted(timings, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {name.strip()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile import time of an API module")
+    parser.add_argument('--module', default='api.predictions')
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+    profile_import(args.module, args.top)
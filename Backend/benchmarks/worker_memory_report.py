@@ -0,0 +1,48 @@
+import argparse
+import os
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def child_pids(pid):
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        with open(os.path.join(task_dir, tid, 'children')) as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def memory_usage(pid):
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            field, _, value = line.partition(':')
+            if field in SMAPS_FIELDS:
+                usage[field] = int(value.split()[0]) // 1024
+    return usage
+
+
+def report(master_pid):
+    """
+    Print per-worker memory (MiB) for a running gunicorn master
+
+    Run once with API_PRELOAD_MODELS=false and once with the default to compare. Rss counts
+    shared pages in every worker; Pss splits them between the processes sharing them, so the
+    sum of Pss is the real footprint of the worker pool.
+    """
+    print(f"{'pid':>8} " + ' '.join(f"{field:>13}" for field in SMAPS_FIELDS))
+    totals = dict.fromkeys(SMAPS_FIELDS, 0)
+    for pid in [master_pid] + child_pids(master_pid):
+        usage = memory_usage(pid)
+        print(f"{pid:>8} " + ' '.join(f"{usage.get(field, 0):>13}" for field in SMAPS_FIELDS))
+        for field in SMAPS_FIELDS:
+            totals[field] += usage.get(field, 0)
+    print(f"{'total':>8} " + ' '.join(f"{totals[field]:>13}" for field in SMAPS_FIELDS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report memory of gunicorn API workers")
+    parser.add_argument('master_pid', type=int)
+    args = parser.parse_args()
+    report(args.master_pid)
@@ -27,10 +27,69 @@ class Config:
 
     # Model persistence
     MODEL_SAVE_PATH = os.getenv('MODEL_SAVE_PATH', 'saved_models')
+    # Per-series LSTM hidden/cell state for incremental (stateful) inference
+    LSTM_STATE_PATH = os.getenv('LSTM_STATE_PATH', os.path.join(MODEL_SAVE_PATH, 'lstm_state.npz'))
+    # One LSTM over all projects (see models/lstm_global.py)
+    LSTM_GLOBAL_MODEL_PATH = os.getenv('LSTM_GLOBAL_MODEL_PATH', os.path.join(MODEL_SAVE_PATH, 'global_lstm'))
+    LSTM_SERIES_EMBEDDING_DIM = int(os.getenv('LSTM_SERIES_EMBEDDING_DIM', 8))
+    # AutoML search (see models/automl_search.py)
+    AUTOML_MAX_TIME_MINS = float(os.getenv('AUTOML_MAX_TIME_MINS', 120))
+    AUTOML_CHECKPOINT_PATH = os.getenv('AUTOML_CHECKPOINT_PATH', os.path.join(MODEL_SAVE_PATH, 'automl_checkpoint.json'))
+    AUTOML_SCORE_CACHE_PATH = os.getenv('AUTOML_SCORE_CACHE_PATH', os.path.join(MODEL_SAVE_PATH, 'automl_scores.db'))
+    # Rows in the first successive-halving rung; 0 scores every candidate on the full training set
+    AUTOML_SUBSAMPLE_MIN = int(os.getenv('AUTOML_SUBSAMPLE_MIN', 10000)) or None
+    # Incremental collaboration graph (see analytics/collaboration_service.py)
+    COLLABORATION_SERVICE_ENABLED = os.getenv('COLLABORATION_SERVICE_ENABLED', 'false').lower() == 'true'
+    COLLABORATION_SNAPSHOT_PATH = os.getenv('COLLABORATION_SNAPSHOT_PATH', os.path.join(MODEL_SAVE_PATH, 'collaboration_graph.npz'))
+    COLLABORATION_SNAPSHOT_SECONDS = float(os.getenv('COLLABORATION_SNAPSHOT_SECONDS', 300))
+    # Collaboration link weights halve after this many days; 0 keeps them forever
+    COLLABORATION_HALF_LIFE_DAYS = float(os.getenv('COLLABORATION_HALF_LIFE_DAYS', 90)) or None
+    # Network and sentiment charts are rendered in the background, never on the request path
+    RENDERING_ENABLED = os.getenv('RENDERING_ENABLED', 'true').lower() == 'true'
+    RENDERING_OUTPUT_DIR = os.getenv('RENDERING_OUTPUT_DIR', '.')
+    RENDERING_MAX_NODES = int(os.getenv('RENDERING_MAX_NODES', 2000))
+    RENDERING_LAYOUT_PATH = os.getenv('RENDERING_LAYOUT_PATH', os.path.join(MODEL_SAVE_PATH, 'network_layout.json'))
+    # Batch sentiment scoring (see analytics/sentiment_engine.py); 0 workers means one per core
+    SENTIMENT_WORKERS = int(os.getenv('SENTIMENT_WORKERS', 0))
+    SENTIMENT_CHUNK_SIZE = int(os.getenv('SENTIMENT_CHUNK_SIZE', 5000))
+    SENTIMENT_FETCH_CHUNK_SIZE = int(os.getenv('SENTIMENT_FETCH_CHUNK_SIZE', 100000))
+    # Incremental sentiment aggregates (see analytics/morale_store.py)
+    MORALE_AGGREGATES_PATH = os.getenv('MORALE_AGGREGATES_PATH', 'morale_aggregates.db')
+    # Optional JSON file mapping author names to team names
+    MORALE_TEAMS_PATH = os.getenv('MORALE_TEAMS_PATH', '')
+    # Commits and comments can reach the database long after their own timestamp; updates re-read
+    # this many days before the latest one applied and skip the ids already counted
+    MORALE_LATE_ARRIVAL_DAYS = float(os.getenv('MORALE_LATE_ARRIVAL_DAYS', 7))
+    # Seconds between ingestions of new commits and comments; 0 leaves ingestion to
+    # `python -m analytics.sentiment_analysis` running as its own job
+    MORALE_UPDATE_SECONDS = float(os.getenv('MORALE_UPDATE_SECONDS', 300))
+    # Code quality linting (see analytics/lint_pool.py); 0 workers means one per core
+    LINT_WORKERS = int(os.getenv('LINT_WORKERS', 0))
+    LINT_TIMEOUT_SECONDS = float(os.getenv('LINT_TIMEOUT_SECONDS', 60))
+    LINT_CACHE_PATH = os.getenv('LINT_CACHE_PATH', 'lint_results.db')
+    # 'pylint' (analytics/lint_pool.py) or 'ast' (analytics/code_metrics.py); a model must be trained and used with the same one
+    CODE_METRICS_BACKEND = os.getenv('CODE_METRICS_BACKEND', 'pylint')
+    CODE_METRICS_WORKERS = int(os.getenv('CODE_METRICS_WORKERS', 0))
+    MODEL_REGISTRY_PATH = os.getenv('MODEL_REGISTRY_PATH', 'model_versions.db')
+    MODEL_REGISTRY_POLL_SECONDS = float(os.getenv('MODEL_REGISTRY_POLL_SECONDS', 5))
+
+    # Model pool (multiple resident versions per predictor for shadow and A/B serving)
+    MODEL_POOL_MEMORY_BUDGET_MB = int(os.getenv('MODEL_POOL_MEMORY_BUDGET_MB', 1024))
+    MODEL_POOL_SHADOW_WORKERS = int(os.getenv('MODEL_POOL_SHADOW_WORKERS', 2))
+    # Shadow evaluations queued or running at once; more are dropped so shadowing never backs up serving
+    MODEL_POOL_SHADOW_QUEUE = int(os.getenv('MODEL_POOL_SHADOW_QUEUE', 16))
+    # Versions besides the primary and shadow that requests may ask for, as "name:version,...";
+    # they are loaded at warmup and never evicted. Requests for any other version get a 404.
+    MODEL_POOL_PINNED_VERSIONS = os.getenv('MODEL_POOL_PINNED_VERSIONS', '')
+    # When true, newly published versions are shadowed against the primary instead of replacing it
+    MODEL_POOL_SHADOW_NEW_VERSIONS = os.getenv('MODEL_POOL_SHADOW_NEW_VERSIONS', 'false').lower() == 'true'
 
     # API parameters
     API_HOST = os.getenv('API_HOST', '0.0.0.0')
     API_PORT = int(os.getenv('API_PORT', 8000))
+    API_WORKERS = int(os.getenv('API_WORKERS', 8))
+    # Load models in the gunicorn master so forked workers share their pages copy-on-write
+    API_PRELOAD_MODELS = os.getenv('API_PRELOAD_MODELS', 'true').lower() == 'true'
 
      # Kafka configurations
     KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092')
@@ -32,6 +32,7 @@ class DataFetcher:
     def fetch_merge_requests(self):
         query = """
         SELECT mr.id, mr.title, mr.description, mr.state, mr.created_at, mr.merged_at,
+               mr.author_name as author,
                COUNT(DISTINCT c.id) as commit_count,
                COUNT(DISTINCT i.id) as related_issue_count,
                ARRAY_AGG(DISTINCT r.username) as reviewers
@@ -39,7 +40,7 @@ class DataFetcher:
         LEFT JOIN commits c ON c.id = ANY(mr.commit_ids)
         LEFT JOIN issues i ON i.id = ANY(mr.closes_issues)
         LEFT JOIN reviewers r ON r.merge_request_id = mr.id
-        GROUP BY mr.id, mr.title, mr.description, mr.state, mr.created_at, mr.merged_at
+        GROUP BY mr.id, mr.title, mr.description, mr.state, mr.created_at, mr.merged_at, mr.author_name
         """
         return pd.read_sql(query, self.engine)
 
@@ -58,6 +59,35 @@ class DataFetcher:
         """
         return pd.read_sql(query, self.engine)
 
+    def _stream(self, span_name, query, chunksize, params=None):
+        # The span is opened in the generator so that it lasts until the last chunk has been read; it is
+        # not made current, as the caller's own spans run while the generator is suspended
+        with tracer.start_span(span_name):
+            # A server-side cursor keeps only one chunk of rows in memory at a time
+            with self.engine.connect().execution_options(stream_results=True) as connection:
+                yield from pd.read_sql(query, connection, params=params, chunksize=chunksize)
+
+    def stream_commit_messages(self, chunksize=100000, since=None):
+        """Commit messages in authored_date order as DataFrames of at most chunksize rows, from `since` on if given"""
+        query = f"""
+        SELECT c.id, c.message, c.author_name, c.project_id, c.authored_date
+        FROM commits c
+        {'WHERE c.authored_date >= %s' if since else ''}
+        ORDER BY c.authored_date
+        """
+        yield from self._stream("stream_commit_messages", query, chunksize, (since,) if since else None)
+
+    def stream_issue_comments(self, chunksize=100000, since=None):
+        """Issue comments in created_at order as DataFrames of at most chunksize rows, from `since` on if given"""
+        query = f"""
+        SELECT ic.id, ic.issue_id, ic.body, ic.author_name, i.project_id, ic.created_at
+        FROM issue_comments ic
+        JOIN issues i ON i.id = ic.issue_id
+        {'WHERE ic.created_at >= %s' if since else ''}
+        ORDER BY ic.created_at
+        """
+        yield from self._stream("stream_issue_comments", query, chunksize, (since,) if since else None)
+
     @tracer.start_as_current_span("fetch_repository_files")
     def fetch_repository_files(self, limit=None):
         query = f"""
@@ -1,4 +1,4 @@
-from confluent_kafka import Consumer, KafkaError
+from confluent_kafka import Consumer, KafkaError, KafkaException
 import json
 from Backend.config import config
 import logging
@@ -6,11 +6,14 @@ import logging
 logger = logging.getLogger(__name__)
 
 class GitLabEventConsumer:
-    def __init__(self, group_id):
+    def __init__(self, group_id, enable_auto_commit=True):
+        # Consumers that persist their own state turn auto commit off and call commit() after saving it
+        self.enable_auto_commit = enable_auto_commit
         self.consumer = Consumer({
             'bootstrap.servers': config.KAFKA_BOOTSTRAP_SERVERS,
             'group.id': group_id,
-            'auto.offset.reset': 'earliest'
+            'auto.offset.reset': 'earliest',
+            'enable.auto.commit': enable_auto_commit
         })
         self.consumer.subscribe([config.KAFKA_TOPIC])
 
@@ -35,5 +38,28 @@ class GitLabEventConsumer:
             self.consumer.close()
         return events
 
+    def stream_events(self, batch_size=500, timeout=1.0):
+        """Yield lists of up to batch_size decoded events until the consumer is closed or interrupted"""
+        while True:
+            messages = self.consumer.consume(num_messages=batch_size, timeout=timeout)
+            events = []
+            for msg in messages:
+                if msg.error():
+                    if msg.error().code() != KafkaError._PARTITION_EOF:
+                        logger.error(f'Error: {msg.error()}')
+                    continue
+                events.append(json.loads(msg.value().decode('utf-8')))
+            if events:
+                yield events
+
+    def commit(self):
+        """Synchronously commit the offsets of every event returned so far"""
+        try:
+            self.consumer.commit(asynchronous=False)
+        except KafkaException as e:
+            # Nothing consumed since the last commit
+            if e.args[0].code() != KafkaError._NO_OFFSET:
+                raise
+
     def close(self):
         self.consumer.close()
@@ -1,21 +1,45 @@
+import os
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score
-from tpot import TPOTClassifier
 import mlflow
 import mlflow.sklearn
+from .automl_search import CheckpointedTPOTClassifier
 
 mlflow.set_experiment("GitLab_Insight_AI_AutoML")
 
 class GitLabInsightAutoML:
-    def __init__(self, generations=100, population_size=100, cv=5, random_state=42):
-        self.tpot = TPOTClassifier(generations=generations,
-                                   population_size=population_size,
-                                   cv=cv,
-                                   random_state=random_state,
-                                   verbosity=2,
-                                   scoring='roc_auc')
+    def __init__(self, generations=100, population_size=100, cv=5, random_state=42, max_time_mins=120,
+                 max_eval_time_mins=5, n_jobs=1, checkpoint_path=None, checkpoint_every=300,
+                 warm_start_from=None, cache_path=None, subsample_min=None, halving_factor=3):
+        """
+        :param max_time_mins: Wall-clock budget of the whole search; the best pipeline found so far is
+                              used when it runs out
+        :param max_eval_time_mins: Budget of a single pipeline's cross-validation; slower pipelines are discarded
+        :param checkpoint_path: JSON file the population and Pareto front are written to every
+                                checkpoint_every seconds and when the search ends
+        :param warm_start_from: Checkpoint of a previous run whose Pareto front seeds the population
+        :param cache_path: SQLite file of pipeline scores shared across runs on the same data
+        :param subsample_min: Rows of the first successive-halving rung; candidates are screened on
+                              stratified subsamples growing by halving_factor and only the best reach
+                              full CV. None scores every candidate on all rows
+        """
+        self.tpot = CheckpointedTPOTClassifier(generations=generations,
+                                               population_size=population_size,
+                                               cv=cv,
+                                               random_state=random_state,
+                                               verbosity=2,
+                                               scoring='roc_auc',
+                                               max_time_mins=max_time_mins,
+                                               max_eval_time_mins=max_eval_time_mins,
+                                               n_jobs=n_jobs,
+                                               checkpoint_path=checkpoint_path,
+                                               checkpoint_every=checkpoint_every,
+                                               warm_start_from=warm_start_from,
+                                               cache_path=cache_path,
+                                               subsample_min=subsample_min,
+                                               halving_factor=halving_factor)
         self.best_model = None
 
     def preprocess_data(self, df):
@@ -31,6 +55,9 @@ class GitLabInsightAutoML:
             mlflow.log_param("generations", self.tpot.generations)
             mlflow.log_param("population_size", self.tpot.population_size)
             mlflow.log_param("cv", self.tpot.cv)
+            mlflow.log_param("max_time_mins", self.tpot.max_time_mins)
+            mlflow.log_param("max_eval_time_mins", self.tpot.max_eval_time_mins)
+            mlflow.log_param("subsample_min", self.tpot.subsample_min)
             
             # Fit TPOT
             self.tpot.fit(X_train, y_train)
@@ -75,8 +102,15 @@ if __name__ == "__main__":
     # Load your data
     df = pd.read_csv("your_data.csv")
     
-    # Initialize and use AutoML
-    automl = GitLabInsightAutoML()
+    from Backend.config import config
+
+    # Initialize and use AutoML; rerunning resumes from the last checkpoint and skips scored pipelines
+    checkpoint = config.AUTOML_CHECKPOINT_PATH
+    automl = GitLabInsightAutoML(max_time_mins=config.AUTOML_MAX_TIME_MINS,
+                                 checkpoint_path=checkpoint,
+                                 warm_start_from=checkpoint if os.path.exists(checkpoint) else None,
+                                 cache_path=config.AUTOML_SCORE_CACHE_PATH,
+                                 subsample_min=config.AUTOML_SUBSAMPLE_MIN)
     X_train, X_test, y_train, y_test = automl.preprocess_data(df)
     automl.train_and_evaluate(X_train, X_test, y_train, y_test)
 
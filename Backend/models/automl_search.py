@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from functools import partial
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.model_selection import check_cv, train_test_split
+import tpot
+from tpot import TPOTClassifier
+from tpot.gp_deap import initialize_stats_dict, _wrapped_cross_val_score
+
+logger = logging.getLogger(__name__)
+
+# CheckpointedTPOTClassifier overrides private TPOT methods; these are the versions it was checked against
+SUPPORTED_TPOT_VERSIONS = ('0.11.7', '0.12.2')
+TPOT_HOOKS = ('_fit_init', '_evaluate_individuals', '_preprocess_individuals', '_combine_individual_stats',
+              '_update_evaluated_individuals_', '_check_periodic_pipeline', '_stop_by_max_time_mins')
+
+if tpot.__version__ not in SUPPORTED_TPOT_VERSIONS:
+    raise ImportError(f"models.automl_search supports TPOT {', '.join(SUPPORTED_TPOT_VERSIONS)}, "
+                      f"found {tpot.__version__}")
+_missing = [name for name in TPOT_HOOKS if not hasattr(TPOTClassifier, name)]
+if _missing:
+    raise ImportError(f"TPOT {tpot.__version__} lacks the methods models.automl_search overrides: {_missing}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pipeline_scores (
+    fingerprint TEXT NOT NULL,
+    pipeline TEXT NOT NULL,
+    operator_count INTEGER NOT NULL,
+    cv_score REAL NOT NULL,
+    PRIMARY KEY (fingerprint, pipeline)
+);
+"""
+
+
+def data_fingerprint(X, y, *settings):
+    """Hash of the training data and of every setting that changes a pipeline's CV score"""
+    digest = hashlib.sha1()
+    for part in (X, y):
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+            digest.update(repr(list(part.columns) if isinstance(part, pd.DataFrame) else part.name).encode())
+        else:
+            part = np.ascontiguousarray(part)
+            digest.update(repr((part.dtype.str, part.shape)).encode())
+            digest.update(part.tobytes())
+    digest.update(repr(settings).encode())
+    return digest.hexdigest()
+
+
+class PipelineScoreCache:
+    """
+    Persistent CV scores of TPOT pipelines, keyed by data fingerprint and pipeline string
+
+    Scores live in SQLite so concurrent searches can share one cache and every score is on disk as
+    soon as its generation has been evaluated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def load(self, fingerprint):
+        rows = self._connection.execute(
+            "SELECT pipeline, operator_count, cv_score FROM pipeline_scores WHERE fingerprint = ?", (fingerprint,))
+        return {pipeline: (operator_count, cv_score) for pipeline, operator_count, cv_score in rows}
+
+    def store(self, fingerprint, scores):
+        """scores maps pipeline string -> (operator_count, cv_score)"""
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pipeline_scores (fingerprint, pipeline, operator_count, cv_score) VALUES (?, ?, ?, ?)",
+                [(fingerprint, pipeline, int(count), float(score)) for pipeline, (count, score) in scores.items()])
+
+    def close(self):
+        self._connection.close()
+
+
+def load_checkpoint(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class CheckpointedTPOTClassifier(TPOTClassifier):
+    """
+    TPOTClassifier that checkpoints its search and never scores the same pipeline twice on the same data
+
+    - Every `checkpoint_every` seconds the current population and Pareto front are written to
+      `checkpoint_path` as pipeline strings, so a killed job can be resumed.
+    - `warm_start_from` names such a checkpoint; its Pareto front (then its population) seeds the
+      initial population, topped up with random pipelines.
+    - With `cache_path`, every finite CV score is stored under a fingerprint of the training data,
+      cv and scoring. Cached pipelines are taken as already evaluated, so repeated and resumed runs
+      only pay for new pipelines. Pipelines that failed or hit max_eval_time_mins are not cached,
+      so a later run with a larger per-pipeline budget scores them again.
+
+    - With `subsample_min`, new pipelines are evaluated by successive halving: first with CV on a
+      stratified subsample of subsample_min rows, then on halving_factor times more rows for the
+      best 1/halving_factor of them, and so on; only the last survivors are scored on the full
+      data. The others get a score of -inf, like a failed pipeline, and keep their subsample score
+      only as 'subsample_score' in evaluated_individuals_; they are kept out of the Pareto front,
+      so they never reach a checkpoint or the final pick. Only full-data scores enter the Pareto
+      front and the score cache, so the final pipeline is chosen on full-data CV and refitted on
+      all rows as usual.
+
+    The wall-clock and per-pipeline budgets are TPOT's own max_time_mins and max_eval_time_mins.
+    """
+
+    def __init__(self, generations=100, population_size=100, cv=5, scoring='roc_auc', max_time_mins=None,
+                 max_eval_time_mins=5, n_jobs=1, random_state=None, verbosity=0, config_dict=None, checkpoint_path=None,
+                 checkpoint_every=60, warm_start_from=None, cache_path=None, subsample_min=None, halving_factor=3):
+        # Parameters are spelled out because scikit-learn's get_params() does not accept **kwargs
+        super().__init__(generations=generations, population_size=population_size, cv=cv, scoring=scoring,
+                         max_time_mins=max_time_mins, max_eval_time_mins=max_eval_time_mins, n_jobs=n_jobs,
+                         random_state=random_state, verbosity=verbosity, config_dict=config_dict)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.warm_start_from = warm_start_from
+        self.cache_path = cache_path
+        self.subsample_min = subsample_min
+        self.halving_factor = halving_factor
+
+    def fit(self, features, target, sample_weight=None, groups=None):
+        self._fingerprint = data_fingerprint(features, target, self.cv, self.scoring, self.random_state)
+        self._score_cache = PipelineScoreCache(self.cache_path) if self.cache_path else None
+        self._last_checkpoint = time.monotonic()
+        self._eliminated = set()
+        self._population = None
+        try:
+            return super().fit(features, target, sample_weight=sample_weight, groups=groups)
+        finally:
+            # The final population is written even when the wall-clock budget ended the search
+            if self.checkpoint_path and getattr(self, '_population', None):
+                self.save_checkpoint(self.checkpoint_path)
+            if self._score_cache is not None:
+                self._score_cache.close()
+                self._score_cache = None
+
+    def _fit_init(self):
+        super()._fit_init()
+        if self._score_cache is not None:
+            cached = self._score_cache.load(self._fingerprint)
+            for pipeline, (operator_count, cv_score) in cached.items():
+                self.evaluated_individuals_.setdefault(pipeline, {
+                    'generation': 'cached', 'mutation_count': 0, 'crossover_count': 0, 'predecessor': ('ROOT',),
+                    'operator_count': operator_count, 'internal_cv_score': cv_score,
+                })
+            logger.info(f"Loaded {len(cached)} cached pipeline scores")
+        if self.warm_start_from and not self._pop:
+            self._pop = self._seed_population(load_checkpoint(self.warm_start_from))
+
+    def _seed_population(self, checkpoint):
+        from deap import creator
+
+        seeds = []
+        for pipeline in dict.fromkeys(checkpoint.get('pareto_front', []) + checkpoint.get('population', [])):
+            try:
+                individual = creator.Individual.from_string(pipeline, self._pset)
+            except Exception:
+                # Operators that are no longer in the config cannot be rebuilt
+                logger.warning(f"Skipping pipeline that cannot be rebuilt: {pipeline}")
+                continue
+            initialize_stats_dict(individual)
+            seeds.append(individual)
+            if len(seeds) == self.population_size:
+                break
+        logger.info(f"Warm-starting from {len(seeds)} pipelines of {self.warm_start_from}")
+        return seeds + self._toolbox.population(n=self.population_size - len(seeds))
+
+    def _update_evaluated_individuals_(self, result_score_list, eval_individuals_str, operator_counts, stats_dicts):
+        super()._update_evaluated_individuals_(result_score_list, eval_individuals_str, operator_counts, stats_dicts)
+        if self._score_cache is not None:
+            scores = {pipeline: (operator_counts[pipeline], score)
+                      for pipeline, score in zip(eval_individuals_str, result_score_list)
+                      if np.isfinite(score)}
+            self._score_cache.store(self._fingerprint, scores)
+
+    def _rung_sizes(self, n_rows):
+        sizes = []
+        size = self.subsample_min
+        while size < n_rows:
+            sizes.append(int(size))
+            size *= self.halving_factor
+        return sizes
+
+    def _score_pipelines(self, pipelines, features, target, sample_weight=None, groups=None):
+        score = partial(_wrapped_cross_val_score, features=features, target=target,
+                        cv=check_cv(self.cv, target, classifier=True), scoring_function=self.scoring_function,
+                        sample_weight=sample_weight, groups=groups,
+                        timeout=max(int(self.max_eval_time_mins * 60), 1))
+        self._stop_by_max_time_mins()
+        if self._n_jobs == 1:
+            scores = [score(sklearn_pipeline=pipeline) for pipeline in pipelines]
+        else:
+            scores = Parallel(n_jobs=self._n_jobs)(delayed(score)(sklearn_pipeline=pipeline) for pipeline in pipelines)
+        return np.array([-np.inf if isinstance(value, str) else value for value in scores], dtype=np.float64)
+
+    def _evaluate_individuals(self, population, features, target, sample_weight=None, groups=None):
+        sizes = self._rung_sizes(len(target)) if self.subsample_min else []
+        candidates = [individual for individual in population
+                      if not individual.fitness.valid and str(individual) not in self.evaluated_individuals_]
+        if not sizes or len(candidates) < 2:
+            population = super()._evaluate_individuals(population, features, target, sample_weight, groups)
+            self._prune_pareto_front()
+            return population
+
+        operator_counts, names, pipelines, stats_dicts = self._preprocess_individuals(candidates)
+        survivors = np.arange(len(names))
+        low_fidelity = {}
+        for rung, size in enumerate(sizes):
+            if len(survivors) <= 1:
+                break
+            rows, _ = train_test_split(np.arange(len(target)), train_size=size, stratify=target,
+                                       random_state=None if self.random_state is None else self.random_state + rung)
+            scores = self._score_pipelines([pipelines[i] for i in survivors], features[rows], target[rows],
+                                           None if sample_weight is None else np.asarray(sample_weight)[rows],
+                                           None if groups is None else np.asarray(groups)[rows])
+            order = np.argsort(-scores, kind='stable')
+            for i, score in zip(survivors, scores):
+                low_fidelity[names[i]] = (score, size)
+            survivors = survivors[order[:max(1, int(np.ceil(len(survivors) / self.halving_factor)))]]
+
+        # Eliminated pipelines are marked as evaluated with a score of -inf so TPOT only scores the
+        # survivors on full data and never prefers an eliminated pipeline to a fully scored one
+        eliminated = set(names) - {names[i] for i in survivors}
+        for name in eliminated:
+            score, size = low_fidelity[name]
+            self.evaluated_individuals_[name] = self._combine_individual_stats(
+                operator_counts[name], -np.inf, stats_dicts[name])
+            self.evaluated_individuals_[name]['subsample_score'] = score
+            self.evaluated_individuals_[name]['subsample_size'] = size
+        self._eliminated |= eliminated
+        population = super()._evaluate_individuals(population, features, target, sample_weight, groups)
+        self._prune_pareto_front()
+        logger.info(f"Successive halving: {len(names)} new pipelines, {len(survivors)} scored on all {len(target)} rows")
+        return population
+
+    def _prune_pareto_front(self):
+        # TPOT updates the front from the whole population every generation, and a pipeline with
+        # fewer operators is not dominated even at -inf, so eliminated pipelines are removed each time
+        if not self._pareto_front:
+            return
+        for index in reversed(range(len(self._pareto_front))):
+            if str(self._pareto_front[index]) in self._eliminated:
+                self._pareto_front.remove(index)
+
+    def _check_periodic_pipeline(self, gen):
+        super()._check_periodic_pipeline(gen)
+        # TPOT drops self._pop when fit ends (unless warm_start), so the final checkpoint is written from this copy
+        self._population = list(self._pop)
+        if self.checkpoint_path and time.monotonic() - self._last_checkpoint >= self.checkpoint_every:
+            self.save_checkpoint(self.checkpoint_path, gen)
+            self._last_checkpoint = time.monotonic()
+
+    def save_checkpoint(self, path, generation=None):
+        pareto_front = [str(individual) for individual in self._pareto_front.items] if self._pareto_front else []
+        checkpoint = {
+            'fingerprint': self._fingerprint,
+            'generation': generation,
+            'pareto_front': pareto_front,
+            'population': [str(individual) for individual in self._population],
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+        logger.info(f"Checkpointed {len(checkpoint['population'])} pipelines to {path}")
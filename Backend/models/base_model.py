@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
+import os
 import joblib
-import optuna
+import numpy as np
+import pandas as pd
+from scipy import sparse
 from sklearn.model_selection import train_test_split
-from utils.model_versioning import ModelVersioning
+from utils.model_versioning import get_model_registry
+from utils.artifact_store import dump_artifact, load_artifact, artifact_size
 from sklearn.metrics import classification_report, roc_auc_score, mean_absolute_error
 import logging
 
@@ -10,13 +14,55 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
+def saabas_leaf_contributions(booster):
+    """
+    Saabas contributions of every leaf of a LightGBM booster
+
+    Walking from the root to a leaf, each split credits its feature with the change in the node's
+    expected output. The sums along every root-to-leaf path are computed once here, so explaining
+    a row only needs the leaf it reaches in each tree.
+
+    :return: (sparse matrix with one row per leaf and n_outputs * n_features columns, index of the
+             first row of every tree, n_outputs)
+    """
+    dump = booster.dump_model()
+    n_features = booster.num_feature()
+    n_outputs = dump['num_tree_per_iteration']
+    rows, columns, values, offsets = [], [], [], []
+    n_leaves = 0
+    for tree in dump['tree_info']:
+        offsets.append(n_leaves)
+        output = tree['tree_index'] % n_outputs
+        stack = [(tree['tree_structure'], {})]
+        while stack:
+            node, path = stack.pop()
+            if 'split_feature' not in node:
+                rows.extend([n_leaves + node.get('leaf_index', 0)] * len(path))
+                columns.extend(output * n_features + feature for feature in path)
+                values.extend(path.values())
+                continue
+            for child in (node['left_child'], node['right_child']):
+                child_value = child['internal_value'] if 'split_feature' in child else child['leaf_value']
+                child_path = dict(path)
+                feature = node['split_feature']
+                child_path[feature] = child_path.get(feature, 0.0) + child_value - node['internal_value']
+                stack.append((child, child_path))
+        n_leaves += tree['num_leaves']
+    matrix = sparse.csr_matrix((values, (rows, columns)), shape=(n_leaves, n_outputs * n_features))
+    return matrix, np.asarray(offsets), n_outputs
+
+
 class BaseModel(ABC):
     def __init__(self, name):
         self.name = name
         self.model = None
         self.preprocessor = None
         self.version = None
-        self.versioning = ModelVersioning()
+        self.artifact_size = None
+        self.versioning = get_model_registry()
+        self._explainer = None
+        self._explainer_version = None
+        self._leaf_contributions = None
 
 
     @abstractmethod
@@ -43,7 +89,12 @@ class BaseModel(ABC):
         pass
 
     def train(self, df, target):
+        # Optuna is only needed for training; importing it lazily keeps API startup fast
+        import optuna
+
         X_train, X_test, y_train, y_test = self.prepare_data(df, target)
+        # Kept so save() can record the held-out metric in the model registry
+        self.X_test, self.y_test = X_test, y_test
         self.preprocessor = self.create_preprocessor()
         
         X_train_processed = self.preprocessor.fit_transform(X_train)
@@ -57,6 +108,7 @@ class BaseModel(ABC):
 
         self.model = self.create_model(best_params)
         self.model.fit(X_train_processed, y_train)
+        self._explainer = None
 
         y_pred = self.model.predict(X_test_processed)
         self.evaluate(y_test, y_pred)
@@ -65,45 +117,149 @@ class BaseModel(ABC):
     def evaluate(self, y_true, y_pred):
         pass
 
-    def save(self, path):
-        joblib.dump({'model': self.model, 'preprocessor': self.preprocessor}, f"{path}/{self.name}.joblib")
-        logger.info(f"Model {self.name} saved to {path}/{self.name}.joblib")
-
-    def load(self, path):
-        loaded = joblib.load(f"{path}/{self.name}.joblib")
-        self.model = loaded['model']
-        self.preprocessor = loaded['preprocessor']
-        logger.info(f"Model {self.name} loaded from {path}/{self.name}.joblib")
-
     def predict(self, X):
         X_processed = self.preprocessor.transform(X)
         return self.model.predict(X_processed)
     
-    def explain(self, X):
-        explainer = shap.TreeExplainer(self.model)
-        shap_values = explainer.shap_values(self.preprocessor.transform(X))
+    def warmup(self):
+        # One prediction on a blank row pays the first-call costs before real traffic arrives
+        row = {}
+        for name, _, columns in self.preprocessor.transformers_:
+            if name != 'remainder':
+                # A text transformer takes its single column as a string, not a list
+                columns = [columns] if isinstance(columns, str) else columns
+                row.update(dict.fromkeys(columns, '' if name.startswith('text') else 0))
+        self.predict(pd.DataFrame([row]))
+
+    def get_explainer(self):
+        # TreeExplainer construction walks every tree, so build it once per loaded model version
+        if self._explainer is None or self._explainer_version != self.version:
+            import shap
+            self._explainer = shap.TreeExplainer(self.model)
+            self._explainer_version = self.version
+        return self._explainer
+
+    def get_leaf_contributions(self):
+        # Built once per fitted booster, like the SHAP explainer
+        booster = self.model.booster_
+        if self._leaf_contributions is None or self._leaf_contributions[0] is not booster:
+            self._leaf_contributions = (booster,) + saabas_leaf_contributions(booster)
+        return self._leaf_contributions[1:]
+
+    def explain(self, X, fast=False, approximate=False, batch_size=1000):
+        """
+        Explain predictions for a batch of rows
+
+        :param X: DataFrame with the same columns used for prediction
+        :param fast: Use LightGBM's native pred_contrib instead of the SHAP explainer: the same exact
+                     TreeSHAP values, computed on the sparse rows without densifying them
+        :param approximate: Saabas contributions of LightGBM models: each split credits its feature
+                            with the change in expected output along the row's path. They add up to
+                            the raw prediction minus the trees' root values, but split it between
+                            features less fairly than SHAP; the cost is one leaf lookup per tree.
+        :param batch_size: Number of rows explained at a time
+        :return: Array of shape (n_rows, n_features) with per-feature contributions, or
+                 (n_rows, n_classes, n_features) for multiclass models
+
+        fast and approximate fall back to SHAP with a warning for models other than LightGBM.
+        """
+        if (fast or approximate) and not hasattr(self.model, 'booster_'):
+            logger.warning(f"fast and approximate need a LightGBM model; explaining {self.name} "
+                           f"({type(self.model).__name__}) with SHAP instead")
+            fast = approximate = False
+        X_processed = self.preprocessor.transform(X)
+        if sparse.issparse(X_processed):
+            X_processed = sparse.csr_matrix(X_processed)
+        contributions = []
+        for start in range(0, X_processed.shape[0], batch_size):
+            batch = X_processed[start:start + batch_size]
+            if approximate:
+                contributions.append(self._approximate_batch(batch))
+                continue
+            if sparse.issparse(batch) and not fast:
+                # SHAP's TreeExplainer only takes dense rows
+                batch = batch.toarray()
+            contributions.append(self._explain_batch(batch, fast))
+        return np.concatenate(contributions)
+
+    def _approximate_batch(self, batch):
+        matrix, offsets, n_outputs = self.get_leaf_contributions()
+        # One leaf per tree and row; trees past the best iteration are not used by predict either
+        leaves = self.model.predict(batch, pred_leaf=True).reshape(batch.shape[0], -1)
+        n_rows, n_trees = leaves.shape
+        reached = sparse.csr_matrix((np.ones(leaves.size), (np.repeat(np.arange(n_rows), n_trees),
+                                                            (leaves + offsets[:n_trees]).ravel())),
+                                    shape=(n_rows, matrix.shape[0]))
+        contributions = (reached @ matrix).toarray()
+        if n_outputs > 1:
+            contributions = contributions.reshape(n_rows, n_outputs, -1)
+        return contributions
+
+    def _explain_batch(self, batch, fast):
+        if fast:
+            contributions = self.model.predict(batch, pred_contrib=True)
+            if isinstance(contributions, list):
+                # Sparse multiclass input gives one sparse block per class
+                contributions = np.stack([block.toarray() for block in contributions], axis=1)
+            elif sparse.issparse(contributions):
+                contributions = contributions.toarray()
+            n_outputs = contributions.shape[1] // (batch.shape[1] + 1)
+            if n_outputs > 1:
+                # Multiclass models return one block of n_features + 1 columns per class
+                contributions = contributions.reshape(len(batch), n_outputs, batch.shape[1] + 1)
+            # The last column of every block is the expected value (bias term)
+            return contributions[..., :-1]
+
+        shap_values = self.get_explainer().shap_values(batch)
+        if isinstance(shap_values, list):
+            # Older SHAP versions return one array per class
+            shap_values = np.stack(shap_values, axis=1)
+        elif shap_values.ndim == 3:
+            # Newer ones put the class axis last
+            shap_values = shap_values.transpose(0, 2, 1)
+        if shap_values.ndim == 3 and shap_values.shape[1] == 2:
+            # Binary classifiers: explain the positive class
+            shap_values = shap_values[:, 1]
         return shap_values
 
 
+    def artifact_path(self, path, version):
+        return os.path.join(path, f"{self.name}_v{version}")
+
+    def metric_predictions(self, X):
+        # What get_metric scores when the model is saved; probabilistic models override this
+        return self.predict(X)
+
     def save(self, path):
-        performance_metric = self.get_metric(self.y_test, self.predict(self.X_test))
-        self.version = self.versioning.new_version(self.name, performance_metric)
-        joblib.dump({
+        performance_metric = self.get_metric(self.y_test, self.metric_predictions(self.X_test))
+        # Reserve the version first and publish it only once the artifact is complete,
+        # so nothing watching the registry tries to load a half-written model
+        self.version = self.versioning.new_version(self.name, performance_metric, published=False)
+        artifact_path = self.artifact_path(path, self.version)
+        dump_artifact({
             'model': self.model,
             'preprocessor': self.preprocessor,
             'version': self.version
-        }, f"{path}/{self.name}_v{self.version}.joblib")
-        logger.info(f"Model {self.name} version {self.version} saved to {path}/{self.name}_v{self.version}.joblib")
+        }, artifact_path)
+        self.versioning.publish_version(self.name, self.version)
+        logger.info(f"Model {self.name} version {self.version} saved to {artifact_path}")
 
 
-    def load(self, path):
-        latest_version = self.versioning.get_latest_version(self.name)
-        if latest_version is None:
+    def load(self, path, version=None, mmap_mode='r'):
+        if version is None:
+            version = self.versioning.get_latest_version(self.name)
+        if version is None:
             raise ValueError(f"No saved model found for {self.name}")
-        
-        loaded = joblib.load(f"{path}/{self.name}_v{latest_version}.joblib")
+
+        artifact_path = self.artifact_path(path, version)
+        if os.path.isdir(artifact_path):
+            loaded = load_artifact(artifact_path, mmap_mode=mmap_mode)
+        else:
+            # Models saved before the directory layout are single joblib files
+            artifact_path = f"{artifact_path}.joblib"
+            loaded = joblib.load(artifact_path, mmap_mode=mmap_mode)
         self.model = loaded['model']
         self.preprocessor = loaded['preprocessor']
         self.version = loaded['version']
-        logger.info(f"Model {self.name} version {self.version} loaded from {path}/{self.name}_v{self.version}.joblib")
-
+        self.artifact_size = artifact_size(artifact_path)
+        logger.info(f"Model {self.name} version {self.version} loaded from {artifact_path}")
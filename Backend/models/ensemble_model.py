@@ -1,25 +1,109 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from lightgbm import LGBMClassifier
 from xgboost import XGBClassifier
-from sklearn.ensemble import VotingClassifier, StackingClassifier
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.model_selection import check_cv, cross_val_predict
+from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, roc_auc_score
+from joblib import Parallel, delayed, effective_n_jobs
 import mlflow
 import mlflow.sklearn
+from .ensemble_student import EnsembleStudent, fidelity_report
 
 # Set up MLflow
 mlflow.set_experiment("GitLab_Insight_AI_Ensemble")
 
+def _single_threaded(estimator):
+    # Parallel runs one fit per core already; LightGBM, XGBoost and random forests would otherwise
+    # each start a thread per core on top of it
+    return estimator.set_params(**{key: 1 for key in estimator.get_params()
+                                   if key == 'n_jobs' or key.endswith('__n_jobs')})
+
+
+def _fit_member(estimator, X, y, train=None, test=None):
+    # Full fits return the model; fold fits return only their out-of-fold probabilities
+    if train is None:
+        return estimator.fit(X, y)
+    return estimator.fit(X[train], y[train]).predict_proba(X[test])
+
+
+class StackedVotingEnsemble(BaseEstimator, ClassifierMixin):
+    """
+    Soft vote of a soft-voting layer and a stacking layer whose shared base learners are fitted once
+
+    Predictions match VotingClassifier([('voting', VotingClassifier(estimators, voting='soft')),
+    ('stacking', StackingClassifier(stack_estimators, final_estimator, cv=cv))], voting='soft'),
+    but each base learner is fitted once on the full data (shared by both layers) and once per CV
+    fold, with every fit running as an independent job. The out-of-fold probabilities the
+    meta-learner is trained on are kept in oof_predictions_.
+
+    When the jobs run in parallel, the base learners are fitted with n_jobs=1, so the fitted
+    members in named_estimators_ predict single-threaded too.
+    """
+
+    def __init__(self, estimators, stack_estimators, final_estimator, cv=5, n_jobs=None):
+        self.estimators = estimators
+        self.stack_estimators = stack_estimators
+        self.final_estimator = final_estimator
+        self.cv = cv
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        self.le_ = LabelEncoder().fit(y)
+        self.classes_ = self.le_.classes_
+        y = self.le_.transform(y)
+        folds = list(check_cv(self.cv, y, classifier=True).split(X, y))
+
+        # Estimators are matched by name, so one listed in both layers is fitted once
+        members = dict(self.estimators)
+        members.update(self.stack_estimators)
+        jobs = [(name, None, None) for name in members]
+        jobs += [(name, train, test) for name, _ in self.stack_estimators for train, test in folds]
+        prepare = _single_threaded if effective_n_jobs(self.n_jobs) > 1 else (lambda estimator: estimator)
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_member)(prepare(clone(members[name])), X, y, train, test) for name, train, test in jobs)
+
+        self.named_estimators_ = {}
+        oof = {name: np.zeros((len(y), len(self.classes_))) for name, _ in self.stack_estimators}
+        for (name, train, test), result in zip(jobs, results):
+            if train is None:
+                self.named_estimators_[name] = result
+            else:
+                oof[name][test] = result
+        self.oof_predictions_ = self._stack_features(oof)
+        self.final_estimator_ = clone(self.final_estimator).fit(self.oof_predictions_, y)
+        return self
+
+    def _stack_features(self, probas):
+        # As in StackingClassifier, a binary problem only keeps the positive-class column
+        first = 1 if len(self.classes_) == 2 else 0
+        return np.hstack([probas[name][:, first:] for name, _ in self.stack_estimators])
+
+    def predict_proba(self, X):
+        # Every fitted base learner is evaluated once and shared by both layers
+        probas = {name: estimator.predict_proba(X) for name, estimator in self.named_estimators_.items()}
+        voting = np.average([probas[name] for name, _ in self.estimators], axis=0)
+        stacking = self.final_estimator_.predict_proba(self._stack_features(probas))
+        return np.average([voting, stacking], axis=0)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
 class GitLabInsightEnsemble:
     def __init__(self):
         self.ensemble_model = None
         self.feature_names = None
+        self.preprocessor = None
+        self.X_test = None
+        self.y_test = None
 
     def preprocess_data(self, df):
         # Assume df is a pandas DataFrame with features and target
@@ -53,6 +137,9 @@ class GitLabInsightEnsemble:
         # Fit preprocessor
         X_train_processed = preprocessor.fit_transform(X_train)
         X_test_processed = preprocessor.transform(X_test)
+        # Kept so a distilled student can serve raw rows and be saved with its held-out metric
+        self.preprocessor = preprocessor
+        self.X_test, self.y_test = X_test, y_test
 
         self.feature_names = (numeric_features.tolist() + 
                               preprocessor.named_transformers_['cat']
@@ -61,30 +148,21 @@ class GitLabInsightEnsemble:
 
         return X_train_processed, X_test_processed, y_train, y_test
 
-    def build_ensemble(self):
+    def build_ensemble(self, n_jobs=-1):
         # Define base models
         rf = RandomForestClassifier(n_estimators=100, random_state=42)
         gb = GradientBoostingClassifier(n_estimators=100, random_state=42)
         lgbm = LGBMClassifier(n_estimators=100, random_state=42)
         xgb = XGBClassifier(n_estimators=100, random_state=42)
 
-        # Create voting classifier
-        voting_clf = VotingClassifier(
+        # Soft vote of all four models and a stack of rf, gb and lgbm under xgb, with the models
+        # shared between the two layers fitted once and the fold fits run in parallel
+        self.ensemble_model = StackedVotingEnsemble(
             estimators=[('rf', rf), ('gb', gb), ('lgbm', lgbm), ('xgb', xgb)],
-            voting='soft'
-        )
-
-        # Create stacking classifier
-        stacking_clf = StackingClassifier(
-            estimators=[('rf', rf), ('gb', gb), ('lgbm', lgbm)],
+            stack_estimators=[('rf', rf), ('gb', gb), ('lgbm', lgbm)],
             final_estimator=xgb,
-            cv=5
-        )
-
-        # Final ensemble combining voting and stacking
-        self.ensemble_model = VotingClassifier(
-            estimators=[('voting', voting_clf), ('stacking', stacking_clf)],
-            voting='soft'
+            cv=5,
+            n_jobs=n_jobs
         )
 
     def train_and_evaluate(self, X_train, X_test, y_train, y_test):
@@ -119,9 +197,42 @@ class GitLabInsightEnsemble:
             print(classification_report(y_test, y_pred))
             print(f"ROC AUC Score: {roc_auc}")
 
+    def distill(self, X_train, y_train, params=None, cv=5):
+        """
+        Train a single LightGBM student on the ensemble's soft labels
+
+        The soft labels are out-of-fold: each training row is scored by a copy of the ensemble fitted
+        on the other folds. On its own training rows the ensemble is overconfident (the random forest
+        all but memorises them), so in-sample probabilities would teach the student the training
+        labels rather than how the ensemble behaves on rows it has not seen. The student is checked
+        against the fitted ensemble on the held-out split kept by preprocess_data. Only binary
+        targets are supported.
+
+        :param cv: Folds for the out-of-fold probabilities; each fold refits the whole ensemble
+        :return: (EnsembleStudent, fidelity report dict); save the student with student.save(path)
+        """
+        if len(self.ensemble_model.classes_) != 2:
+            raise ValueError("Distillation supports binary targets only")
+        soft_labels = cross_val_predict(clone(self.ensemble_model), X_train, y_train, cv=cv,
+                                        method='predict_proba')[:, 1]
+        student = EnsembleStudent(self.preprocessor)
+        student.fit_soft_labels(X_train, soft_labels, params)
+        student.X_test, student.y_test = self.X_test, self.y_test
+
+        X_test_processed = self.preprocessor.transform(self.X_test)
+        report = fidelity_report(self.ensemble_model.predict_proba(X_test_processed)[:, 1],
+                                 student.model.predict(X_test_processed), self.y_test,
+                                 self.ensemble_model.predict_proba, student.model.predict, X_test_processed)
+        with mlflow.start_run(run_name="ensemble_student"):
+            mlflow.log_param("model_type", "Distilled LightGBM student")
+            for name, value in report.items():
+                mlflow.log_metric(f"distillation_{name}", value)
+        print(f"Distillation fidelity: {report}")
+        return student, report
+
     def get_feature_importance(self):
-        # Get feature importance from the Random Forest model in the voting classifier
-        rf_model = self.ensemble_model.named_estimators_['voting'].named_estimators_['rf']
+        # Get feature importance from the Random Forest model
+        rf_model = self.ensemble_model.named_estimators_['rf']
         importance = rf_model.feature_importances_
         feature_importance = dict(zip(self.feature_names, importance))
         return dict(sorted(feature_importance.items(), key=lambda x: x[1], reverse=True))
@@ -143,6 +254,11 @@ if __name__ == "__main__":
     ensemble.build_ensemble()
     ensemble.train_and_evaluate(X_train, X_test, y_train, y_test)
 
+    # Serve a single distilled model instead of the full ensemble
+    from Backend.config import config
+    student, fidelity = ensemble.distill(X_train, y_train)
+    student.save(config.MODEL_SAVE_PATH)
+
     # Make predictions on new data
     new_data = pd.read_csv("new_data.csv")
     predictions = ensemble.predict(new_data)
@@ -0,0 +1,51 @@
+import numpy as np
+import tensorflow as tf
+
+
+def window_dataset(series, lookback, starts, batch_size=32, shuffle_buffer=None, target_column=0, seed=42,
+                   horizon=1, start_ids=None):
+    """
+    Stream batches of (window, target) pairs built on the fly from a series
+
+    Only the series and the window start indices are held in memory; each batch gathers its
+    windows when it is produced, and prefetching overlaps that with training.
+
+    :param series: Scaled array of shape (n_steps, n_features)
+    :param lookback: Number of past steps in each window
+    :param starts: Start index of every window to draw; window i covers series[i:i + lookback]
+                   and its target is series[i + lookback, target_column]
+    :param shuffle_buffer: Shuffle the start indices with this buffer size (None keeps order)
+    :param horizon: Number of future targets per window; above 1 the target of window i is
+                    series[i + lookback:i + lookback + horizon, target_column]
+    :param start_ids: Optional integer series id of every window; when given, each batch's inputs
+                      are (windows, ids) for a model with a series embedding
+    """
+    series = tf.constant(series, dtype=tf.float32)
+    targets = series[:, target_column]
+    offsets = tf.range(lookback, dtype=tf.int64)
+    target_offsets = tf.range(lookback, lookback + horizon, dtype=tf.int64)
+
+    def gather_windows(batch_starts):
+        windows = tf.gather(series, batch_starts[:, None] + offsets[None, :])
+        if horizon == 1:
+            return windows, tf.gather(targets, batch_starts + lookback)
+        return windows, tf.gather(targets, batch_starts[:, None] + target_offsets[None, :])
+
+    starts = np.asarray(starts, dtype=np.int64)
+    if start_ids is not None:
+        def gather_with_ids(batch_starts, batch_ids):
+            windows, batch_targets = gather_windows(batch_starts)
+            return (windows, batch_ids), batch_targets
+
+        dataset = tf.data.Dataset.from_tensor_slices((starts, np.asarray(start_ids, dtype=np.int64)))
+        map_fn = gather_with_ids
+    else:
+        dataset = tf.data.Dataset.from_tensor_slices(starts)
+        map_fn = gather_windows
+    if shuffle_buffer:
+        # The buffer holds indices rather than windows, so even a full-length shuffle is cheap
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return (dataset
+            .batch(batch_size)
+            .map(map_fn, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
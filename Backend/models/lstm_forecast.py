@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+
+class LSTMForecaster:
+    """
+    Multi-step forecasting for many series at once with a trained one-step LSTM
+
+    Each step is a single call of a compiled tf.function over the whole batch of series, which
+    avoids the per-call overhead of Model.predict. If a direct multi-horizon model is given, a
+    forecast of up to its horizon is a single forward pass.
+    """
+
+    def __init__(self, model, scaler, lookback, n_features=5, direct_model=None):
+        self.model = model
+        self.direct_model = direct_model
+        self.scaler = scaler
+        self.lookback = lookback
+        self.n_features = n_features
+        signature = [tf.TensorSpec((None, lookback, n_features), tf.float32)]
+        # A fixed input signature means one trace for any number of series
+        self._step = tf.function(lambda x: self.model(x, training=False), input_signature=signature)
+        self._direct = None
+        if direct_model is not None:
+            self._direct = tf.function(lambda x: self.direct_model(x, training=False), input_signature=signature)
+
+    def forecast(self, windows, n_steps, last_dates=None, freq='D'):
+        """
+        Forecast n_steps ahead for every series
+
+        :param windows: Scaled windows of shape (n_series, >= lookback, n_features)
+        :param n_steps: Number of future steps to forecast
+        :param last_dates: Date of the last observation of each series; when given, calendar
+                           features of future steps are computed exactly for a fixed-step freq
+        :param freq: Step size of the series, e.g. 'D' or 'H'
+        :return: Array of shape (n_series, n_steps) in original units
+        """
+        windows = np.asarray(windows, dtype=np.float32)[:, -self.lookback:]
+
+        if self._direct is not None and n_steps <= self.direct_model.output_shape[-1]:
+            scaled = self._direct(windows).numpy()[:, :n_steps]
+            return self._inverse_target(scaled)
+
+        future_features = self._future_time_features(windows, n_steps, last_dates, freq)
+        scaled = np.empty((len(windows), n_steps), dtype=np.float32)
+        current = windows
+        for step in range(n_steps):
+            scaled[:, step] = self._step(current).numpy()[:, 0]
+            next_row = np.concatenate([scaled[:, step:step + 1], future_features[:, step]], axis=1)
+            current = np.concatenate([current[:, 1:], next_row[:, None, :]], axis=1)
+        return self._inverse_target(scaled)
+
+    def _inverse_target(self, scaled):
+        # MinMaxScaler maps x to x * scale_ + min_, so only the target column needs undoing
+        return (scaled - self.scaler.min_[0]) / self.scaler.scale_[0]
+
+    def _future_time_features(self, windows, n_steps, last_dates, freq):
+        # Calendar features are generated in original units and scaled with the fitted scaler
+        if last_dates is not None:
+            step = pd.to_timedelta(1, unit=freq).to_timedelta64()
+            offsets = np.arange(1, n_steps + 1) * step
+            last_dates = pd.to_datetime(np.asarray(last_dates)).values
+            dates = pd.DatetimeIndex((last_dates[:, None] + offsets[None, :]).ravel())
+            features = np.stack([dates.dayofweek, dates.month, dates.quarter, dates.year], axis=1).astype(np.float64)
+            features = features.reshape(len(windows), n_steps, 4)
+        else:
+            last = np.rint((windows[:, -1, 1:] - self.scaler.min_[1:]) / self.scaler.scale_[1:])
+            features = np.empty((len(windows), n_steps, 4))
+            for step in range(n_steps):
+                last = self.next_time_features(last)
+                features[:, step] = last
+        return (features * self.scaler.scale_[1:] + self.scaler.min_[1:]).astype(np.float32)
+
+    @staticmethod
+    def next_time_features(features):
+        # Vectorised form of GitLabInsightLSTMAdvanced.get_next_time_features for when dates are unknown
+        day_of_week = (features[:, 0] + 1) % 7
+        new_period = day_of_week == 0
+        month = np.where(new_period, features[:, 1] % 12 + 1, features[:, 1])
+        year = np.where(new_period & (month == 1), features[:, 3] + 1, features[:, 3])
+        quarter = np.where(new_period, (month - 1) // 3 + 1, features[:, 2])
+        return np.stack([day_of_week, month, quarter, year], axis=1)
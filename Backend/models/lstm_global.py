@@ -0,0 +1,198 @@
+import os
+import logging
+import joblib
+import numpy as np
+import pandas as pd
+from tensorflow.keras.models import Model, load_model
+from tensorflow.keras.layers import LSTM, Concatenate, Dense, Dropout, Embedding, Input, RepeatVector
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.callbacks import EarlyStopping
+from .lstm_data import window_dataset
+
+UNKNOWN_SERIES = 0
+
+
+class GitLabInsightGlobalLSTM:
+    """
+    One LSTM trained over many activity series at once, e.g. one series per project
+
+    Every series is scaled by its own target range and the model sees a learned embedding of the
+    series id, so a single network and a single file cover all projects. Windows are drawn from
+    all series in shuffled batches and never cross a series boundary. Series unseen in training
+    use an embedding averaged over the trained ones.
+    """
+
+    def __init__(self, lookback=60, embedding_dim=8, series_column='project_id'):
+        self.lookback = lookback
+        self.embedding_dim = embedding_dim
+        self.series_column = series_column
+        self.model = None
+        # Series id -> embedding row; row 0 is reserved for unseen series
+        self.series_index = {}
+        # Series id -> (min, max) of its target in the training data
+        self.target_range = {}
+        self.year_range = None
+        self.logger = logging.getLogger(__name__)
+        self.values = None
+        self.splits = None
+
+    def _features(self, df):
+        # Calendar features use fixed ranges so that every series shares one scaling
+        dates = df['date']
+        year_min, year_max = self.year_range
+        return np.column_stack([
+            dates.dt.dayofweek / 6,
+            (dates.dt.month - 1) / 11,
+            (dates.dt.quarter - 1) / 3,
+            (dates.dt.year - year_min) / max(year_max - year_min, 1),
+        ])
+
+    def _target_bounds(self, df):
+        # Per-row (min, max) of each row's series; series unseen in training use their own range
+        series_ids = df[self.series_column]
+        lo = series_ids.map({series_id: bounds[0] for series_id, bounds in self.target_range.items()})
+        hi = series_ids.map({series_id: bounds[1] for series_id, bounds in self.target_range.items()})
+        unknown = lo.isna().to_numpy()
+        lo, hi = lo.to_numpy(dtype=np.float64, copy=True), hi.to_numpy(dtype=np.float64, copy=True)
+        if unknown.any():
+            groups = df['target'].groupby(series_ids, sort=False)
+            lo[unknown] = groups.transform('min').to_numpy()[unknown]
+            hi[unknown] = groups.transform('max').to_numpy()[unknown]
+        return lo, np.where(hi > lo, hi - lo, 1.0)
+
+    def _prepare(self, df):
+        df = df.assign(date=pd.to_datetime(df['date'])).sort_values([self.series_column, 'date'], kind='stable')
+        lo, span = self._target_bounds(df)
+        target = (df['target'].to_numpy(dtype=np.float64) - lo) / span
+        return df, np.column_stack([target, self._features(df)]).astype(np.float32)
+
+    def preprocess_data(self, df, test_fraction=0.2, validation_fraction=0.1):
+        """
+        Concatenate every series of df (columns: series_column, 'date', 'target') into one array
+
+        The last test_fraction of each series' windows is held out for testing and the
+        validation_fraction before it for early stopping, so every split is later in time than
+        the windows trained on.
+        """
+        dates = pd.to_datetime(df['date'])
+        self.year_range = (int(dates.dt.year.min()), int(dates.dt.year.max()))
+        ranges = df.groupby(self.series_column)['target'].agg(['min', 'max'])
+        self.target_range = {series_id: (lo, hi) for series_id, lo, hi in ranges.itertuples()}
+        self.series_index = {series_id: row + 1 for row, series_id in enumerate(ranges.index)}
+
+        df, self.values = self._prepare(df)
+        sizes = df.groupby(self.series_column, sort=False).size()
+        splits = {'fit': ([], []), 'validation': ([], []), 'test': ([], [])}
+        offset = 0
+        for series_id, size in sizes.items():
+            n_windows = size - self.lookback
+            if n_windows > 0:
+                starts = offset + np.arange(n_windows)
+                n_test = int(n_windows * test_fraction)
+                n_validation = int((n_windows - n_test) * validation_fraction)
+                n_fit = n_windows - n_test - n_validation
+                for name, part in (('fit', starts[:n_fit]), ('validation', starts[n_fit:n_fit + n_validation]),
+                                   ('test', starts[n_fit + n_validation:])):
+                    splits[name][0].append(part)
+                    splits[name][1].append(np.full(len(part), self.series_index[series_id]))
+            offset += size
+        if not splits['fit'][0]:
+            raise ValueError(f"No series is longer than the lookback of {self.lookback} steps")
+        self.splits = {name: (np.concatenate(starts), np.concatenate(ids)) for name, (starts, ids) in splits.items()}
+        return self.splits
+
+    def create_model(self, lstm_units=50, dropout_rate=0.2):
+        window = Input(shape=(self.lookback, 5), name='window')
+        series = Input(shape=(), dtype='int64', name='series')
+        embedding = Embedding(len(self.series_index) + 1, self.embedding_dim, name='series_embedding')(series)
+        x = Concatenate()([window, RepeatVector(self.lookback)(embedding)])
+        x = LSTM(units=lstm_units, return_sequences=True)(x)
+        x = Dropout(dropout_rate)(x)
+        x = LSTM(units=lstm_units, return_sequences=True)(x)
+        x = Dropout(dropout_rate)(x)
+        x = LSTM(units=lstm_units)(x)
+        x = Dropout(dropout_rate)(x)
+        model = Model(inputs=[window, series], outputs=Dense(units=1)(x))
+        model.compile(optimizer=Adam(), loss='mean_squared_error')
+        return model
+
+    def dataset(self, split, batch_size=256, shuffle=False):
+        starts, ids = self.splits[split]
+        return window_dataset(self.values, self.lookback, starts, batch_size,
+                              shuffle_buffer=len(starts) if shuffle else None, start_ids=ids)
+
+    def train(self, df, epochs=100, batch_size=256, lstm_units=50, dropout_rate=0.2):
+        """Train one model over every series in df; returns the test loss in scaled units"""
+        self.preprocess_data(df)
+        self.model = self.create_model(lstm_units=lstm_units, dropout_rate=dropout_rate)
+        validation = self.dataset('validation', batch_size) if len(self.splits['validation'][0]) else None
+        callbacks = [EarlyStopping(monitor='val_loss' if validation is not None else 'loss', patience=10, restore_best_weights=True)]
+        self.model.fit(self.dataset('fit', batch_size, shuffle=True), validation_data=validation,
+                       epochs=epochs, callbacks=callbacks, verbose=1)
+
+        # Unseen series get the average series rather than an untrained embedding row
+        embedding = self.model.get_layer('series_embedding')
+        weights = embedding.get_weights()[0]
+        weights[UNKNOWN_SERIES] = weights[UNKNOWN_SERIES + 1:].mean(axis=0)
+        embedding.set_weights([weights])
+
+        test_loss = self.model.evaluate(self.dataset('test', batch_size), verbose=0) if len(self.splits['test'][0]) else None
+        self.logger.info(f"Global LSTM trained on {len(self.series_index)} series; test loss: {test_loss}")
+        return test_loss
+
+    def predict_batch(self, df):
+        """
+        Predict the next value of every series in df from its last `lookback` observations
+
+        All series go through the model in one call. Series with fewer than `lookback`
+        observations are skipped.
+
+        :return: pd.Series of predictions indexed by series id
+        """
+        df, values = self._prepare(df)
+        positions = df.groupby(self.series_column, sort=False).cumcount(ascending=False).to_numpy()
+        window_rows = positions < self.lookback
+        sizes = df[window_rows].groupby(self.series_column, sort=False).size()
+        complete = sizes[sizes == self.lookback].index
+        keep = window_rows & df[self.series_column].isin(complete).to_numpy()
+
+        windows = values[keep].reshape(len(complete), self.lookback, 5)
+        ids = np.array([self.series_index.get(series_id, UNKNOWN_SERIES) for series_id in complete], dtype=np.int64)
+        scaled = self.model((windows, ids), training=False).numpy()[:, 0]
+
+        lo, span = self._target_bounds(df[keep])
+        # Every window's rows share the same bounds, so the first row of each window is enough
+        lo, span = lo[::self.lookback], span[::self.lookback]
+        return pd.Series(scaled * span + lo, index=complete, name='prediction')
+
+    def warmup(self):
+        self.model((np.zeros((1, self.lookback, 5), dtype=np.float32), np.zeros(1, dtype=np.int64)), training=False)
+
+    def save_model(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.model.save(os.path.join(path, 'global_lstm_model.h5'))
+        joblib.dump({
+            'lookback': self.lookback,
+            'embedding_dim': self.embedding_dim,
+            'series_column': self.series_column,
+            'series_index': self.series_index,
+            'target_range': self.target_range,
+            'year_range': self.year_range,
+        }, os.path.join(path, 'global_lstm_metadata.joblib'))
+        self.logger.info(f"Global model saved to {path}")
+
+    def load_model(self, path):
+        self.model = load_model(os.path.join(path, 'global_lstm_model.h5'))
+        for name, value in joblib.load(os.path.join(path, 'global_lstm_metadata.joblib')).items():
+            setattr(self, name, value)
+        self.logger.info(f"Global model loaded from {path}")
+
+
+# Usage: DATA_FILE is a CSV with project_id, date and target columns covering every project
+if __name__ == "__main__":
+    from Backend.config import config
+
+    global_model = GitLabInsightGlobalLSTM(lookback=config.LOOKBACK, embedding_dim=config.LSTM_SERIES_EMBEDDING_DIM)
+    global_model.train(pd.read_csv(config.DATA_FILE), epochs=config.EPOCHS,
+                       lstm_units=config.LSTM_UNITS, dropout_rate=config.DROPOUT_RATE)
+    global_model.save_model(config.LSTM_GLOBAL_MODEL_PATH)
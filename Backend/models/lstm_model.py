@@ -1,35 +1,56 @@
+import os
+import logging
+import joblib
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
+from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.metrics import mean_squared_error, mean_absolute_error
-from sklearn.model_selection import RandomizedSearchCV
-from keras.wrappers.scikit_learn import KerasRegressor
-import matplotlib.pyplot as plt
-import mlflow
-import mlflow.keras
-from pyod.models.iforest import IForest
+from utils.windowing import sliding_windows
+from .lstm_data import window_dataset
+from .lstm_forecast import LSTMForecaster
+from .lstm_stateful import LSTMStateStore, StatefulLSTMRunner
+from .lstm_tuning import tune_lstm
+from .lstm_tflite import TFLITE_FILENAME, export_tflite, max_abs_difference
+from .streaming_anomaly import StreamingAnomalyDetector, detect_anomalies, load_anomaly_detector
+
+# matplotlib and mlflow are only needed for training, so they are
+# imported there to keep the serving process's startup fast
+
+
+def build_lstm(lookback, n_features=5, lstm_units=50, dropout_rate=0.2, horizon=1):
+    """The stacked LSTM of GitLabInsightLSTMAdvanced; module level so tuning processes can pickle it"""
+    model = Sequential([
+        LSTM(units=lstm_units, return_sequences=True, input_shape=(lookback, n_features)),
+        Dropout(dropout_rate),
+        LSTM(units=lstm_units, return_sequences=True),
+        Dropout(dropout_rate),
+        LSTM(units=lstm_units),
+        Dropout(dropout_rate),
+        Dense(units=horizon)
+    ])
+    model.compile(optimizer=Adam(), loss='mean_squared_error')
+    return model
 
-mlflow.set_experiment("GitLab_Insight_AI_LSTM_Advanced")
 
 class GitLabInsightLSTMAdvanced:
     def __init__(self, lookback=60):
         self.lookback = lookback
         self.model = None
+        self.direct_model = None
+        self._forecaster = None
         self.scaler = MinMaxScaler(feature_range=(0, 1))
-        self.anomaly_detector = IForest(contamination=0.1, random_state=42)
+        self.anomaly_detector = StreamingAnomalyDetector()
+        self.logger = logging.getLogger(__name__)
+        self.scaled_series = None
+        self.train_size = None
 
     def create_dataset(self, dataset, lookback=60):
-        X, y = [], []
-        for i in range(len(dataset) - lookback):
-            feature = dataset[i:i+lookback]
-            target = dataset[i+lookback]
-            X.append(feature)
-            y.append(target)
-        return np.array(X), np.array(y)
+        # Strided views over the scaled series: no per-window copies, so memory stays O(len(dataset))
+        return sliding_windows(dataset, lookback)
 
     def add_time_features(self, df):
         df['day_of_week'] = df['date'].dt.dayofweek
@@ -53,9 +74,42 @@ class GitLabInsightLSTMAdvanced:
         train_size = int(len(X) * 0.8)
         X_train, X_test = X[:train_size], X[train_size:]
         y_train, y_test = y[:train_size, 0], y[train_size:, 0]  # Only predict the target variable
+
+        # Training streams windows from the series itself (see window_datasets)
+        self.scaled_series = scaled_values
+        self.train_size = train_size
         
         return X_train, X_test, y_train, y_test
 
+    def window_datasets(self, batch_size, validation_fraction=0.1, horizon=1):
+        """
+        Build tf.data pipelines over the series from the last preprocess_data call
+
+        :param batch_size: Batch size of every dataset
+        :param validation_fraction: Trailing share of the training windows held out for validation
+        :param horizon: Number of future targets per window
+        :return: (fit, validation, train, test) datasets; only fit is shuffled
+        """
+        if self.scaled_series is None:
+            raise ValueError("preprocess_data must be called before building window datasets")
+        # Windows whose targets would run past the end of the series are dropped
+        n_windows = len(self.scaled_series) - self.lookback - horizon + 1
+        train_starts = np.arange(min(self.train_size, n_windows))
+        test_starts = np.arange(len(train_starts), n_windows)
+        # Same split as Keras' validation_split: the last windows of the training range
+        n_fit = len(train_starts) - int(len(train_starts) * validation_fraction)
+
+        def dataset(starts, shuffle_buffer=None):
+            return window_dataset(self.scaled_series, self.lookback, starts, batch_size,
+                                  shuffle_buffer=shuffle_buffer, horizon=horizon)
+
+        return (
+            dataset(train_starts[:n_fit], shuffle_buffer=n_fit),
+            dataset(train_starts[n_fit:]),
+            dataset(train_starts),
+            dataset(test_starts),
+        )
+
     def build_model(self, input_shape):
         model = Sequential([
             LSTM(units=50, return_sequences=True, input_shape=input_shape),
@@ -69,63 +123,61 @@ class GitLabInsightLSTMAdvanced:
         model.compile(optimizer=Adam(), loss='mean_squared_error')
         return model
 
-    def create_model(self, lstm_units=50, dropout_rate=0.2):
-        model = Sequential([
-            LSTM(units=lstm_units, return_sequences=True, input_shape=(self.lookback, 5)),
-            Dropout(dropout_rate),
-            LSTM(units=lstm_units, return_sequences=True),
-            Dropout(dropout_rate),
-            LSTM(units=lstm_units),
-            Dropout(dropout_rate),
-            Dense(units=1)
-        ])
-        model.compile(optimizer=Adam(), loss='mean_squared_error')
-        return model
+    def create_model(self, lstm_units=50, dropout_rate=0.2, horizon=1):
+        return build_lstm(self.lookback, lstm_units=lstm_units, dropout_rate=dropout_rate, horizon=horizon)
 
-    def hyperparameter_tuning(self, X_train, y_train):
-        model = KerasRegressor(build_fn=self.create_model, verbose=0)
-        
-        param_dist = {
-            'lstm_units': [30, 50, 70, 100],
-            'dropout_rate': [0.1, 0.2, 0.3],
-            'batch_size': [16, 32, 64],
-            'epochs': [50, 100, 150]
-        }
-        
-        random_search = RandomizedSearchCV(estimator=model, param_distributions=param_dist, 
-                                           n_iter=10, cv=3, verbose=2, random_state=42, n_jobs=-1)
-        
-        random_search_result = random_search.fit(X_train, y_train)
-        return random_search_result.best_params_
+    def hyperparameter_tuning(self, time_budget=1800, n_trials=40, n_jobs=1, intra_op_threads=None, storage=None,
+                              pruner='successive_halving'):
+        """
+        Search lstm_units, dropout_rate and batch_size on the training windows of the last preprocess_data call
+
+        See tune_lstm for the search itself; time_budget is a wall-clock limit in seconds.
+        """
+        if self.scaled_series is None:
+            raise ValueError("preprocess_data must be called before hyperparameter tuning")
+        # The builder and its arguments are pickled to the tuning processes, not this instance
+        return tune_lstm(build_lstm, self.scaled_series, np.arange(self.train_size), self.lookback,
+                         n_trials=n_trials, time_budget=time_budget, n_jobs=n_jobs,
+                         intra_op_threads=intra_op_threads, storage=storage, pruner=pruner,
+                         build_kwargs={'lookback': self.lookback, 'n_features': self.scaled_series.shape[1]})
 
     def train_and_evaluate(self, X_train, X_test, y_train, y_test, epochs=100, batch_size=32):
+        import matplotlib.pyplot as plt
+        import mlflow
+        import mlflow.keras
+
+        mlflow.set_experiment("GitLab_Insight_AI_LSTM_Advanced")
         with mlflow.start_run():
             # Hyperparameter tuning
-            best_params = self.hyperparameter_tuning(X_train, y_train)
+            best_params = self.hyperparameter_tuning()
             mlflow.log_params(best_params)
             
             # Build and train the model with best parameters
             self.model = self.create_model(lstm_units=best_params['lstm_units'], 
                                            dropout_rate=best_params['dropout_rate'])
+            self._forecaster = None
             
             early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+
+            # Windows are gathered batch by batch from the scaled series, so memory does not grow
+            # with the number of windows and window building overlaps training
+            fit_ds, val_ds, train_ds, test_ds = self.window_datasets(best_params['batch_size'])
             
             history = self.model.fit(
-                X_train, y_train,
+                fit_ds,
                 epochs=best_params['epochs'],
-                batch_size=best_params['batch_size'],
-                validation_split=0.1,
+                validation_data=val_ds,
                 callbacks=[early_stopping],
                 verbose=1
             )
             
             # Evaluate the model
-            train_loss = self.model.evaluate(X_train, y_train, verbose=0)
-            test_loss = self.model.evaluate(X_test, y_test, verbose=0)
+            train_loss = self.model.evaluate(train_ds, verbose=0)
+            test_loss = self.model.evaluate(test_ds, verbose=0)
             
             # Make predictions
-            train_predict = self.model.predict(X_train)
-            test_predict = self.model.predict(X_test)
+            train_predict = self.model.predict(train_ds)
+            test_predict = self.model.predict(test_ds)
             
             # Inverse transform predictions (only for the target variable)
             train_predict = self.scaler.inverse_transform(np.concatenate([train_predict, np.zeros((len(train_predict), 4))], axis=1))[:, 0]
@@ -173,9 +225,11 @@ class GitLabInsightLSTMAdvanced:
             mlflow.log_artifact("predictions.png")
             
             # Anomaly detection
-            self.anomaly_detector.fit(y_test_inv.reshape(-1, 1))
-            anomaly_labels = self.anomaly_detector.labels_
-            anomaly_scores = self.anomaly_detector.decision_scores_
+            # The detector learns the training period, then scores the test period as a stream
+            self.anomaly_detector = StreamingAnomalyDetector()
+            self.anomaly_detector.update(y_train_inv)
+            anomaly_scores = self.anomaly_detector.update(y_test_inv)
+            anomaly_labels = (anomaly_scores > self.anomaly_detector.threshold).astype(int)
             
             # Plot anomalies
             plt.figure(figsize=(10, 6))
@@ -212,26 +266,60 @@ class GitLabInsightLSTMAdvanced:
         # Inverse transform the prediction
         return self.scaler.inverse_transform(np.concatenate([prediction, np.zeros((len(prediction), 4))], axis=1))[0, 0]
 
-    def predict_sequence(self, start_sequence, n_future_steps):
+    def train_direct_model(self, horizon, lstm_units=50, dropout_rate=0.2, epochs=100, batch_size=32):
+        """
+        Train a model that predicts the next `horizon` values in one forward pass
+
+        Forecasts of up to `horizon` steps then skip the step-by-step recursion entirely.
+        preprocess_data must have been called first.
+        """
+        self.direct_model = self.create_model(lstm_units=lstm_units, dropout_rate=dropout_rate, horizon=horizon)
+        self._forecaster = None
+        fit_ds, val_ds, _, test_ds = self.window_datasets(batch_size, horizon=horizon)
+        early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+        self.direct_model.fit(fit_ds, epochs=epochs, validation_data=val_ds, callbacks=[early_stopping], verbose=1)
+        test_loss = self.direct_model.evaluate(test_ds, verbose=0)
+        self.logger.info(f"Direct {horizon}-step model test loss: {test_loss}")
+        return test_loss
+
+    @property
+    def forecaster(self):
+        if self._forecaster is None:
+            self._forecaster = LSTMForecaster(self.model, self.scaler, self.lookback, direct_model=self.direct_model)
+        return self._forecaster
+
+    def forecast(self, sequences, n_future_steps, last_dates=None, freq='D'):
+        """
+        Forecast many series (e.g. one per project) in a single batch
+
+        :param sequences: Scaled sequences of shape (n_series, >= lookback, 5)
+        :param n_future_steps: Number of future steps to predict
+        :param last_dates: Date of the last observation of each series, used for exact calendar features
+        :param freq: Step size of the series
+        :return: Array of shape (n_series, n_future_steps) of predicted values
+        """
+        return self.forecaster.forecast(sequences, n_future_steps, last_dates=last_dates, freq=freq)
+
+    def stateful_runner(self, state_path=None):
+        """
+        Incremental one-step-per-observation inference, resuming from state_path when it exists
+
+        :return: A StatefulLSTMRunner over this model; save its state with runner.store.save(state_path)
+        """
+        store = LSTMStateStore.load(state_path) if state_path and os.path.exists(state_path) else None
+        return StatefulLSTMRunner(self.model, self.scaler, store=store)
+
+    def predict_sequence(self, start_sequence, n_future_steps, last_date=None):
         """
         Predict a sequence of future values
         
         :param start_sequence: The initial sequence to start predictions from
         :param n_future_steps: Number of future steps to predict
+        :param last_date: Date of the last step of start_sequence, if known
         :return: Array of predicted values
         """
-        curr_sequence = start_sequence[-self.lookback:].reshape((1, self.lookback, 5))
-        predicted_values = []
-
-        for _ in range(n_future_steps):
-            predicted_value = self.model.predict(curr_sequence)[0]
-            predicted_values.append(predicted_value)
-            curr_sequence = np.roll(curr_sequence, -1, axis=1)
-            curr_sequence[0, -1, 0] = predicted_value
-            # Update time features for the next step
-            curr_sequence[0, -1, 1:] = self.get_next_time_features(curr_sequence[0, -2, 1:])
-
-        return self.scaler.inverse_transform(np.concatenate([np.array(predicted_values), np.zeros((len(predicted_values), 4))], axis=1))[:, 0]
+        last_dates = None if last_date is None else [last_date]
+        return self.forecast(np.asarray(start_sequence)[None], n_future_steps, last_dates=last_dates)[0]
 
     def get_next_time_features(self, current_features):
         # Implement logic to get the next time step's features
@@ -249,31 +337,77 @@ class GitLabInsightLSTMAdvanced:
         
         return np.array([day_of_week, month, quarter, year])
 
-    def detect_anomalies(self, data):
+    def detect_anomalies(self, data, series_id=None, update=False):
         """
         Detect anomalies in the given data
         
         :param data: Array of values to check for anomalies
-        :return: Boolean array indicating anomalies (True) and normal points (False)
+        :param series_id: Series (e.g. project) the values belong to; detector state is kept per series
+        :param update: Also learn from the values, in order, after scoring them
+        :return: Array with 1 for anomalies and 0 for normal points
         """
-        return self.anomaly_detector.predict(data.reshape(-1, 1))
+        return detect_anomalies(self.anomaly_detector, data, series_id, update)
     
     def save_model(self, path):
         os.makedirs(path, exist_ok=True)
         self.model.save(os.path.join(path, 'lstm_model.h5'))
+        if self.direct_model is not None:
+            self.direct_model.save(os.path.join(path, 'lstm_direct_model.h5'))
         joblib.dump(self.scaler, os.path.join(path, 'scaler.joblib'))
         joblib.dump(self.anomaly_detector, os.path.join(path, 'anomaly_detector.joblib'))
         self.logger.info(f"Model saved to {path}")
 
+    def export_tflite(self, path, quantization=None, tolerance=None, n_check_windows=200):
+        """
+        Write lstm_model.tflite next to the saved model for TensorFlow-free serving
+
+        The export is checked against the Keras model on windows from the last preprocessed series
+        (random windows if there is none) and ValueError is raised if the largest difference in
+        scaled units exceeds tolerance.
+
+        :param quantization: None or 'float16' weights
+        :return: The largest absolute difference found by the check
+        """
+        os.makedirs(path, exist_ok=True)
+        tflite_path = os.path.join(path, TFLITE_FILENAME)
+        size = export_tflite(self.model, tflite_path, self.lookback, quantization=quantization)
+
+        if self.scaled_series is not None and len(self.scaled_series) > self.lookback:
+            windows, _ = self.create_dataset(self.scaled_series, self.lookback)
+            windows = windows[-n_check_windows:]
+        else:
+            windows = np.random.default_rng(42).random((n_check_windows, self.lookback, 5))
+        difference = max_abs_difference(self.model, tflite_path, windows)
+        self.logger.info(f"Exported {quantization or 'float32'} TFLite model ({size / 1024:.0f} KB) to {tflite_path}; "
+                         f"max |Keras - TFLite| = {difference:.2e}")
+        if tolerance is not None and difference > tolerance:
+            os.remove(tflite_path)
+            raise ValueError(f"TFLite export differs from the Keras model by {difference:.2e} (tolerance {tolerance})")
+        return difference
+
+    def prepare_window(self, df):
+        """Scale the last `lookback` observations of a DataFrame with 'date' and 'target' columns for predict"""
+        df = self.add_time_features(df.assign(date=pd.to_datetime(df['date'])).sort_values('date'))
+        return self.scaler.transform(df[['target', 'day_of_week', 'month', 'quarter', 'year']].values[-self.lookback:])
+
     def load_model(self, path):
         self.model = load_model(os.path.join(path, 'lstm_model.h5'))
+        direct_path = os.path.join(path, 'lstm_direct_model.h5')
+        self.direct_model = load_model(direct_path) if os.path.exists(direct_path) else None
+        self._forecaster = None
         self.scaler = joblib.load(os.path.join(path, 'scaler.joblib'))
-        self.anomaly_detector = joblib.load(os.path.join(path, 'anomaly_detector.joblib'))
+        self.anomaly_detector = load_anomaly_detector(os.path.join(path, 'anomaly_detector.joblib'))
         self.logger.info(f"Model loaded from {path}")
 
+    def warmup(self):
+        # One prediction on a blank window builds the predict function before real traffic arrives
+        self.predict(np.zeros((self.lookback, 5)))
+
 
 # Usage
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     # Load your time series data
     df = pd.read_csv("your_timeseries_data.csv")
     df['date'] = pd.to_datetime(df['date'])
@@ -310,14 +444,15 @@ if __name__ == "__main__":
     plt.legend()
     plt.show()
 
-    # Example of how to use the model for ongoing monitoring
+    # Example of how to use the model for ongoing monitoring: each series keeps its LSTM state,
+    # so every new observation costs a single LSTM step
+    runner = lstm_model.stateful_runner()
+    runner.prime(['gitlab'], X_test[-1:])
+
     def monitor_gitlab_activity(new_data):
-        # Preprocess new data
-        new_data = lstm_model.add_time_features(new_data)
-        new_data_scaled = lstm_model.scaler.transform(new_data[['target', 'day_of_week', 'month', 'quarter', 'year']].values)
-        
-        # Make prediction
-        prediction = lstm_model.predict(new_data_scaled[-lstm_model.lookback:])
+        # Advance the series by the new observations and predict the value after them
+        predictions = runner.update_frame(new_data.assign(series='gitlab'), series_column='series')
+        prediction = predictions[-1]
         
         # Check for anomaly
         is_anomaly = lstm_model.detect_anomalies(np.array([prediction]))[0]
@@ -328,9 +463,9 @@ if __name__ == "__main__":
             print(f"Normal activity. Predicted value: {prediction}")
 
     # Simulate new incoming data
-    new_data = df.iloc[-lstm_model.lookback:].copy()
-    new_data['date'] = pd.date_range(start=new_data['date'].iloc[-1] + pd.Timedelta(days=1), periods=1, freq='D')
-    new_data['target'] = np.random.rand() * 100  # Replace with actual new data
+    new_data = pd.DataFrame({
+        'date': [df['date'].iloc[-1] + pd.Timedelta(days=1)],
+        'target': [np.random.rand() * 100],  # Replace with actual new data
+    })
 
     monitor_gitlab_activity(new_data)
-
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow.keras.layers import LSTM, Dense
+
+logger = logging.getLogger(__name__)
+
+
+class LSTMStateStore:
+    """
+    Hidden and cell state of every LSTM layer for each series, keyed by series id
+
+    States live in one contiguous array of shape (n_series, n_layers, 2, units) so a batch of
+    series is gathered and scattered with a single indexing operation.
+    """
+
+    def __init__(self, n_layers, units):
+        self.n_layers = n_layers
+        self.units = units
+        self._index = {}
+        self._states = np.zeros((0, n_layers, 2, units), dtype=np.float32)
+        # JSON-serialisable bookkeeping saved with the states, e.g. how far each stream has read
+        self.metadata = {}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, series_id):
+        return series_id in self._index
+
+    def rows(self, series_ids):
+        # Unknown series start from a zero state, like every window of the windowed model
+        new_ids = [series_id for series_id in dict.fromkeys(series_ids) if series_id not in self._index]
+        if new_ids:
+            needed = len(self._index) + len(new_ids)
+            if needed > len(self._states):
+                # Grow geometrically so a stream of new series does not copy the store every time
+                grown = np.zeros((max(needed, 2 * len(self._states)),) + self._states.shape[1:], dtype=np.float32)
+                grown[:len(self._states)] = self._states
+                self._states = grown
+            for series_id in new_ids:
+                self._index[series_id] = len(self._index)
+        return np.fromiter((self._index[series_id] for series_id in series_ids), dtype=np.int64, count=len(series_ids))
+
+    def get(self, series_ids):
+        # rows() may reallocate the array, so it has to run before self._states is read
+        rows = self.rows(series_ids)
+        return self._states[rows]
+
+    def set(self, series_ids, states):
+        rows = self.rows(series_ids)
+        self._states[rows] = states
+
+    def reset(self, series_ids):
+        self.set(series_ids, 0.0)
+
+    def save(self, path):
+        """Write the store atomically so a crash mid-save never leaves a truncated file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            # Ids go through JSON so integer and string ids round-trip with their type
+            header = json.dumps({'ids': list(self._index), 'metadata': self.metadata})
+            np.savez(f, states=self._states[:len(self._index)], header=np.array(header))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            states = data['states']
+            header = json.loads(str(data['header']))
+        store = cls(states.shape[1], states.shape[3])
+        store._states = states.copy()
+        store._index = {series_id: row for row, series_id in enumerate(header['ids'])}
+        store.metadata = header['metadata']
+        return store
+
+
+class StatefulLSTMRunner:
+    """
+    Incremental inference with a trained GitLabInsightLSTMAdvanced model
+
+    The stacked LSTM is run one time step at a time from each series' stored state, so ingesting a
+    new observation costs one LSTM step instead of re-running the whole lookback window. After
+    prime() on a full window the state matches the windowed model exactly; from then on each series
+    carries its whole history in its state rather than only the last `lookback` steps.
+    """
+
+    def __init__(self, model, scaler, store=None):
+        self.scaler = scaler
+        self.lstm_layers = [layer for layer in model.layers if isinstance(layer, LSTM)]
+        # Dropout is a no-op at inference, so only the output head follows the last LSTM
+        self.head_layers = [layer for layer in model.layers if isinstance(layer, Dense)]
+        units = {layer.units for layer in self.lstm_layers}
+        if len(units) != 1:
+            raise ValueError("Stateful inference needs every LSTM layer to have the same number of units")
+        units = units.pop()
+        n_features = model.input_shape[-1]
+        if store is None:
+            store = LSTMStateStore(len(self.lstm_layers), units)
+        elif (store.n_layers, store.units) != (len(self.lstm_layers), units):
+            raise ValueError("State store does not match the model's LSTM layers")
+        self.store = store
+        self._step = tf.function(self._step_fn, input_signature=[
+            tf.TensorSpec((None, n_features), tf.float32),
+            tf.TensorSpec((None, len(self.lstm_layers), 2, units), tf.float32),
+        ])
+
+    def _step_fn(self, x, states):
+        new_states = []
+        for i, layer in enumerate(self.lstm_layers):
+            x, (h, c) = layer.cell(x, [states[:, i, 0], states[:, i, 1]], training=False)
+            new_states.append(tf.stack([h, c], axis=1))
+        for layer in self.head_layers:
+            x = layer(x)
+        return x, tf.stack(new_states, axis=1)
+
+    def prime(self, series_ids, windows):
+        """
+        Rebuild the state of each series from a full scaled window of shape (n_series, lookback, 5)
+
+        :return: The prediction for the step after each window, in original units
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        states = np.zeros((len(series_ids),) + self.store._states.shape[1:], dtype=np.float32)
+        for t in range(windows.shape[1]):
+            prediction, states = self._step(windows[:, t], states)
+        self.store.set(list(series_ids), states.numpy())
+        return self._inverse_target(prediction.numpy()[:, 0])
+
+    def update(self, series_ids, observations):
+        """
+        Advance each series by one scaled observation of shape (n, 5) and predict its next value
+
+        A series may appear more than once in a batch; its observations are applied in order.
+
+        :return: The prediction for the step after each observation, in original units
+        """
+        series_ids = list(series_ids)
+        observations = np.asarray(observations, dtype=np.float32)
+        predictions = np.empty(len(series_ids), dtype=np.float64)
+
+        # Split the batch into rounds in which every series appears at most once
+        seen = {}
+        occurrence = np.empty(len(series_ids), dtype=np.int64)
+        for i, series_id in enumerate(series_ids):
+            occurrence[i] = seen.get(series_id, 0)
+            seen[series_id] = occurrence[i] + 1
+
+        for round_number in range(occurrence.max(initial=-1) + 1):
+            positions = np.flatnonzero(occurrence == round_number)
+            round_ids = [series_ids[i] for i in positions]
+            rows = self.store.rows(round_ids)
+            prediction, states = self._step(observations[positions], self.store._states[rows])
+            self.store._states[rows] = states.numpy()
+            predictions[positions] = self._inverse_target(prediction.numpy()[:, 0])
+        return predictions
+
+    def _scaled(self, values, dates):
+        # The features of GitLabInsightLSTMAdvanced.preprocess_data, scaled like its training data
+        raw = np.column_stack([np.asarray(values, dtype=np.float64), dates.dt.dayofweek, dates.dt.month,
+                               dates.dt.quarter, dates.dt.year])
+        return self.scaler.transform(raw)
+
+    def prime_frame(self, series_id, df, date_column='date', value_column='target'):
+        """
+        Rebuild one series' state from its raw history, e.g. the last `lookback` observations
+
+        :return: The prediction for the step after the last observation, in original units
+        """
+        dates = pd.to_datetime(df[date_column]).sort_values(kind='stable')
+        window = self._scaled(df[value_column].loc[dates.index], dates)
+        return self.prime([series_id], window[None])[0]
+
+    def update_frame(self, df, series_column='project_id', date_column='date', value_column='target'):
+        """
+        Advance series from raw observations in a DataFrame, applied in date order
+
+        :return: Array of next-value predictions aligned with the rows of df
+        """
+        dates = pd.to_datetime(df[date_column])
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        dates = dates.iloc[order]
+        scaled = self._scaled(df[value_column].to_numpy(dtype=np.float64)[order], dates)
+        predictions = np.empty(len(df), dtype=np.float64)
+        predictions[order] = self.update(df[series_column].iloc[order].tolist(), scaled)
+        return predictions
+
+    def _inverse_target(self, scaled):
+        return (scaled - self.scaler.min_[0]) / self.scaler.scale_[0]
+
+
+def stream_activity(consumer, runner, state_path=None, batch_size=500, checkpoint_every=100,
+                    series_key='project_id', date_key='created_at', value_key='target', on_predictions=None):
+    """
+    Feed GitLab activity events from Kafka into a StatefulLSTMRunner until the consumer stops
+
+    Events are the {'type': ..., 'data': {...}} messages produced by GitLabEventProducer; those
+    whose data carries series_key, date_key and value_key advance the matching series.
+
+    Offsets are committed right after each checkpoint, as in analytics.collaboration_service, so
+    after a crash the consumer resumes exactly at the first event the saved state has not seen.
+
+    :param consumer: A GitLabEventConsumer created with enable_auto_commit=False
+    :param state_path: File the state store is checkpointed to every `checkpoint_every` batches
+                       and on exit
+    :param on_predictions: Optional callback receiving (DataFrame of observations, predictions)
+    """
+    if consumer.enable_auto_commit:
+        raise ValueError("stream_activity commits offsets with its checkpoints; create the consumer "
+                         "with enable_auto_commit=False")
+
+    def checkpoint():
+        if state_path:
+            runner.store.save(state_path)
+            # Without a state file nothing survives a restart, so every event is replayed
+            consumer.commit()
+
+    n_batches = 0
+    # False while a batch is being applied; a checkpoint then would cover only part of the batch
+    consistent = True
+    try:
+        for events in consumer.stream_events(batch_size=batch_size):
+            consistent = False
+            rows = [event.get('data', {}) for event in events]
+            rows = [row for row in rows if series_key in row and date_key in row and value_key in row]
+            if rows:
+                observations = pd.DataFrame(rows)
+                predictions = runner.update_frame(observations, series_column=series_key,
+                                                  date_column=date_key, value_column=value_key)
+                if on_predictions is not None:
+                    on_predictions(observations, predictions)
+            consistent = True
+            n_batches += 1
+            if n_batches % checkpoint_every == 0:
+                checkpoint()
+    finally:
+        if consistent:
+            checkpoint()
+            if state_path:
+                logger.info(f"Saved LSTM state for {len(runner.store)} series to {state_path}")
+        else:
+            logger.warning("Stopped in the middle of a batch; keeping the last checkpoint, the events "
+                           "after it will be replayed")
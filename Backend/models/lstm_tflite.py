@@ -0,0 +1,128 @@
+import os
+import logging
+import joblib
+import numpy as np
+from .streaming_anomaly import detect_anomalies, load_anomaly_detector
+
+logger = logging.getLogger(__name__)
+
+TFLITE_FILENAME = 'lstm_model.tflite'
+# Dynamic-range int8 is not offered: the converter emits FULLY_CONNECTED version 12 kernels for it,
+# which the pinned tflite-runtime 2.7.0 cannot load
+QUANTIZATIONS = (None, 'float16')
+
+
+def _interpreter_class():
+    # tflite-runtime is a few MB; full TensorFlow is only the fallback
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def export_tflite(model, path, lookback, n_features=5, quantization=None):
+    """
+    Convert a trained Keras LSTM to a TFLite flatbuffer for single-window CPU inference
+
+    Needs TensorFlow 2.13 or later for tf.keras.export.ExportArchive. Exports from TensorFlow 2.21
+    were checked to load and match the Keras model on tflite-runtime 2.7.0.
+
+    :param quantization: None keeps float32 weights, 'float16' stores weights as float16
+    :return: Size of the written file in bytes
+    """
+    import tempfile
+    import tensorflow as tf
+
+    try:
+        from tensorflow.keras.export import ExportArchive
+    except ImportError:
+        raise ImportError(f"TFLite export needs TensorFlow 2.13 or later, found {tf.__version__}") from None
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+    # The converter cannot lower LSTMs with a dynamic batch dimension, so the model goes through a
+    # SavedModel whose only endpoint takes a batch of exactly one window
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        archive = ExportArchive()
+        archive.track(model)
+        archive.add_endpoint('serve', lambda x: model(x, training=False),
+                             input_signature=[tf.TensorSpec((1, lookback, n_features), tf.float32)])
+        archive.write_out(saved_model_dir, verbose=False)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if quantization is not None:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        flatbuffer = converter.convert()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(flatbuffer)
+    os.replace(tmp_path, path)
+    return len(flatbuffer)
+
+
+class TFLiteLSTMPredictor:
+    """
+    Serving-side counterpart of GitLabInsightLSTMAdvanced backed by a TFLite interpreter
+
+    It needs neither TensorFlow nor Keras at runtime, only a TFLite interpreter, the fitted scaler
+    and the anomaly detector saved next to the model.
+    """
+
+    def __init__(self, model_path, scaler, anomaly_detector, lookback, num_threads=None):
+        self.lookback = lookback
+        self.scaler = scaler
+        self.anomaly_detector = anomaly_detector
+        self.interpreter = _interpreter_class()(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input_index = self.interpreter.get_input_details()[0]['index']
+        self._output_index = self.interpreter.get_output_details()[0]['index']
+
+    @classmethod
+    def load(cls, path, lookback, num_threads=None):
+        return cls(os.path.join(path, TFLITE_FILENAME),
+                   joblib.load(os.path.join(path, 'scaler.joblib')),
+                   load_anomaly_detector(os.path.join(path, 'anomaly_detector.joblib')),
+                   lookback, num_threads=num_threads)
+
+    def predict_scaled(self, X):
+        self.interpreter.set_tensor(self._input_index, np.asarray(X, dtype=np.float32).reshape((1, self.lookback, 5)))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output_index)[0, 0]
+
+    def predict(self, X):
+        return float((self.predict_scaled(X) - self.scaler.min_[0]) / self.scaler.scale_[0])
+
+    def prepare_window(self, df):
+        import pandas as pd
+
+        dates = pd.to_datetime(df['date'])
+        order = np.argsort(dates.to_numpy(), kind='stable')[-self.lookback:]
+        dates = dates.iloc[order]
+        values = np.column_stack([df['target'].to_numpy(dtype=np.float64)[order], dates.dt.dayofweek,
+                                  dates.dt.month, dates.dt.quarter, dates.dt.year])
+        return self.scaler.transform(values)
+
+    def detect_anomalies(self, data, series_id=None, update=False):
+        return detect_anomalies(self.anomaly_detector, data, series_id, update)
+
+    def warmup(self):
+        self.predict(np.zeros((self.lookback, 5)))
+
+
+def max_abs_difference(keras_model, tflite_path, windows):
+    """Largest absolute difference between Keras and TFLite outputs (scaled units) over the given windows"""
+    interpreter = _interpreter_class()(model_path=tflite_path)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    windows = np.asarray(windows, dtype=np.float32)
+    tflite_out = np.empty(len(windows), dtype=np.float32)
+    for i, window in enumerate(windows):
+        interpreter.set_tensor(input_index, window[None])
+        interpreter.invoke()
+        tflite_out[i] = interpreter.get_tensor(output_index)[0, 0]
+    keras_out = keras_model(windows, training=False).numpy()[:, 0]
+    return float(np.max(np.abs(keras_out - tflite_out)))
@@ -0,0 +1,214 @@
+import inspect
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+from .lstm_data import window_dataset
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SPACE = {
+    'lstm_units': [30, 50, 70, 100],
+    'dropout_rate': [0.1, 0.2, 0.3],
+    'batch_size': [16, 32, 64],
+}
+DEFAULT_PARAMS = {'lstm_units': 50, 'dropout_rate': 0.2, 'batch_size': 32}
+PRUNERS = ('median', 'successive_halving', 'hyperband')
+
+
+def time_series_folds(n_windows, n_splits):
+    """
+    Expanding-window splits over window indices, as in sklearn's TimeSeriesSplit
+
+    Every validation block comes after all of its training windows, so no fold trains on the future.
+    Folds are ordered from the smallest training set to the largest.
+    """
+    fold_size = n_windows // (n_splits + 1)
+    if fold_size == 0:
+        raise ValueError(f"Not enough windows ({n_windows}) for {n_splits} time-series folds")
+    indices = np.arange(n_windows)
+    folds = []
+    for k in range(n_splits):
+        val_start = n_windows - (n_splits - k) * fold_size
+        folds.append((indices[:val_start], indices[val_start:val_start + fold_size]))
+    return folds
+
+
+def set_tf_threads(intra_op_threads=None, inter_op_threads=None):
+    """Limit TensorFlow's thread pools; only possible before TensorFlow runs its first op"""
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        logger.warning("TensorFlow is already initialised; its thread settings were left unchanged")
+
+
+class _StopAtDeadline(Callback):
+    # study.optimize only checks its timeout between trials, so a long trial is cut here instead.
+    # The deadline is wall-clock time so it means the same in every tuning process.
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.time() > self.deadline:
+            self.model.stop_training = True
+
+
+class _Objective:
+    """One trial: the folds trained in order, reporting the running mean validation loss after each"""
+
+    def __init__(self, build_model, build_kwargs, series, starts, lookback, folds, max_epochs, patience, deadline,
+                 seed):
+        self.build_model = build_model
+        self.build_kwargs = build_kwargs
+        self.series = series
+        self.starts = starts
+        self.lookback = lookback
+        self.folds = folds
+        self.max_epochs = max_epochs
+        self.patience = patience
+        self.deadline = deadline
+        self.seed = seed
+
+    def __call__(self, trial):
+        import optuna
+
+        params = {name: trial.suggest_categorical(name, values) for name, values in SEARCH_SPACE.items()}
+        losses = []
+        epochs_run = []
+        for step, (fit_idx, val_idx) in enumerate(self.folds):
+            model = self.build_model(lstm_units=params['lstm_units'], dropout_rate=params['dropout_rate'],
+                                     **self.build_kwargs)
+            fit_ds = window_dataset(self.series, self.lookback, self.starts[fit_idx], params['batch_size'],
+                                    shuffle_buffer=len(fit_idx), seed=self.seed)
+            val_ds = window_dataset(self.series, self.lookback, self.starts[val_idx], params['batch_size'])
+            callbacks = [EarlyStopping(monitor='val_loss', patience=self.patience, restore_best_weights=True)]
+            if self.deadline is not None:
+                callbacks.append(_StopAtDeadline(self.deadline))
+            history = model.fit(fit_ds, validation_data=val_ds, epochs=self.max_epochs, callbacks=callbacks,
+                                verbose=0)
+            losses.append(min(history.history['val_loss']))
+            epochs_run.append(len(history.history['val_loss']))
+
+            # The step is the number of folds trained, the resource successive halving allocates
+            trial.report(float(np.mean(losses)), step + 1)
+            # Pruning after the last fold would save nothing and discard a complete evaluation
+            if step < len(self.folds) - 1 and trial.should_prune():
+                raise optuna.TrialPruned()
+            if self.deadline is not None and time.time() > self.deadline and step < len(self.folds) - 1:
+                # A trial cut short by the budget has not seen every fold, so it cannot compete
+                raise optuna.TrialPruned()
+        trial.set_user_attr('epochs_run', epochs_run)
+        return float(np.mean(losses))
+
+
+def _pruner(name, n_splits):
+    import optuna
+
+    # The resource is the number of folds trained, 1 to n_splits. With so few steps per trial,
+    # successive halving has a single promotion (after fold 1 of 3, keeping the best third) and
+    # Hyperband only two brackets; the median pruner compares trials at every fold.
+    if name == 'median':
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=0)
+    if name == 'successive_halving':
+        return optuna.pruners.SuccessiveHalvingPruner(min_resource=1, reduction_factor=3)
+    if name == 'hyperband':
+        return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=n_splits, reduction_factor=3)
+    raise ValueError(f"Unknown pruner {name!r}; expected one of {PRUNERS}")
+
+
+def _optimize(study_name, storage, objective, n_trials, time_budget, sampler_seed, pruner, n_splits,
+              intra_op_threads, inter_op_threads):
+    """Run trials of a shared study until it has n_trials of them or the budget is spent"""
+    import optuna
+
+    set_tf_threads(intra_op_threads, inter_op_threads)
+    # Every process gets its own sampler seed, or they would all propose the same configs
+    study = optuna.load_study(study_name=study_name, storage=storage,
+                              sampler=optuna.samplers.TPESampler(seed=sampler_seed),
+                              pruner=_pruner(pruner, n_splits))
+    study.optimize(objective, n_trials=n_trials, timeout=time_budget,
+                   callbacks=[optuna.study.MaxTrialsCallback(n_trials, states=None)])
+
+
+def tune_lstm(build_model, series, starts, lookback, n_trials=40, time_budget=1800, n_splits=3, max_epochs=150,
+              patience=5, n_jobs=1, intra_op_threads=None, inter_op_threads=None, storage=None, study_name=None,
+              seed=42, pruner='successive_halving', build_kwargs=None):
+    """
+    Search over LSTM hyperparameters with time-series cross-validation and pruning
+
+    A trial trains one fold at a time, smallest training set first, with early stopping on each
+    fold's validation loss. After every fold it reports the mean validation loss so far, and the
+    pruner drops weak configs before they reach the expensive folds.
+
+    :param build_model: Callable(lstm_units=, dropout_rate=, **build_kwargs) returning a compiled
+                        Keras model. With n_jobs > 1 it is pickled to every process, so it must be
+                        a module-level function (such as lstm_model.build_lstm), not a bound method
+    :param build_kwargs: Further arguments of build_model, e.g. lookback and n_features
+    :param pruner: 'successive_halving' (keep the best third after the first fold), 'hyperband'
+                   or 'median' (compare each fold with the median of earlier trials); see
+                   benchmarks/benchmark_lstm_tuning.py for how they compare
+    :param series: Scaled series the windows are drawn from
+    :param starts: Start indices of the windows available for tuning, in time order
+    :param time_budget: Wall-clock limit in seconds for the whole search (None for no limit)
+    :param n_jobs: Processes running trials side by side. Keras models are not built concurrently
+                   in one process, so each job is a spawned process with its own TensorFlow; set
+                   intra_op_threads to about cores // n_jobs to avoid oversubscription
+    :param storage: Optuna storage URL; processes started with the same storage and study_name
+                    share one study. With n_jobs > 1 and no storage, a temporary SQLite file is used.
+    :return: Best parameters, with 'epochs' set to max_epochs for a final early-stopped fit
+    """
+    import optuna
+
+    if n_jobs > 1 and inspect.ismethod(build_model):
+        raise ValueError("With n_jobs > 1, pass a module-level build_model and its build_kwargs; "
+                         "a bound method would pickle its whole instance to every process")
+    starts = np.asarray(starts)
+    folds = time_series_folds(len(starts), n_splits)
+    deadline = time.time() + time_budget if time_budget else None
+    objective = _Objective(build_model, build_kwargs or {}, series, starts, lookback, folds, max_epochs, patience,
+                           deadline, seed)
+
+    with tempfile.TemporaryDirectory(prefix='lstm_tuning_') as directory:
+        if n_jobs > 1 and storage is None:
+            storage = f"sqlite:///{os.path.join(directory, 'study.db')}"
+        study = optuna.create_study(
+            direction='minimize',
+            sampler=optuna.samplers.TPESampler(seed=seed),
+            pruner=_pruner(pruner, n_splits),
+            storage=storage,
+            study_name=study_name,
+            load_if_exists=storage is not None,
+        )
+        if n_jobs > 1:
+            # Spawned rather than forked: TensorFlow's thread pools do not survive a fork
+            context = multiprocessing.get_context('spawn')
+            workers = [context.Process(target=_optimize,
+                                       args=(study.study_name, storage, objective, n_trials, time_budget, seed + job,
+                                             pruner, n_splits, intra_op_threads, inter_op_threads))
+                       for job in range(n_jobs)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+                if worker.exitcode:
+                    logger.warning(f"A tuning process exited with code {worker.exitcode}")
+        else:
+            set_tf_threads(intra_op_threads, inter_op_threads)
+            study.optimize(objective, n_trials=n_trials, timeout=time_budget)
+
+        completed = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+        pruned = len(study.trials) - len(completed)
+        if not completed:
+            logger.warning(f"No tuning trial finished within the budget; using defaults {DEFAULT_PARAMS}")
+            return dict(DEFAULT_PARAMS, epochs=max_epochs)
+        logger.info(f"LSTM tuning: best validation loss {study.best_value:.6f} with {study.best_params} "
+                    f"({len(completed)} trials completed, {pruned} pruned)")
+        return dict(study.best_params, epochs=max_epochs)
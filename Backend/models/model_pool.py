@@ -0,0 +1,209 @@
+import threading
+import time
+import logging
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from Backend.config import config
+from utils.model_versioning import get_model_registry
+
+logger = logging.getLogger(__name__)
+
+
+class VersionNotServed(KeyError):
+    """A request asked for a version that is not resident in the pool"""
+
+
+def parse_pinned_versions(spec):
+    """{model name: [versions]} from a spec such as 'issue_predictor:3,issue_predictor:4,mr_time_estimator:7'"""
+    pinned = defaultdict(list)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, version = item.rpartition(':')
+        pinned[name].append(int(version))
+    return dict(pinned)
+
+
+class VersionStats:
+    def __init__(self):
+        self.requests = 0
+        self.total_latency = 0.0
+        self.shadow_requests = 0
+        self.shadow_dropped = 0
+        self.total_shadow_latency = 0.0
+        self.compared = 0
+        self.disagreements = 0
+        self.total_abs_diff = 0.0
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'mean_latency_ms': 1000 * self.total_latency / self.requests if self.requests else None,
+            'shadow_requests': self.shadow_requests,
+            'shadow_dropped': self.shadow_dropped,
+            'mean_shadow_latency_ms': 1000 * self.total_shadow_latency / self.shadow_requests if self.shadow_requests else None,
+            'disagreement_rate': self.disagreements / self.compared if self.compared else None,
+            'mean_abs_diff': self.total_abs_diff / self.compared if self.compared else None,
+        }
+
+
+class ModelPool:
+    """
+    Keeps several versions of one predictor resident, evicting the least recently used
+    versions once their combined artifact size exceeds the memory budget. The primary, shadow
+    and pinned versions are never evicted.
+
+    Requests are only served from resident versions (see resident()); loading from disk happens
+    in set_primary, set_shadow and preload, never on the request path.
+    """
+
+    def __init__(self, model_cls, path, memory_budget_mb=None, shadow_workers=None, shadow_queue=None,
+                 pinned_versions=None):
+        self.model_cls = model_cls
+        self.name = model_cls().name
+        self.path = path
+        self.memory_budget = (memory_budget_mb or config.MODEL_POOL_MEMORY_BUDGET_MB) * 1024 * 1024
+        self.primary_version = None
+        self.shadow_version = None
+        if pinned_versions is None:
+            pinned_versions = parse_pinned_versions(config.MODEL_POOL_PINNED_VERSIONS).get(self.name, ())
+        self.pinned_versions = set(pinned_versions)
+        self.stats = defaultdict(VersionStats)
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._shadow_executor = ThreadPoolExecutor(max_workers=shadow_workers or config.MODEL_POOL_SHADOW_WORKERS,
+                                                   thread_name_prefix='shadow')
+        # The executor's own queue is unbounded; a slot is taken per shadow evaluation and freed when it ends
+        self._shadow_slots = threading.BoundedSemaphore(shadow_queue or config.MODEL_POOL_SHADOW_QUEUE)
+
+    def get(self, version=None):
+        version = version or self.primary_version
+        with self._lock:
+            model = self._models.get(version)
+            if model is not None:
+                self._models.move_to_end(version)
+                return model
+
+        # Load outside the lock so a cold version does not block requests for resident ones
+        model = self.model_cls()
+        model.load(self.path, version=version)
+        with self._lock:
+            model = self._models.setdefault(model.version, model)
+            self._models.move_to_end(model.version)
+            # The caller may be about to make it the primary or shadow version, so it is not evicted
+            # even when it alone exceeds the budget
+            self._evict(keep=model.version)
+        return model
+
+    def resident(self, version=None):
+        """The requested (or primary) version if it is loaded; VersionNotServed otherwise, without touching disk"""
+        version = version or self.primary_version
+        with self._lock:
+            model = self._models.get(version)
+            if model is None:
+                raise VersionNotServed(f"Version {version} of {self.name} is not served")
+            self._models.move_to_end(version)
+            return model
+
+    def preload(self):
+        """Load the pinned versions so requests can ask for them"""
+        for version in sorted(self.pinned_versions):
+            self.get(version)
+        return self
+
+    def set_primary(self, version=None):
+        if version is None:
+            version = get_model_registry().get_latest_version(self.name)
+        model = self.get(version)
+        with self._lock:
+            self.primary_version = model.version
+            # The previous primary is no longer protected
+            self._evict()
+        logger.info(f"Primary version of {self.name} is now {model.version}")
+        return model
+
+    def set_shadow(self, version):
+        model = self.get(version) if version is not None else None
+        with self._lock:
+            self.shadow_version = model.version if model is not None else None
+            self._evict()
+        logger.info(f"Shadow version of {self.name} is now {version}")
+        return model
+
+    def _evict(self, keep=None):
+        resident = sum(model.artifact_size or 0 for model in self._models.values())
+        for version in list(self._models):
+            if resident <= self.memory_budget:
+                break
+            if version in (keep, self.primary_version, self.shadow_version) or version in self.pinned_versions:
+                continue
+            evicted = self._models.pop(version)
+            resident -= evicted.artifact_size or 0
+            logger.info(f"Evicted {evicted.name} version {version} from the model pool")
+
+    def resident_versions(self):
+        with self._lock:
+            return list(self._models)
+
+    def predict(self, X, version=None, shadow_version=None):
+        """
+        Predict with the requested (or primary) version and, if a shadow version is given
+        or configured, score it on the same rows in the background
+
+        Both versions must be resident (VersionNotServed otherwise). A shadow evaluation is dropped,
+        and counted, when MODEL_POOL_SHADOW_QUEUE of them are already queued or running.
+
+        :return: Tuple of (predictions, version that produced them)
+        """
+        model = self.resident(version)
+        start = time.perf_counter()
+        prediction = model.predict(X)
+        latency = time.perf_counter() - start
+        with self._stats_lock:
+            stats = self.stats[model.version]
+            stats.requests += 1
+            stats.total_latency += latency
+
+        shadow_version = shadow_version or self.shadow_version
+        if shadow_version is not None and shadow_version != model.version:
+            shadow = self.resident(shadow_version)
+            if self._shadow_slots.acquire(blocking=False):
+                try:
+                    self._shadow_executor.submit(self._run_shadow, X, prediction, shadow)
+                except Exception:
+                    self._shadow_slots.release()
+                    raise
+            else:
+                with self._stats_lock:
+                    self.stats[shadow.version].shadow_dropped += 1
+        return prediction, model.version
+
+    def _run_shadow(self, X, primary_prediction, model):
+        # Imported here so api.predictions can import this module without loading scikit-learn
+        from sklearn.base import is_classifier
+
+        try:
+            start = time.perf_counter()
+            prediction = model.predict(X)
+            latency = time.perf_counter() - start
+            with self._stats_lock:
+                stats = self.stats[model.version]
+                stats.shadow_requests += 1
+                stats.total_shadow_latency += latency
+                stats.compared += len(prediction)
+                if is_classifier(model.model):
+                    stats.disagreements += int(np.sum(prediction != primary_prediction))
+                else:
+                    stats.total_abs_diff += float(np.sum(np.abs(prediction - primary_prediction)))
+        except Exception as e:
+            logger.error(f"Shadow prediction with version {model.version} failed: {str(e)}")
+        finally:
+            self._shadow_slots.release()
+
+    def stats_summary(self):
+        return {
+            'primary_version': self.primary_version,
+            'shadow_version': self.shadow_version,
+            'resident_versions': self.resident_versions(),
+            'versions': {version: stats.summary() for version, stats in list(self.stats.items())},
+        }
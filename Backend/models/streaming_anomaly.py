@@ -0,0 +1,136 @@
+import logging
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERIES = 'default'
+
+
+class StreamingAnomalyDetector:
+    """
+    Per-series anomaly detection over an exponentially weighted sliding window
+
+    Each series keeps only four numbers: its observation count and the exponentially weighted sums
+    of 1, x and x**2, which give a bias-corrected running mean and variance over roughly the last
+    `window` observations. A point's score is its absolute z-score against its series' statistics,
+    and points scoring above `threshold` are anomalies. Learning a batch is a closed-form update of
+    those sums, so the model never needs the full history and never has to be refit.
+    """
+
+    def __init__(self, window=500, threshold=3.0, min_samples=30, chunk_size=256):
+        """
+        :param window: Effective window length; the weight of an observation halves after about
+                       0.35 * window newer ones
+        :param min_samples: Observations a series needs before its points can be flagged
+        :param chunk_size: update() scores each chunk against the statistics as of its start, so
+                           smaller chunks adapt faster within a large batch and larger ones score faster
+        """
+        self.window = window
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.chunk_size = chunk_size
+        self.decay = 1.0 - 2.0 / (window + 1)
+        self._index = {}
+        self._count = np.zeros(0, dtype=np.int64)
+        # Exponentially weighted sums of 1, x and x**2 per series
+        self._weight = np.zeros(0)
+        self._sum = np.zeros(0)
+        self._sum_sq = np.zeros(0)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _rows(self, series_ids, n):
+        if series_ids is None or np.isscalar(series_ids):
+            row = self._rows_for([DEFAULT_SERIES if series_ids is None else series_ids])[0]
+            return np.full(n, row, dtype=np.int64)
+        return self._rows_for(list(series_ids))
+
+    def _rows_for(self, series_ids):
+        new_ids = [series_id for series_id in dict.fromkeys(series_ids) if series_id not in self._index]
+        if new_ids:
+            needed = len(self._index) + len(new_ids)
+            if needed > len(self._count):
+                # Grow geometrically so a stream of new series does not copy the state every time
+                size = max(needed, 2 * len(self._count))
+                self._count = np.pad(self._count, (0, size - len(self._count)))
+                self._weight = np.pad(self._weight, (0, size - len(self._weight)))
+                self._sum = np.pad(self._sum, (0, size - len(self._sum)))
+                self._sum_sq = np.pad(self._sum_sq, (0, size - len(self._sum_sq)))
+            for series_id in new_ids:
+                self._index[series_id] = len(self._index)
+        return np.fromiter((self._index[series_id] for series_id in series_ids), dtype=np.int64, count=len(series_ids))
+
+    def _score_rows(self, rows, values):
+        weight = self._weight[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self._sum[rows] / weight
+            variance = np.maximum(self._sum_sq[rows] / weight - mean ** 2, 0.0)
+            scores = np.abs(values - mean) / np.sqrt(variance)
+        # A series with too little history, or a point equal to a constant series' value, scores 0
+        scores[(self._count[rows] < self.min_samples) | np.isnan(scores)] = 0.0
+        return scores
+
+    def _learn_rows(self, rows, values):
+        order = np.argsort(rows, kind='stable')
+        series, starts, counts = np.unique(rows[order], return_index=True, return_counts=True)
+        group = np.repeat(np.arange(len(series)), counts)
+        # Within a series the newest point of the batch gets weight 1 and older ones decay
+        position = np.arange(len(rows)) - starts[group]
+        weights = self.decay ** (counts[group] - 1 - position)
+        x = values[order]
+        carried = self.decay ** counts
+        self._weight[series] = self._weight[series] * carried + np.bincount(group, weights=weights)
+        self._sum[series] = self._sum[series] * carried + np.bincount(group, weights=weights * x)
+        self._sum_sq[series] = self._sum_sq[series] * carried + np.bincount(group, weights=weights * x * x)
+        self._count[series] += counts
+
+    def score(self, values, series_ids=None):
+        """Anomaly scores of values without learning from them; series_ids is one id or one per value"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        return self._score_rows(self._rows(series_ids, len(values)), values)
+
+    def predict(self, values, series_ids=None):
+        """1 for anomalies and 0 for normal points, without learning from them"""
+        return (self.score(values, series_ids) > self.threshold).astype(int)
+
+    def update(self, values, series_ids=None):
+        """
+        Score values in arrival order and then learn from them
+
+        :return: The anomaly score of each value, computed before it was learned
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        rows = self._rows(series_ids, len(values))
+        scores = np.empty(len(values))
+        for start in range(0, len(values), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            scores[chunk] = self._score_rows(rows[chunk], values[chunk])
+            self._learn_rows(rows[chunk], values[chunk])
+        return scores
+
+    def reset(self, series_ids=None):
+        rows = self._rows(series_ids, 1)
+        self._count[rows] = 0
+        self._weight[rows] = self._sum[rows] = self._sum_sq[rows] = 0.0
+
+
+def detect_anomalies(detector, data, series_id=None, update=False):
+    # Shared by the Keras model and the TFLite predictor
+    if update:
+        return (detector.update(data, series_id) > detector.threshold).astype(int)
+    return detector.predict(data, series_id)
+
+
+def load_anomaly_detector(path):
+    try:
+        detector = joblib.load(path)
+    except ModuleNotFoundError:
+        # An old IForest pickle cannot even be read once pyod is uninstalled
+        detector = None
+    if not isinstance(detector, StreamingAnomalyDetector):
+        # Models saved before the streaming detector hold a PyOD IForest; its state cannot be carried over
+        logger.warning(f"{path} does not hold a StreamingAnomalyDetector; starting a fresh one")
+        detector = StreamingAnomalyDetector()
+    return detector
@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 from sklearn.metrics import mean_squared_error
 import logging
 from ml_models.lstm_model import GitLabInsightLSTMAdvanced
@@ -6,25 +7,57 @@ from data.data_fetcher import DataFetcher
 from Backend.config import config
 
 class PerformanceMonitor:
-    def __init__(self, model, threshold=0.1):
+    def __init__(self, model, threshold=0.1, state_path=None):
         self.model = model
         self.threshold = threshold
         self.logger = logging.getLogger(__name__)
+        # One-step-ahead predictions come from the stateful runner, so each check only pays for the
+        # observations that arrived since the previous one
+        self.state_path = state_path
+        self.runner = model.stateful_runner(state_path)
 
     def check_performance(self):
         try:
             # Fetch recent data
             data_fetcher = DataFetcher()
             recent_data = data_fetcher.fetch_recent_data()
+            recent_data = recent_data.assign(date=pd.to_datetime(recent_data['date'])).sort_values('date')
 
-            # Preprocess data
-            X, y = self.model.preprocess_data(recent_data)
+            # Only observations newer than the last check advance the state
+            metadata = self.runner.store.metadata
+            if 'last_seen' in metadata:
+                recent_data = recent_data[recent_data['date'] > pd.Timestamp(metadata['last_seen'])]
+            if 'activity' not in self.runner.store:
+                # The first check primes the state on a full lookback window, as the windowed model
+                # sees it, instead of stepping the forecaster from a zero state
+                lookback = self.model.lookback
+                if len(recent_data) <= lookback:
+                    self.logger.info(f"Waiting for more than {lookback} observations to prime the forecaster")
+                    return
+                history, recent_data = recent_data.iloc[:lookback], recent_data.iloc[lookback:]
+                metadata['next_prediction'] = float(self.runner.prime_frame('activity', history))
+            if recent_data.empty:
+                self.logger.info("No new observations since the last performance check")
+                return
 
-            # Make predictions
-            predictions = self.model.predict_sequence(X[0], len(y))
+            predictions = self.runner.update_frame(recent_data.assign(series='activity'), series_column='series')
+
+            # predictions[i] forecasts observation i + 1; the last prediction of the previous check
+            # forecasts the first new observation
+            actual = recent_data['target'].to_numpy()
+            if 'next_prediction' in metadata:
+                forecasts, actual = np.concatenate([[metadata['next_prediction']], predictions[:-1]]), actual
+            else:
+                forecasts, actual = predictions[:-1], actual[1:]
+            metadata['last_seen'] = recent_data['date'].iloc[-1].isoformat()
+            metadata['next_prediction'] = float(predictions[-1])
+            if self.state_path:
+                self.runner.store.save(self.state_path)
+            if len(actual) == 0:
+                return
 
             # Calculate RMSE
-            rmse = np.sqrt(mean_squared_error(y, predictions))
+            rmse = np.sqrt(mean_squared_error(actual, forecasts))
 
             # Check if RMSE exceeds threshold
             if rmse > self.threshold:
@@ -42,7 +75,7 @@ class PerformanceMonitor:
 def start_monitoring(interval_hours=1):
     model = GitLabInsightLSTMAdvanced(lookback=config.LOOKBACK)
     model.load_model(config.MODEL_SAVE_PATH)
-    monitor = PerformanceMonitor(model)
+    monitor = PerformanceMonitor(model, state_path=config.LSTM_STATE_PATH)
 
     schedule.every(interval_hours).hours.do(monitor.check_performance)
     
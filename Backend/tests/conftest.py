@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modules import both top-level packages (analytics, models, ...) and Backend.config, so the tests
+# need Backend/ and the repository root on the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR)]
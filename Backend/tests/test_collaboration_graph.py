@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+from analytics.collaboration_graph import CollaborationGraph
+
+# Exactly the columns DataFetcher.fetch_commits and DataFetcher.fetch_merge_requests select
+COMMIT_COLUMNS = ['id', 'message', 'authored_date', 'committed_date', 'author_name', 'changed_files',
+                  'related_mr_count', 'related_issue_count']
+MR_COLUMNS = ['id', 'title', 'description', 'state', 'created_at', 'merged_at', 'author', 'commit_count',
+              'related_issue_count', 'reviewers']
+
+
+def test_from_activity_on_fetcher_frames():
+    commits = pd.DataFrame([
+        ['c1', 'fix', '2024-01-01', '2024-01-01', 'alice', ['a.py', 'b.py'], 1, 0],
+        ['c2', 'refactor', '2024-01-02', '2024-01-02', 'bob', ['a.py'], 1, 1],
+        ['c3', 'docs', '2024-01-03', '2024-01-03', 'carol', ['README.md'], 0, 0],
+    ], columns=COMMIT_COLUMNS)
+    merge_requests = pd.DataFrame([
+        [1, 'Fix', '', 'merged', '2024-01-01', '2024-01-02', 'alice', 2, 1, ['bob', 'alice']],
+        # ARRAY_AGG over a LEFT JOIN gives [None] for a merge request nobody reviewed
+        [2, 'Docs', '', 'opened', '2024-01-03', None, 'carol', 1, 0, [None]],
+    ], columns=MR_COLUMNS)
+
+    graph = CollaborationGraph.from_activity(commits, merge_requests)
+
+    developers = list(graph.developers)
+    assert sorted(developers) == ['alice', 'bob', 'carol']
+    alice, bob = developers.index('alice'), developers.index('bob')
+    # Self-reviews are dropped, so the only review is bob reviewing alice's merge request
+    assert graph.reviews.sum() == 1 and graph.reviews[alice, bob] == 1
+    # alice and bob both changed a.py and one reviewed the other
+    assert graph.adjacency[alice, bob] > 0
+    assert np.allclose(graph.adjacency.toarray(), graph.adjacency.toarray().T)
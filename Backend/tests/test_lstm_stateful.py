@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+tf = pytest.importorskip('tensorflow')
+
+from models.lstm_stateful import StatefulLSTMRunner, stream_activity
+
+LOOKBACK = 6
+
+
+def make_runner():
+    tf.random.set_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input((LOOKBACK, 5)),
+        tf.keras.layers.LSTM(8, return_sequences=True),
+        tf.keras.layers.LSTM(8),
+        tf.keras.layers.Dense(1),
+    ])
+    dates = pd.Series(pd.date_range('2023-01-01', periods=60, freq='D'))
+    scaler = MinMaxScaler().fit(np.column_stack([np.arange(60.0), dates.dt.dayofweek, dates.dt.month,
+                                                 dates.dt.quarter, dates.dt.year]))
+    return model, StatefulLSTMRunner(model, scaler)
+
+
+def activity(n):
+    return pd.DataFrame({'date': pd.date_range('2023-01-01', periods=n, freq='D'),
+                         'target': np.linspace(3, 40, n)})
+
+
+class FakeConsumer:
+    def __init__(self, batches, enable_auto_commit=False):
+        self.batches = batches
+        self.enable_auto_commit = enable_auto_commit
+        self.log = []
+
+    def stream_events(self, batch_size):
+        for batch in self.batches:
+            self.log.append('poll')
+            yield batch
+
+    def commit(self):
+        self.log.append('commit')
+
+
+def test_prime_frame_matches_windowed_model():
+    model, runner = make_runner()
+    history = activity(LOOKBACK)
+    # Rows out of date order are sorted before priming
+    primed = runner.prime_frame('activity', history.iloc[::-1])
+
+    dates = history['date']
+    window = runner.scaler.transform(np.column_stack([history['target'], dates.dt.dayofweek, dates.dt.month,
+                                                      dates.dt.quarter, dates.dt.year]))
+    windowed = runner._inverse_target(model.predict(window[None].astype(np.float32), verbose=0)[:, 0])
+    assert 'activity' in runner.store
+    np.testing.assert_allclose(primed, windowed[0], rtol=1e-4)
+
+
+def test_stream_activity_commits_after_each_checkpoint(tmp_path, monkeypatch):
+    _, runner = make_runner()
+    monkeypatch.setattr(runner.store, 'save', lambda path: consumer.log.append('save'))
+    rows = activity(4).assign(created_at=lambda df: df['date'].dt.strftime('%Y-%m-%d'), project_id=1)
+    rows = rows.drop(columns='date')
+    batches = [[{'type': 'commit', 'data': row}] for row in rows.to_dict('records')]
+    consumer = FakeConsumer(batches)
+
+    predictions = []
+    stream_activity(consumer, runner, state_path=str(tmp_path / 'state.npz'), checkpoint_every=2,
+                    on_predictions=lambda observations, batch: predictions.extend(batch))
+    assert len(predictions) == 4 and 1 in runner.store
+    assert consumer.log == ['poll', 'poll', 'save', 'commit', 'poll', 'poll', 'save', 'commit', 'save', 'commit']
+
+
+def test_stream_activity_requires_manual_commit():
+    _, runner = make_runner()
+    with pytest.raises(ValueError):
+        stream_activity(FakeConsumer([], enable_auto_commit=True), runner)
+
+
+def test_stream_activity_keeps_last_checkpoint_when_a_batch_fails(tmp_path, monkeypatch):
+    _, runner = make_runner()
+    monkeypatch.setattr(runner.store, 'save', lambda path: consumer.log.append('save'))
+    monkeypatch.setattr(runner, 'update_frame', lambda *args, **kwargs: 1 / 0)
+    event = {'type': 'commit', 'data': {'project_id': 1, 'created_at': '2023-01-01', 'target': 1.0}}
+    consumer = FakeConsumer([[event]])
+
+    with pytest.raises(ZeroDivisionError):
+        stream_activity(consumer, runner, state_path=str(tmp_path / 'state.npz'))
+    assert consumer.log == ['poll']
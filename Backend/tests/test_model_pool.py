@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from models.model_pool import ModelPool, VersionNotServed
+
+MB = 1024 * 1024
+
+
+class StubModel:
+    """Stands in for a BaseModel subclass: every version is a 0.75 MB artifact predicting its own number"""
+
+    name = 'stub_predictor'
+
+    def __init__(self):
+        self.version = None
+        self.artifact_size = None
+        self.model = None
+
+    def load(self, path, version=None):
+        self.version = version
+        self.artifact_size = int(0.75 * MB)
+
+    def predict(self, X):
+        return np.full(len(X), self.version)
+
+
+@pytest.fixture
+def pool():
+    # Only one version fits in the budget
+    pool = ModelPool(StubModel, 'unused', memory_budget_mb=1, shadow_workers=1, shadow_queue=1, pinned_versions=[])
+    yield pool
+    pool._shadow_executor.shutdown()
+
+
+def test_new_primary_stays_resident_over_budget(pool):
+    pool.set_primary(1)
+    pool.set_primary(2)
+    # The old primary made room for the new one, which was not evicted on load
+    assert pool.resident_versions() == [2]
+    prediction, version = pool.predict([[0]])
+    assert version == 2 and prediction.tolist() == [2]
+
+
+def test_shadow_stays_resident_next_to_primary(pool):
+    pool.set_primary(1)
+    pool.set_shadow(2)
+    assert sorted(pool.resident_versions()) == [1, 2]
+    assert pool.predict([[0]])[1] == 1
+
+    pool.set_shadow(None)
+    assert pool.resident_versions() == [1]
+    with pytest.raises(VersionNotServed):
+        pool.predict([[0]], version=2)
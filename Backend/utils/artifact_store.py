@@ -0,0 +1,75 @@
+import os
+import pickle
+import shutil
+import numpy as np
+
+OBJECT_FILE = 'object.pkl'
+ARRAY_MIN_BYTES = 1 << 16
+
+
+class _ArrayExternalizingPickler(pickle.Pickler):
+    def __init__(self, file, directory, min_bytes):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self.filenames = {}
+
+    def persistent_id(self, obj):
+        # Only plain numeric arrays can be memory-mapped; everything else stays in the pickle
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < self.min_bytes:
+            return None
+        # Persistent ids bypass the pickle memo, so track arrays referenced more than once ourselves
+        filename = self.filenames.get(id(obj))
+        if filename is None:
+            filename = f"array_{len(self.filenames)}.npy"
+            self.filenames[id(obj)] = filename
+            np.save(os.path.join(self.directory, filename), np.ascontiguousarray(obj), allow_pickle=False)
+        return ('ndarray', filename)
+
+
+class _ArrayLoadingUnpickler(pickle.Unpickler):
+    def __init__(self, file, directory, mmap_mode):
+        super().__init__(file)
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+
+    def persistent_load(self, pid):
+        kind, filename = pid
+        if kind != 'ndarray':
+            raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+        return np.load(os.path.join(self.directory, filename), mmap_mode=self.mmap_mode, allow_pickle=False)
+
+
+def dump_artifact(obj, directory, min_bytes=ARRAY_MIN_BYTES):
+    """
+    Save an object as a directory with its large NumPy arrays in separate .npy files
+
+    The directory is written under a temporary name and renamed into place, so readers
+    never see a partially written artifact.
+    """
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    with open(os.path.join(tmp_directory, OBJECT_FILE), 'wb') as f:
+        _ArrayExternalizingPickler(f, tmp_directory, min_bytes).dump(obj)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.rename(tmp_directory, directory)
+
+
+def load_artifact(directory, mmap_mode='r'):
+    """
+    Load an artifact written by dump_artifact
+
+    With mmap_mode='r' the arrays are backed by the page cache, so processes that load
+    the same artifact (or inherit it across fork) share those pages.
+    """
+    with open(os.path.join(directory, OBJECT_FILE), 'rb') as f:
+        return _ArrayLoadingUnpickler(f, directory, mmap_mode).load()
+
+
+def artifact_size(path):
+    # On-disk size is a close proxy for resident size: arrays are mapped as-is and the pickle
+    # holds the rest of the object
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
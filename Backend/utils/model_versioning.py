@@ -1,36 +1,176 @@
 import os
 import json
+import sqlite3
+import threading
+import logging
 from datetime import datetime
+from functools import lru_cache
+from Backend.config import config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS model_versions (
+    model_name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    performance_metric REAL,
+    published INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (model_name, version)
+);
+CREATE INDEX IF NOT EXISTS idx_model_versions_metric
+    ON model_versions (model_name, published, performance_metric);
+"""
+
 
 class ModelVersioning:
-    def __init__(self, version_file='model_versions.json'):
-        self.version_file = version_file
-        self.versions = self._load_versions()
-
-    def _load_versions(self):
-        if os.path.exists(self.version_file):
-            with open(self.version_file, 'r') as f:
-                return json.load(f)
-        return {}
-
-    def _save_versions(self):
-        with open(self.version_file, 'w') as f:
-            json.dump(self.versions, f, indent=2)
-
-    def new_version(self, model_name, performance_metric):
-        if model_name not in self.versions:
-            self.versions[model_name] = []
-        
-        version = len(self.versions[model_name]) + 1
-        self.versions[model_name].append({
-            'version': version,
-            'timestamp': datetime.now().isoformat(),
-            'performance_metric': performance_metric
-        })
-        self._save_versions()
+    def __init__(self, db_path=None, legacy_version_file='model_versions.json'):
+        self.db_path = db_path or config.MODEL_REGISTRY_PATH
+        self._local = threading.local()
+        self._subscribers = {}
+        self._last_seen = {}
+        self._subscribers_lock = threading.Lock()
+        self._watch_thread = None
+        self._stop_watching = threading.Event()
+        self._connect().executescript(SCHEMA)
+        self._import_legacy_versions(legacy_version_file)
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads or carried across fork
+        # (the API preloads models in the gunicorn master), so keep one per thread and process
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _import_legacy_versions(self, version_file):
+        if not os.path.exists(version_file):
+            return
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("SELECT 1 FROM model_versions LIMIT 1").fetchone() is None:
+                with open(version_file, 'r') as f:
+                    versions = json.load(f)
+                connection.executemany(
+                    "INSERT INTO model_versions (model_name, version, timestamp, performance_metric) VALUES (?, ?, ?, ?)",
+                    [(model_name, entry['version'], entry['timestamp'], entry['performance_metric'])
+                     for model_name, entries in versions.items() for entry in entries])
+                logger.info(f"Imported legacy model versions from {version_file}")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def new_version(self, model_name, performance_metric, published=True):
+        """
+        Register the next version of a model
+
+        The version number is allocated inside a write transaction, so concurrent trainers
+        always get distinct versions. Pass published=False to reserve a version while its
+        artifact is being written, then call publish_version once it is on disk.
+        """
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM model_versions WHERE model_name = ?",
+                (model_name,)).fetchone()[0]
+            connection.execute(
+                "INSERT INTO model_versions (model_name, version, timestamp, performance_metric, published) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (model_name, version, datetime.now().isoformat(), performance_metric, int(published)))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
         return version
 
+    def publish_version(self, model_name, version):
+        self._connect().execute(
+            "UPDATE model_versions SET published = 1 WHERE model_name = ? AND version = ?",
+            (model_name, version))
+
     def get_latest_version(self, model_name):
-        if model_name in self.versions and self.versions[model_name]:
-            return self.versions[model_name][-1]['version']
-        return None
+        row = self._connect().execute(
+            "SELECT MAX(version) FROM model_versions WHERE model_name = ? AND published = 1",
+            (model_name,)).fetchone()
+        return row[0]
+
+    def get_version(self, model_name, version):
+        row = self._connect().execute(
+            "SELECT version, timestamp, performance_metric FROM model_versions "
+            "WHERE model_name = ? AND version = ? AND published = 1",
+            (model_name, version)).fetchone()
+        return dict(row) if row else None
+
+    def list_versions(self, model_name, limit=None):
+        rows = self._connect().execute(
+            "SELECT version, timestamp, performance_metric FROM model_versions "
+            "WHERE model_name = ? AND published = 1 ORDER BY version DESC LIMIT ?",
+            (model_name, -1 if limit is None else limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_best_version(self, model_name):
+        # Metrics are stored so that higher is better (get_metric negates error metrics)
+        row = self._connect().execute(
+            "SELECT version FROM model_versions WHERE model_name = ? AND published = 1 "
+            "ORDER BY performance_metric DESC LIMIT 1",
+            (model_name,)).fetchone()
+        return row[0] if row else None
+
+    def subscribe(self, model_name, callback, current_version=None, poll_interval=None):
+        """
+        Call callback(model_name, version) from a background thread whenever a newer
+        version of model_name is published, by this or any other process
+
+        :param current_version: Version the caller already has loaded; defaults to the latest
+        """
+        if current_version is None:
+            current_version = self.get_latest_version(model_name)
+        with self._subscribers_lock:
+            self._subscribers.setdefault(model_name, []).append(callback)
+            self._last_seen.setdefault(model_name, current_version)
+        if self._watch_thread is None:
+            interval = poll_interval or config.MODEL_REGISTRY_POLL_SECONDS
+            self._watch_thread = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+            self._watch_thread.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def _watch(self, interval):
+        connection = self._connect()
+        last_data_version = None
+        while not self._stop_watching.is_set():
+            # data_version only changes when another connection commits, so idle polls are one cheap pragma
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != last_data_version:
+                last_data_version = data_version
+                self._notify_subscribers()
+            self._stop_watching.wait(interval)
+
+    def _notify_subscribers(self):
+        with self._subscribers_lock:
+            subscribers = {name: list(callbacks) for name, callbacks in self._subscribers.items()}
+        for model_name, callbacks in subscribers.items():
+            latest = self.get_latest_version(model_name)
+            last_seen = self._last_seen.get(model_name)
+            if latest is None or (last_seen is not None and latest <= last_seen):
+                continue
+            self._last_seen[model_name] = latest
+            for callback in callbacks:
+                try:
+                    callback(model_name, latest)
+                except Exception as e:
+                    logger.error(f"Error handling new version {latest} of {model_name}: {str(e)}")
+
+
+@lru_cache(maxsize=None)
+def get_model_registry(db_path=None):
+    # One registry (and one watcher thread) per process, shared by every model
+    return ModelVersioning(db_path)
@@ -0,0 +1,23 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(series, lookback):
+    """
+    Build supervised (window, next value) pairs from a series without copying it
+
+    :param series: Array of shape (n_steps,) or (n_steps, n_features)
+    :param lookback: Number of past steps in each window
+    :return: Read-only views X of shape (n_steps - lookback, lookback, ...) and y of shape
+             (n_steps - lookback, ...), where X[i] = series[i:i + lookback] and y[i] = series[i + lookback]
+    """
+    series = np.asarray(series)
+    n_windows = len(series) - lookback
+    if n_windows <= 0:
+        return np.empty((0, lookback) + series.shape[1:], dtype=series.dtype), series[:0]
+
+    # The last step is only ever a target, so windows are taken over series[:-1]
+    windows = sliding_window_view(series[:-1], lookback, axis=0)
+    # sliding_window_view appends the window axis last; move it next to the window index
+    windows = np.moveaxis(windows, -1, 1)
+    return windows, series[lookback:]